@@ -0,0 +1,131 @@
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+import argparse
+import contextlib
+import io
+import json
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from benchmarks.serving import STAND_IN_PREFIX, synthetic_png, synthetic_text, write_stand_in_models
+
+
+def measure(stage, function, setup=None, n_items=1, min_time=1., min_calls=3):
+    """
+    Calls a function until min_time seconds and min_calls calls are reached, then runs it once more
+    under tracemalloc. The setup function builds the call arguments and is not timed
+    Args:
+        stage: name displayed in the report
+        function: function to benchmark
+        setup: function returning the tuple of arguments of a call, None for no arguments
+        n_items: number of items (texts, images...) processed by a call
+        min_time: minimum total duration of the timed calls in seconds
+        min_calls: minimum number of timed calls
+    Return:
+        dictionary containing the throughput and allocations of the stage
+    """
+    durations = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        while sum(durations) < min_time or len(durations) < min_calls:
+            args = setup() if setup is not None else ()
+            start = time.perf_counter()
+            function(*args)
+            durations.append(time.perf_counter() - start)
+        args = setup() if setup is not None else ()
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        function(*args)
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    n_allocations = sum(s.count_diff for s in after.compare_to(before, "lineno") if s.count_diff > 0)
+    mean_duration = float(np.mean(durations))
+    result = {"stage": stage, "n_calls": len(durations), "mean_ms": round(1000 * mean_duration, 3),
+              "ops_per_sec": round(1 / mean_duration, 3), "items_per_sec": round(n_items / mean_duration, 1),
+              "peak_kb": round(peak / 1024, 1), "allocations": n_allocations}
+    print("{:32} |{:>12.3f}|{:>12.1f}|{:>12.1f}|{:>12}|".format(
+        stage, result["ops_per_sec"], result["items_per_sec"], result["peak_kb"], result["allocations"]))
+    return result
+
+
+def benchmark_sentiment(texts, min_time):
+    """
+    Sentiment analysis request preprocessing
+    """
+    from src.models.sentiment_analysis_rnn import DataPreprocessor
+    preprocessor = DataPreprocessor.load_preprocessor(STAND_IN_PREFIX % "sentiment_analysis" + "_preprocessor.pkl")
+    return [measure("sentiment.preprocess_data", DataPreprocessor.preprocess_data, lambda: (texts, preprocessor),
+                    len(texts), min_time)]
+
+
+def benchmark_ner(texts, min_time):
+    """
+    Named entity recognition request preprocessing, prediction and display
+    """
+    from src.models.named_entity_recognition_rnn import RNNModel, DataPreprocessor
+    model, preprocessor_file = RNNModel.load_model()
+    preprocessor = DataPreprocessor.load_preprocessor(preprocessor_file)
+    encoded, tokenized, n_tokens = DataPreprocessor.preprocess_data(texts, preprocessor)
+    labels = model.predict(encoded, preprocessor["labels_to_idx"], n_tokens)
+    return [measure("ner.preprocess_data", DataPreprocessor.preprocess_data, lambda: (texts, preprocessor),
+                    len(texts), min_time),
+            measure("ner.predict", model.predict, lambda: (encoded, preprocessor["labels_to_idx"], n_tokens),
+                    len(texts), min_time),
+            measure("ner.visualize", model.visualize, lambda: (tokenized, labels), len(texts), min_time)]
+
+
+def benchmark_clothing(root_dir, rng, min_time):
+    """
+    Clothing classifier image loading
+    """
+    from src.models.cnn_classifier import CNNClothing
+    model = CNNClothing.load_model()
+    image_file = os.path.join(root_dir, "marabou/evaluation/clothing_service_images/benchmark.png")
+    with open(image_file, "wb") as f:
+        f.write(synthetic_png(rng, 256))
+    return [measure("clothing.load_image", model.load_image, lambda: (image_file,), 1, min_time)]
+
+
+def parse_arguments():
+    """
+    Parse file arguments
+    """
+    parser = argparse.ArgumentParser(description="Throughput and allocations of the serving hot paths")
+    parser.add_argument('--stages', nargs='+', default=["sentiment", "ner", "clothing"],
+                        help="groups of stages to run")
+    parser.add_argument('--n-texts', type=int, default=256, help="number of texts per call")
+    parser.add_argument('--text-words', type=int, default=60, help="number of words per text")
+    parser.add_argument('--min-time', type=float, default=1., help="minimum timed duration per stage in seconds")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="optional .json file receiving the results")
+    return parser.parse_args()
+
+
+def main():
+    """main function"""
+    args = parse_arguments()
+    vocab_size = 5000
+    rng = np.random.RandomState(args.seed)
+    root_dir = tempfile.mkdtemp(prefix="marabou_hot_paths_")
+    os.environ["MARABOU_HOME"] = root_dir
+    print("===========> writing stand-in models under %s" % root_dir)
+    write_stand_in_models(root_dir, args.stages, vocab_size)
+    texts = [synthetic_text(rng, args.text_words, vocab_size) for _ in range(args.n_texts)]
+    print("{:32} |{:>12}|{:>12}|{:>12}|{:>12}|".format("stage", "ops/s", "items/s", "peak kb", "allocations"))
+    results = []
+    if "sentiment" in args.stages:
+        results.extend(benchmark_sentiment(texts, args.min_time))
+    if "ner" in args.stages:
+        results.extend(benchmark_ner(texts, args.min_time))
+    if "clothing" in args.stages:
+        results.extend(benchmark_clothing(root_dir, rng, args.min_time))
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump({"timestamp": time.strftime("%Y-%m-%d %H:%M:%S"), "arguments": vars(args),
+                       "results": results}, f, indent=2)
+        print("----> results saved to %s" % args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+import argparse
+import json
+import time
+import numpy as np
+from tensorflow.keras.models import Model
+from tensorflow.keras.layers import Input, Embedding, LSTM, Dense, Bidirectional, TimeDistributed, add
+from tensorflow.keras.layers import Conv2D, MaxPooling2D, Flatten
+from src.models.inference import build_predict_function, run_inference
+
+
+def build_sentiment_model(vocab_size=50000, max_length=250):
+    """
+    Randomly initialized stand-in for the served sentiment analysis architecture
+    """
+    input_layer = Input(shape=(max_length,), name='input')
+    x = Embedding(vocab_size, 300, input_length=max_length)(input_layer)
+    x = LSTM(64)(x)
+    x = Dense(250, activation='relu')(x)
+    x = Dense(1, activation='sigmoid')(x)
+    return Model(inputs=input_layer, outputs=x), np.int32
+
+
+def build_ner_model(vocab_size=35000, max_length=75, n_labels=18):
+    """
+    Randomly initialized stand-in for the served named entity recognition architecture,
+    the CRF output layer is replaced by a softmax
+    """
+    input_layer = Input(shape=(max_length,), name='input')
+    x = Embedding(vocab_size, 300, input_length=max_length)(input_layer)
+    x = Bidirectional(LSTM(units=50, return_sequences=True))(x)
+    x_rnn = Bidirectional(LSTM(units=50, return_sequences=True))(x)
+    x = add([x, x_rnn])
+    x = TimeDistributed(Dense(50, activation='relu'))(x)
+    x = TimeDistributed(Dense(n_labels, activation='softmax'))(x)
+    return Model(inputs=input_layer, outputs=x), np.int32
+
+
+def build_cnn_model(image_size=64, n_labels=10):
+    """
+    Small randomly initialized convolutional stand-in for the clothing classifier
+    """
+    input_layer = Input(shape=(image_size, image_size, 3), name='input')
+    x = Conv2D(32, 3, activation='relu')(input_layer)
+    x = MaxPooling2D()(x)
+    x = Conv2D(64, 3, activation='relu')(x)
+    x = MaxPooling2D()(x)
+    x = Flatten()(x)
+    x = Dense(n_labels, activation='softmax')(x)
+    return Model(inputs=input_layer, outputs=x), np.float32
+
+
+def time_calls(function, n_calls):
+    """
+    Mean duration of a function call in milliseconds
+    """
+    function()
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        function()
+    return 1000 * (time.perf_counter() - start) / n_calls
+
+
+def benchmark_model(model_name, keras_model, input_dtype, batch_sizes, n_calls):
+    """
+    Compares model.predict with the direct call inference path for every batch size
+    Args:
+        model_name: name displayed in the report
+        keras_model: model to benchmark
+        input_dtype: type of the model input tensor
+        batch_sizes: list of batch sizes to measure
+        n_calls: number of timed calls per measure
+    Return:
+        list of dictionaries containing the timings of each batch size
+    """
+    predict_function = build_predict_function(keras_model, input_dtype)
+    sample_shape = tuple(keras_model.input_shape[1:])
+    results = []
+    for batch_size in batch_sizes:
+        inputs = np.zeros((batch_size,) + sample_shape, dtype=input_dtype)
+        predict_ms = time_calls(lambda: keras_model.predict(inputs), n_calls)
+        direct_ms = time_calls(lambda: run_inference(keras_model, predict_function, inputs, input_dtype), n_calls)
+        results.append({"model": model_name, "batch_size": batch_size, "predict_ms": round(predict_ms, 3),
+                        "direct_call_ms": round(direct_ms, 3), "speedup": round(predict_ms / direct_ms, 2)})
+        print("{:10} |{:6} |{:12.3f} |{:12.3f} |{:8.2f}".format(
+            model_name, batch_size, predict_ms, direct_ms, predict_ms / direct_ms))
+    return results
+
+
+def parse_arguments():
+    """
+    Parse file arguments
+    """
+    parser = argparse.ArgumentParser(description="Per call overhead of model.predict versus the direct call path")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument('--n-calls', type=int, default=50, help="number of timed calls per measure")
+    parser.add_argument('--models', nargs='+', default=["sentiment", "ner", "cnn"])
+    parser.add_argument('--output', default=None, help="optional .json file receiving the results")
+    return parser.parse_args()
+
+
+def main():
+    """main function"""
+    args = parse_arguments()
+    builders = {"sentiment": build_sentiment_model, "ner": build_ner_model, "cnn": build_cnn_model}
+    print("{:10} |{:6} |{:12} |{:12} |{:8}".format("model", "batch", "predict ms", "direct ms", "speedup"))
+    results = []
+    for model_name in args.models:
+        keras_model, input_dtype = builders[model_name]()
+        results.extend(benchmark_model(model_name, keras_model, input_dtype, args.batch_sizes, args.n_calls))
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print("----> results saved to %s" % args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,447 @@
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+import argparse
+import io
+import json
+import pickle
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+ROUTES = {"sentiment": "/api/sentimentAnalysis",
+          "ner": "/api/namedEntityRecognition",
+          "clothing": "/api/clothingClassifier"}
+TASKS = {"sentiment": "sentiment_analysis",
+         "ner": "named_entity_recognition",
+         "clothing": "clothing_classifier"}
+NER_LABELS = ["pad", "O", "B-geo", "I-geo", "B-tim", "I-tim", "B-org", "I-org", "B-gpe", "I-gpe", "B-per", "I-per"]
+STAND_IN_PREFIX = "%s_benchmark_20000101_000000"
+
+
+def synthetic_vocabulary(vocab_size):
+    """
+    Words of the stand-in tokenizers, 'pad' being the padding token expected by the served preprocessors
+    """
+    return ["pad"] + ["word%i" % i for i in range(vocab_size - 1)]
+
+
+def fit_tokenizer(tokenizer_class, vocabulary):
+    """
+    Tokenizer whose word index follows the order of the vocabulary, 'pad' having the id 0
+    """
+    tokenizer_obj = tokenizer_class(num_words=len(vocabulary), lower=True)
+    tokenizer_obj.word_index = {word: i for i, word in enumerate(vocabulary)}
+    tokenizer_obj.index_word = {i: word for i, word in enumerate(vocabulary)}
+    return tokenizer_obj
+
+
+def dump_pickles(file_name, values):
+    """
+    Writes values one after the other in a pickle file, as the training scripts do
+    """
+    with open(file_name, "wb") as f:
+        for value in values:
+            pickle.dump(value, f)
+
+
+def write_sentiment_stand_in(model_dir, vocab_size, max_length):
+    """
+    Randomly initialized sentiment analysis model, class and preprocessor files
+    """
+    from tensorflow.keras.preprocessing.text import Tokenizer
+    from benchmarks.inference_overhead import build_sentiment_model
+    prefix = os.path.join(model_dir, STAND_IN_PREFIX % "sentiment_analysis")
+    vocabulary = synthetic_vocabulary(vocab_size)
+    keras_model, _ = build_sentiment_model(vocab_size, max_length)
+    keras_model.save(prefix + "_rnn_model.h5")
+    dump_pickles(prefix + "_rnn_class.pkl", [False, vocab_size, 300, None, max_length, {}])
+    dump_pickles(prefix + "_preprocessor.pkl", [fit_tokenizer(Tokenizer, vocabulary), max_length])
+
+
+def write_ner_stand_in(model_dir, vocab_size, max_length):
+    """
+    Randomly initialized named entity recognition model, class and preprocessor files.
+    the CRF output layer is replaced by a softmax
+    """
+    from keras.models import Model
+    from keras.layers import Input, Embedding, LSTM, Dense, Bidirectional, TimeDistributed
+    from keras.preprocessing.text import Tokenizer
+    prefix = os.path.join(model_dir, STAND_IN_PREFIX % "named_entity_recognition")
+    vocabulary = synthetic_vocabulary(vocab_size)
+    input_layer = Input(shape=(max_length,))
+    x = Embedding(vocab_size, 100, input_length=max_length)(input_layer)
+    x = Bidirectional(LSTM(units=50, return_sequences=True))(x)
+    x = TimeDistributed(Dense(len(NER_LABELS), activation='softmax'))(x)
+    Model(inputs=input_layer, outputs=x).save(prefix + "_rnn_model.h5")
+    dump_pickles(prefix + "_rnn_class.pkl", [False, vocab_size, 100, None, max_length, {}])
+    dump_pickles(prefix + "_preprocessor.pkl", [fit_tokenizer(Tokenizer, vocabulary), max_length, vocab_size,
+                                                {label: i for i, label in enumerate(NER_LABELS)}])
+
+
+def write_clothing_stand_in(model_dir, image_size):
+    """
+    Randomly initialized clothing classifier model and class files
+    """
+    from keras.models import Model
+    from keras.layers import Input, Conv2D, MaxPooling2D, Flatten, Dense
+    prefix = os.path.join(model_dir, STAND_IN_PREFIX % "fashion_imagenet")
+    input_layer = Input(shape=(image_size, image_size, 3))
+    x = Conv2D(16, 3, activation='relu')(input_layer)
+    x = MaxPooling2D()(x)
+    x = Flatten()(x)
+    x = Dense(10, activation='softmax')(x)
+    Model(inputs=input_layer, outputs=x).save(prefix + "_rnn_model.h5")
+    dump_pickles(prefix + "_rnn_class.pkl", [image_size, image_size, {i: "class_%i" % i for i in range(10)}])
+
+
+def write_stand_in_models(root_dir, tasks, vocab_size=5000):
+    """
+    Writes randomly initialized models of the given tasks under the trained models directory of root_dir,
+    with the file names and pickle layouts expected by the evaluation loaders
+    """
+    model_dir = os.path.join(root_dir, "marabou/evaluation/trained_models")
+    os.makedirs(model_dir, exist_ok=True)
+    os.makedirs(os.path.join(root_dir, "marabou/evaluation/clothing_service_images"), exist_ok=True)
+    if "sentiment" in tasks:
+        write_sentiment_stand_in(model_dir, vocab_size, 250)
+    if "ner" in tasks:
+        write_ner_stand_in(model_dir, vocab_size, 75)
+    if "clothing" in tasks:
+        write_clothing_stand_in(model_dir, 64)
+
+
+def synthetic_text(rng, n_words, vocab_size):
+    """
+    Random sentence made of stand-in vocabulary words and a few unknown ones
+    """
+    words = ["word%i" % i for i in rng.randint(0, vocab_size + vocab_size // 10, n_words)]
+    return " ".join(words) + "."
+
+
+def synthetic_png(rng, image_size=64):
+    """
+    Random color image encoded as png
+    """
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.fromarray(rng.randint(0, 255, (image_size, image_size, 3)).astype(np.uint8)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def build_payloads(rng, mix, n_requests, text_words, vocab_size):
+    """
+    Sequence of (route name, payload) following the route mix
+    """
+    names = sorted(mix)
+    weights = np.array([mix[n] for n in names], dtype=np.float64)
+    choices = rng.choice(len(names), n_requests, p=weights / weights.sum())
+    image = synthetic_png(rng) if "clothing" in mix else None
+    payloads = []
+    for c in choices:
+        name = names[c]
+        if name == "clothing":
+            payloads.append((name, image))
+        else:
+            n_words = max(1, int(rng.normal(text_words, text_words / 4)))
+            payloads.append((name, synthetic_text(rng, n_words, vocab_size)))
+    return payloads
+
+
+class InProcessClient:
+    """
+    Sends requests to the flask application through its test client, one client per thread
+    """
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self._local = threading.local()
+
+    def send(self, name, payload):
+        if not hasattr(self._local, "client"):
+            self._local.client = self.flask_app.test_client()
+        if name == "clothing":
+            response = self._local.client.post(ROUTES[name], content_type="multipart/form-data",
+                                               data={"image": (io.BytesIO(payload), "%s.png" % uuid.uuid4().hex)})
+        else:
+            response = self._local.client.post(ROUTES[name], json={"content": payload})
+        return response.status_code
+
+
+class HttpClient:
+    """
+    Sends requests to a running evaluation service
+    """
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+
+    def send(self, name, payload):
+        if name == "clothing":
+            boundary = uuid.uuid4().hex
+            body = ("--%s\r\nContent-Disposition: form-data; name=\"image\"; filename=\"%s.png\"\r\n"
+                    "Content-Type: image/png\r\n\r\n" % (boundary, boundary)).encode() + payload +\
+                ("\r\n--%s--\r\n" % boundary).encode()
+            content_type = "multipart/form-data; boundary=%s" % boundary
+        else:
+            body = json.dumps({"content": payload}).encode()
+            content_type = "application/json"
+        http_request = urllib.request.Request(self.url + ROUTES[name], data=body, method="POST",
+                                              headers={"Content-Type": content_type})
+        with urllib.request.urlopen(http_request) as response:
+            response.read()
+            return response.status
+
+
+class ProcessSampler:
+    """
+    Samples the cpu time and resident memory of a process from /proc while the benchmark runs
+    """
+    def __init__(self, pid, interval=0.1):
+        self.pid = pid
+        self.interval = interval
+        self.rss_samples = []
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_cpu = None
+        self._start_time = None
+        self.cpu_seconds = None
+        self.wall_seconds = None
+
+    def cpu_time(self):
+        """
+        user and system cpu seconds consumed by the process so far
+        """
+        with open("/proc/%i/stat" % self.pid) as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+    def rss_mb(self):
+        """
+        resident memory of the process in megabytes
+        """
+        with open("/proc/%i/status" % self.pid) as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+        return 0.
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.rss_samples.append(self.rss_mb())
+
+    def start(self):
+        self._start_cpu = self.cpu_time()
+        self._start_time = time.perf_counter()
+        self.rss_samples = [self.rss_mb()]
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.wall_seconds = time.perf_counter() - self._start_time
+        self.cpu_seconds = self.cpu_time() - self._start_cpu
+        return {"cpu_seconds": round(self.cpu_seconds, 3),
+                "cpu_utilization": round(self.cpu_seconds / self.wall_seconds, 3),
+                "rss_mb_mean": round(float(np.mean(self.rss_samples)), 1),
+                "rss_mb_max": round(float(np.max(self.rss_samples)), 1)}
+
+
+def summarize(latencies, wall_seconds):
+    """
+    Latency percentiles in milliseconds and throughput of a list of request latencies in seconds
+    """
+    latencies_ms = 1000 * np.asarray(latencies)
+    return {"n_requests": len(latencies),
+            "throughput_rps": round(len(latencies) / wall_seconds, 2),
+            "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+            "p95_ms": round(float(np.percentile(latencies_ms, 95)), 3),
+            "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+            "mean_ms": round(float(np.mean(latencies_ms)), 3)}
+
+
+def run_load(client, payloads, concurrency, sampler):
+    """
+    Sends the payloads with concurrency parallel clients
+    Return:
+        dictionary containing the overall and per route latency summaries and the usage of the sampled process
+    """
+    records = []
+    records_lock = threading.Lock()
+
+    def send(name_payload):
+        name, payload = name_payload
+        start = time.perf_counter()
+        try:
+            status = client.send(name, payload)
+        except Exception:  # pylint: disable=broad-except
+            status = None
+        latency = time.perf_counter() - start
+        with records_lock:
+            records.append((name, latency, status))
+
+    if sampler is not None:
+        sampler.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(send, payloads))
+    wall_seconds = time.perf_counter() - start
+    usage = sampler.stop() if sampler is not None else None
+    results = {"overall": summarize([r[1] for r in records], wall_seconds), "routes": {}, "process": usage}
+    results["overall"]["n_errors"] = sum(r[2] != 200 for r in records)
+    for name in sorted(set(r[0] for r in records)):
+        route_records = [r for r in records if r[0] == name]
+        results["routes"][name] = summarize([r[1] for r in route_records], wall_seconds)
+        results["routes"][name]["n_errors"] = sum(r[2] != 200 for r in route_records)
+    return results
+
+
+def start_in_process_app(tasks, root_dir):
+    """
+    Imports the evaluation application and loads the models of the given tasks as its main function does
+    """
+    os.environ["MARABOU_HOME"] = root_dir
+    from src import app as serving_app
+    from src.utils.config_loader import ServingConfigReader
+    from src.utils.runtime import configure_runtime_from_config
+    config_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "config", "config_serving.json")
+    serving_config = ServingConfigReader(config_file)
+    configure_runtime_from_config(serving_config)
+    serving_app.register_models(serving_config)
+    serving_app.model_manager.configure([TASKS[t] for t in tasks])
+    serving_app.model_manager.preload(background=False)
+    return serving_app.app, serving_app.model_manager.status()
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """
+    Relative changes of the p95 latency and throughput of every route with respect to a previous run
+    Return:
+        list of the regressions exceeding the threshold
+    """
+    regressions = []
+    print("{:25} |{:>12}|{:>12}|{:>10}|".format("route metric", "baseline", "current", "change"))
+    for name, current in [("overall", results["overall"])] + list(results["routes"].items()):
+        previous = baseline["overall"] if name == "overall" else baseline["routes"].get(name)
+        if previous is None:
+            continue
+        for metric, higher_is_worse in [("p95_ms", True), ("p99_ms", True), ("throughput_rps", False)]:
+            change = (current[metric] - previous[metric]) / previous[metric] if previous[metric] else 0.
+            print("{:25} |{:12.3f}|{:12.3f}|{:9.1f}%|".format("%s %s" % (name, metric), previous[metric],
+                                                              current[metric], 100 * change))
+            if (change if higher_is_worse else -change) > threshold:
+                regressions.append("%s %s %+.1f%%" % (name, metric, 100 * change))
+    return regressions
+
+
+def git_commit():
+    """
+    Current commit of the repository, None outside of a git checkout
+    """
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_mix(mix):
+    """
+    Parses a route mix such as 'sentiment=0.6,ner=0.3,clothing=0.1'
+    """
+    weights = {}
+    for entry in mix.split(","):
+        name, weight = entry.split("=")
+        if name not in ROUTES:
+            raise ValueError("unknown route %s, possible values are %s" % (name, list(ROUTES)))
+        weights[name] = float(weight)
+    return weights
+
+
+def parse_arguments():
+    """
+    Parse file arguments
+    """
+    parser = argparse.ArgumentParser(description="End to end latency and throughput of the evaluation service")
+    parser.add_argument('--mix', default="sentiment=0.5,ner=0.4,clothing=0.1",
+                        help="share of the requests sent to each route")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4], help="parallel clients, one run each")
+    parser.add_argument('--n-requests', type=int, default=200, help="number of requests per run")
+    parser.add_argument('--text-words', type=int, default=60, help="mean number of words of the text payloads")
+    parser.add_argument('--url', default=None,
+                        help="url of a running service, the application is started in process otherwise")
+    parser.add_argument('--pid', type=int, default=None, help="pid of the running service, for its cpu and memory")
+    parser.add_argument('--trained-models', action="store_true",
+                        help="serve the models found under MARABOU_HOME instead of randomly initialized stand-ins")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="optional .json file receiving the results")
+    parser.add_argument('--baseline', default=None, help="results of a previous run to compare with")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="relative p95/p99 latency increase or throughput decrease counted as a regression")
+    return parser.parse_args()
+
+
+def main():
+    """main function"""
+    args = parse_arguments()
+    mix = parse_mix(args.mix)
+    vocab_size = 5000
+    pid = args.pid
+    model_status = None
+    if args.url is not None:
+        client = HttpClient(args.url)
+    else:
+        root_dir = os.environ.get("MARABOU_HOME", "")
+        if not args.trained_models:
+            root_dir = tempfile.mkdtemp(prefix="marabou_benchmark_")
+            print("===========> writing stand-in models under %s" % root_dir)
+            write_stand_in_models(root_dir, list(mix), vocab_size)
+        flask_app, model_status = start_in_process_app(list(mix), os.path.join(root_dir, ""))
+        client = InProcessClient(flask_app)
+        pid = os.getpid()
+    rng = np.random.RandomState(args.seed)
+    runs = []
+    for concurrency in args.concurrency:
+        print("===========> %i requests with %i parallel clients" % (args.n_requests, concurrency))
+        payloads = build_payloads(rng, mix, args.n_requests, args.text_words, vocab_size)
+        sampler = ProcessSampler(pid) if pid is not None else None
+        run = run_load(client, payloads, concurrency, sampler)
+        run["concurrency"] = concurrency
+        runs.append(run)
+        print("{:12} |{:>10}|{:>10}|{:>10}|{:>10}|{:>8}|".format(
+            "route", "rps", "p50 ms", "p95 ms", "p99 ms", "errors"))
+        for name, summary in [("overall", run["overall"])] + list(run["routes"].items()):
+            print("{:12} |{:10.2f}|{:10.3f}|{:10.3f}|{:10.3f}|{:8}|".format(
+                name, summary["throughput_rps"], summary["p50_ms"], summary["p95_ms"], summary["p99_ms"],
+                summary["n_errors"]))
+        if run["process"] is not None:
+            print("----> cpu utilization %.2f, rss %.1f MB (max %.1f MB)" % (
+                run["process"]["cpu_utilization"], run["process"]["rss_mb_mean"], run["process"]["rss_mb_max"]))
+    results = {"commit": git_commit(), "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"), "arguments": vars(args),
+               "models": model_status, "runs": runs}
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print("----> results saved to %s" % args.output)
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = []
+        baseline_runs = {run["concurrency"]: run for run in baseline["runs"]}
+        for run in runs:
+            if run["concurrency"] in baseline_runs:
+                print("===========> comparison with %s, concurrency %i" % (args.baseline, run["concurrency"]))
+                regressions.extend("concurrency %i: %s" % (run["concurrency"], r) for r in
+                                   compare_with_baseline(run, baseline_runs[run["concurrency"]], args.threshold))
+        if len(regressions) > 0:
+            print("----> regressions above %.0f%%:\n%s" % (100 * args.threshold, "\n".join(regressions)))
+            sys.exit(1)
+        print("----> no regression above %.0f%%" % (100 * args.threshold))
+
+
+if __name__ == '__main__':
+    main()
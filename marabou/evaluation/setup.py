@@ -7,6 +7,8 @@ INSTALL_REQUIREMENTS = [
     'flask==1.1.2',
     'flask_restful',
     'nltk==3.5',
+    'scipy',
+    'scikit-learn==0.23.1',
     'keras==2.3.1',
     'gunicorn',
     'tensorflow==2.2.0',
@@ -31,7 +33,9 @@ setup(name='marabou',
       version='0.1.0',
       zip_safe=False,
       entry_points={
-          'console_scripts': ['marabou-evaluation=src.app:main']
+          'console_scripts': ['marabou-evaluation=src.app:main',
+                              'marabou-autotune-runtime=src.utils.runtime:main',
+                              'marabou-backend-parity=src.utils.backend_parity:main']
       },
       dependency_links=['git+https://www.github.com/keras-team/keras-contrib.git/@master#egg=keras-contrib'],
       install_requires=[INSTALL_REQUIREMENTS, "keras-contrib"],
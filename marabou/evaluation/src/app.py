@@ -1,26 +1,66 @@
 import os
+import math
 import sys
 import json
+import threading
+import time
+from functools import partial
 from typing import List
-from flask import Flask, render_template, request
+from src.utils.runtime import configure_runtime_from_config, set_thread_environment_from_config
+# the openmp and blas thread pools are sized when numpy and tensorflow are imported
+set_thread_environment_from_config()
+from flask import Flask, Response, render_template, request, stream_with_context
 from flask_restful import reqparse, Api, Resource
+import numpy as np
 from PIL import Image
 from src.models.sentiment_analysis_rnn import RNNModel as SARNN
 from src.models.sentiment_analysis_rnn import DataPreprocessor as SAPreprocessor
 from src.models.named_entity_recognition_rnn import RNNModel as NERRNN
 from src.models.named_entity_recognition_rnn import DataPreprocessor as NERPreprocessor
 from src.models.cnn_classifier import CNNClothing
+from src.models.sentiment_analysis_tfidf import DumbModel, TfidfScorer
+from src.models.sentiment_cascade import CascadeModel
+from src.models.long_document import LongDocumentModel
+from src.models.document_ner import DocumentNER
+from src.models.backends import model_file_suffix
+from src.utils.config_loader import ServingConfigReader
+from src.utils.model_manager import ModelManager, ModelNotAvailableError
+from src.utils.job_store import JobStore, JobWorkerPool, JobNotFoundError
+from src.utils.streaming import NDJSON_MIMETYPE, stream_results
+from src.utils import metrics
+from src.utils.profiler import profile_for
 
 
+SENTIMENT_ANALYSIS = "sentiment_analysis"
+NAMED_ENTITY_RECOGNITION = "named_entity_recognition"
+CLOTHING_CLASSIFIER = "clothing_classifier"
+
 app = Flask(__name__)
 api = Api(app)
-global_model_config = list()
+model_manager = ModelManager()
+job_store = None
+profile_lock = threading.Lock()
+profile_state = {"running": False, "last_profile": None}
 
 
 parser = reqparse.RequestParser()
 parser.add_argument('query')
 
 
+def streaming_response(task_name: str, scorer):
+    """
+    chunked newline delimited json response scoring the request body as it is read
+    Args:
+        task_name: name of the task, checked before the response starts
+        scorer: function scoring a list of items
+    Return:
+        flask response
+    """
+    model_manager.get(task_name)
+    lines = stream_results(request.stream, scorer, app.config.get("STREAMING_CHUNK_SIZE", 64))
+    return Response(stream_with_context(lines), mimetype=NDJSON_MIMETYPE)
+
+
 # sentiment analysis callers
 class PredictSentiment(Resource):
     """
@@ -39,21 +79,30 @@ class PredictSentiment(Resource):
         Return:
             dictionary containing probilities prediction as value sorted by each string as key
         """
+        metrics.observe_batch_size(SENTIMENT_ANALYSIS, len(input_list))
+        query_list = input_list
         if self.model.model_name == "rnn":
-            query_list = SAPreprocessor.preprocess_data(input_list, self.pre_processor)
-        probs = self.model.predict_proba(query_list)
+            with metrics.stage(SENTIMENT_ANALYSIS, "preprocess"):
+                query_list = SAPreprocessor.preprocess_data(input_list, self.pre_processor)
+        with metrics.stage(SENTIMENT_ANALYSIS, "predict"):
+            probs = self.model.predict_proba(query_list)
         return probs
 
 
 @app.route('/api/sentimentAnalysis', methods=['POST', 'GET'])
 def sentiment_analysis():
     """
-    sentiment analysis service function
+    sentiment analysis service function. a newline delimited json body (content type application/x-ndjson)
+    is scored chunk by chunk and answered with one json line per input as each chunk finishes
     """
     if request.method == 'POST':
-        task_content = request.json['content']
-        new_prediction = PredictSentiment(model=global_model_config[0], pre_processor=global_model_config[1])
-        output = new_prediction.get_from_service([task_content])
+        if request.mimetype == NDJSON_MIMETYPE:
+            return streaming_response(SENTIMENT_ANALYSIS, stream_sentiment_analysis)
+        with metrics.stage(SENTIMENT_ANALYSIS, "parse"):
+            task_content = request.json['content']
+        with model_manager.acquire(SENTIMENT_ANALYSIS) as (model, pre_processor):
+            new_prediction = PredictSentiment(model=model, pre_processor=pre_processor)
+            output = new_prediction.get_from_service([task_content])
         return json.dumps(output[0] * 100)
     else:
         return None
@@ -77,27 +126,70 @@ class PredictEntities(Resource):
         Return:
             dictionary containing probilities prediction as value sorted by each string as key
         """
-        questions_list_encoded, questions_list_tokenized, n_tokens =\
-            NERPreprocessor.preprocess_data(input_list, self.pre_processor)
-        preds = self.model.predict(questions_list_encoded, self.pre_processor["labels_to_idx"], n_tokens)
-        display_result = self.model.visualize(questions_list_tokenized, preds)
+        questions_list_tokenized, preds = self.predict_tags(input_list)
+        with metrics.stage(NAMED_ENTITY_RECOGNITION, "postprocess"):
+            display_result = self.model.visualize(questions_list_tokenized, preds)
         return display_result
 
+    def get_each_from_service(self, input_list: List[str]):
+        """
+        tags the query strings in a single batch
+        Args:
+            input_list: textual input
+        Return:
+            list containing the display of get_from_service for each string
+        """
+        questions_list_tokenized, preds = self.predict_tags(input_list)
+        with metrics.stage(NAMED_ENTITY_RECOGNITION, "postprocess"):
+            display_results = [self.model.visualize([tokens], [labels])
+                               for tokens, labels in zip(questions_list_tokenized, preds)]
+        return display_results
+
+    def predict_tags(self, input_list: List[str]):
+        """
+        tokenized query strings and their predicted labels
+        """
+        metrics.observe_batch_size(NAMED_ENTITY_RECOGNITION, len(input_list))
+        with metrics.stage(NAMED_ENTITY_RECOGNITION, "preprocess"):
+            questions_list_encoded, questions_list_tokenized, n_tokens =\
+                NERPreprocessor.preprocess_data(input_list, self.pre_processor)
+        with metrics.stage(NAMED_ENTITY_RECOGNITION, "predict"):
+            preds = self.model.predict(questions_list_encoded, self.pre_processor["labels_to_idx"], n_tokens)
+        return questions_list_tokenized, preds
+
 
 @app.route('/api/namedEntityRecognition', methods=['POST', 'GET'])
 def named_entity_recognition():
     """
-    named entity recognition service function
+    named entity recognition service function. a newline delimited json body (content type application/x-ndjson)
+    is tagged chunk by chunk and answered with one json line per document as each chunk finishes
     """
     if request.method == 'POST':
-        task_content = request.json['content']
-        new_prediction = PredictEntities(model=global_model_config[2], pre_processor=global_model_config[3])
-        output = new_prediction.get_from_service([task_content])
+        if request.mimetype == NDJSON_MIMETYPE:
+            return streaming_response(NAMED_ENTITY_RECOGNITION, stream_named_entity_recognition)
+        with metrics.stage(NAMED_ENTITY_RECOGNITION, "parse"):
+            task_content = request.json['content']
+        with model_manager.acquire(NAMED_ENTITY_RECOGNITION) as (model, pre_processor):
+            new_prediction = PredictEntities(model=model, pre_processor=pre_processor)
+            output = new_prediction.get_from_service([task_content])
         return json.dumps(output)
     else:
         return None
 
 
+@app.route('/api/namedEntityRecognition/document', methods=['POST'])
+def document_named_entity_recognition():
+    """
+    named entity recognition service function for documents of any length. the content is either a single
+    document or a list of documents, the tags and entities are returned with their character offsets
+    """
+    task_content = request.json['content']
+    documents = [task_content] if isinstance(task_content, str) else list(task_content)
+    with model_manager.acquire(NAMED_ENTITY_RECOGNITION) as (model, pre_processor):
+        output = DocumentNER(model=model, pre_processor=pre_processor).predict_documents(documents)
+    return json.dumps(output[0] if isinstance(task_content, str) else output)
+
+
 # clothing classifier callers
 class ClothingClassifier(Resource):
     """
@@ -115,8 +207,11 @@ class ClothingClassifier(Resource):
         Return:
             dictionary containing probilities prediction as value sorted by each string as key
         """
-        image = self.model.load_image(image_url)
-        image_class = self.model.predict(image)
+        metrics.observe_batch_size(CLOTHING_CLASSIFIER, 1)
+        with metrics.stage(CLOTHING_CLASSIFIER, "load_image"):
+            image = self.model.load_image(image_url)
+        with metrics.stage(CLOTHING_CLASSIFIER, "predict"):
+            image_class = self.model.predict(image)
         return image_class
 
 
@@ -126,17 +221,326 @@ def clothing_classifier():
     sentiment analysis service function
     """
     if request.method == 'POST':
-        image = request.files['image']
-        img = Image.open(image.stream)
-        img_loc = os.environ.get("MARABOU_HOME") + "marabou/evaluation/clothing_service_images/" + str(image.filename)
-        img.save(img_loc)
-        new_prediction = ClothingClassifier(model=global_model_config[4])
-        img_class = new_prediction.get_from_service(img_loc)
+        model_manager.get(CLOTHING_CLASSIFIER)
+        with metrics.stage(CLOTHING_CLASSIFIER, "image_write"):
+            image = request.files['image']
+            img = Image.open(image.stream)
+            img_loc = os.environ.get("MARABOU_HOME") + "marabou/evaluation/clothing_service_images/" +\
+                str(image.filename)
+            img.save(img_loc)
+        with model_manager.acquire(CLOTHING_CLASSIFIER) as model:
+            new_prediction = ClothingClassifier(model=model)
+            img_class = new_prediction.get_from_service(img_loc)
         return json.dumps(img_class)
     else:
         return None
 
 
+@app.route('/api/health', methods=['GET'])
+def health():
+    """
+    readiness state of every served model
+    """
+    return json.dumps(model_manager.status())
+
+
+@app.route('/api/health/<task_name>', methods=['GET'])
+def task_health(task_name):
+    """
+    readiness probe for a single task, answers 503 as long as its model is not loaded
+    """
+    status = model_manager.status()
+    if task_name not in status:
+        return json.dumps({"error": "unknown task %s" % task_name}), 404
+    return json.dumps(status[task_name]), 200 if model_manager.is_ready(task_name) else 503
+
+
+@app.route('/api/sentimentAnalysis/cascade', methods=['GET'])
+def sentiment_cascade_stats():
+    """
+    escalation rate of the sentiment analysis cascade since its model was loaded
+    """
+    with model_manager.acquire(SENTIMENT_ANALYSIS) as (model, _):
+        if not isinstance(model, CascadeModel):
+            return json.dumps({"error": "the sentiment analysis cascade is disabled"}), 404
+        return json.dumps(model.stats())
+
+
+def valid_admin_token():
+    """
+    if the environment variable MARABOU_ADMIN_TOKEN is set, admin requests must send the same value
+    in the X-Admin-Token header
+    """
+    admin_token = os.environ.get("MARABOU_ADMIN_TOKEN")
+    return admin_token is None or request.headers.get("X-Admin-Token") == admin_token
+
+
+@app.route('/api/admin/reload/<task_name>', methods=['POST'])
+def reload_model(task_name):
+    """
+    loads the latest trained model of a task in the background and swaps it in once it is warmed up.
+    if the environment variable MARABOU_ADMIN_TOKEN is set, the same value is expected in the X-Admin-Token header
+    """
+    if not valid_admin_token():
+        return json.dumps({"error": "invalid admin token"}), 403
+    if task_name not in model_manager.status():
+        return json.dumps({"error": "unknown task %s" % task_name}), 404
+    if not model_manager.reload(task_name, background=True):
+        return json.dumps({"error": "a reload of %s is already running" % task_name}), 409
+    return json.dumps(model_manager.status()[task_name]), 202
+
+
+def run_profile(seconds: float, interval: float, trace_tensorflow: bool):
+    """ profiling worker, expects the profile lock to be held """
+    perf_dir = os.path.join(os.environ.get("MARABOU_HOME"), "marabou/evaluation/perf")
+    try:
+        profile_file = profile_for(seconds, "serving_%s" % time.strftime("%Y%m%d_%H%M%S"), perf_dir, interval,
+                                   trace_tensorflow)
+        profile_state["last_profile"] = profile_file
+    finally:
+        profile_state["running"] = False
+        profile_lock.release()
+
+
+@app.route('/api/admin/profile', methods=['POST'])
+def start_profile():
+    """
+    samples the python stacks of the service for 'seconds' seconds (10 by default, 300 at most) every 'interval_ms'
+    milliseconds (5 by default, 1 at least), along with the tensorflow trace if 'tf_trace' is 1. the flamegraph
+    compatible collapsed stacks are written under marabou/evaluation/perf
+    """
+    if not valid_admin_token():
+        return json.dumps({"error": "invalid admin token"}), 403
+    try:
+        seconds = float(request.args.get('seconds', 10))
+        interval_ms = float(request.args.get('interval_ms', 5))
+    except ValueError:
+        return json.dumps({"error": "seconds and interval_ms must be numbers"}), 400
+    if not math.isfinite(seconds) or not math.isfinite(interval_ms) or seconds <= 0:
+        return json.dumps({"error": "seconds must be positive and interval_ms finite"}), 400
+    seconds = min(seconds, 300)
+    # a shorter interval turns the sampler into a busy loop holding the gil
+    interval = max(interval_ms, 1.) / 1000
+    trace_tensorflow = request.args.get('tf_trace', '0') == '1'
+    if not profile_lock.acquire(blocking=False):
+        return json.dumps({"error": "a profile is already running"}), 409
+    profile_state["running"] = True
+    thread = threading.Thread(target=run_profile, args=(seconds, interval, trace_tensorflow), name="profile")
+    thread.daemon = True
+    thread.start()
+    return json.dumps(dict(profile_state, seconds=seconds)), 202
+
+
+@app.route('/api/admin/profile', methods=['GET'])
+def profile_status():
+    """
+    whether a profile is running and the file of the last one
+    """
+    if not valid_admin_token():
+        return json.dumps({"error": "invalid admin token"}), 403
+    return json.dumps(profile_state)
+
+
+def stream_sentiment_analysis(items: List[str]):
+    """ positive review percentages of a chunk of a streaming request, as answered by the json route """
+    with model_manager.acquire(SENTIMENT_ANALYSIS) as (model, pre_processor):
+        probs = PredictSentiment(model=model, pre_processor=pre_processor).get_from_service([str(i) for i in items])
+    return [float(p) * 100 for p in probs]
+
+
+def stream_named_entity_recognition(items: List[str]):
+    """ tagged words of each document of a chunk of a streaming request, as answered by the json route """
+    with model_manager.acquire(NAMED_ENTITY_RECOGNITION) as (model, pre_processor):
+        return PredictEntities(model=model, pre_processor=pre_processor).get_each_from_service(
+            [str(i) for i in items])
+
+
+def score_sentiment_analysis(items: List[str]):
+    """ positive review probability of a batch of job items """
+    with model_manager.acquire(SENTIMENT_ANALYSIS) as (model, pre_processor):
+        probs = PredictSentiment(model=model, pre_processor=pre_processor).get_from_service([str(i) for i in items])
+    return [float(p) for p in probs]
+
+
+def score_named_entity_recognition(items: List[str]):
+    """ tagged tokens and entities of a batch of job documents """
+    with model_manager.acquire(NAMED_ENTITY_RECOGNITION) as (model, pre_processor):
+        return DocumentNER(model=model, pre_processor=pre_processor).predict_documents([str(i) for i in items])
+
+
+def load_job_image(model, image_path):
+    """ image of a clothing job, None when it cannot be read or lies outside the job input directory """
+    try:
+        image_path = get_job_store().resolve_input_path(str(image_path))
+    except ValueError:
+        return None
+    return model.load_image(image_path)
+
+
+def score_clothing_classifier(items: List[str]):
+    """ class of a batch of job images given as paths of the job input directory, None for unreadable images """
+    with model_manager.acquire(CLOTHING_CLASSIFIER) as model:
+        images = [load_job_image(model, image_path) for image_path in items]
+        valid_idx = [i for i, image in enumerate(images) if image is not None]
+        results = [None] * len(items)
+        if len(valid_idx) > 0:
+            labels = model.predict(np.concatenate([images[i] for i in valid_idx]))
+            for i, label in zip(valid_idx, labels):
+                results[i] = label
+    return results
+
+
+JOB_SCORERS = {SENTIMENT_ANALYSIS: score_sentiment_analysis,
+               NAMED_ENTITY_RECOGNITION: score_named_entity_recognition,
+               CLOTHING_CLASSIFIER: score_clothing_classifier}
+
+
+def get_job_store():
+    """ the job store of the application, jobs being disabled otherwise """
+    if job_store is None:
+        raise ModelNotAvailableError("asynchronous jobs are not enabled on this deployment")
+    return job_store
+
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """
+    queues an asynchronous scoring job. the json body contains the task name and either 'content', a list of
+    items or a jsonl string, or 'file', the path of a jsonl file of the job input directory with one item per line.
+    the images of the clothing classifier are also paths of the job input directory
+    """
+    store = get_job_store()
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return json.dumps({"error": "the body must be a json object"}), 400
+    task_name = body.get('task')
+    if task_name not in model_manager.enabled_tasks:
+        return json.dumps({"error": "task %s is not enabled on this deployment" % task_name}), 404
+    content = body.get('content')
+    try:
+        if isinstance(content, str):
+            content = [json.loads(line) for line in content.splitlines() if line.strip() != ""]
+        if task_name == CLOTHING_CLASSIFIER and content is not None:
+            for item in content:
+                store.resolve_input_path(str(item.get("content") if isinstance(item, dict) else item))
+        job_id = store.submit(task_name, items=content, input_file=body.get('file'))
+    except ValueError as error:
+        return json.dumps({"error": str(error)}), 400
+    return json.dumps(store.get(job_id)), 202
+
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """
+    most recently submitted jobs
+    """
+    try:
+        limit = int(request.args.get('limit', 100))
+    except ValueError:
+        return json.dumps({"error": "limit must be an integer"}), 400
+    return json.dumps(get_job_store().list_jobs(limit))
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """
+    state and progress of a job
+    """
+    return json.dumps(get_job_store().get(job_id))
+
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """
+    cancels a queued or running job, a running job stops after its current batch
+    """
+    store = get_job_store()
+    if not store.cancel(job_id):
+        return json.dumps({"error": "job %s is already finished" % job_id}), 409
+    return json.dumps(store.get(job_id))
+
+
+@app.route('/api/jobs/<job_id>/results', methods=['GET'])
+def job_results(job_id):
+    """
+    jsonl results written so far, one line per scored item. offset and limit select a range of lines
+    so that the results of a running job can be downloaded as they finish
+    """
+    limit = request.args.get('limit')
+    try:
+        offset = int(request.args.get('offset', 0))
+        limit = int(limit) if limit is not None else None
+    except ValueError:
+        return json.dumps({"error": "offset and limit must be integers"}), 400
+    lines = get_job_store().read_results(job_id, offset, limit)
+    return Response("".join(lines), mimetype="application/x-ndjson")
+
+
+@app.errorhandler(JobNotFoundError)
+def job_not_found(error):
+    """
+    answers requests targeting an unknown job
+    """
+    return json.dumps({"error": str(error)}), 404
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """
+    request, stage, batch size, model and job queue metrics in the prometheus text format
+    """
+    if not metrics.registry.enabled:
+        return json.dumps({"error": "metrics are disabled"}), 404
+    return Response(metrics.registry.render(), mimetype=metrics.CONTENT_TYPE)
+
+
+@app.before_request
+def start_request_metrics():
+    """
+    starts the request timer when metrics are enabled
+    """
+    metrics.start_request()
+
+
+@app.after_request
+def end_request_metrics(response):
+    """
+    records the request duration and adds the Server-Timing header when enabled
+    """
+    server_timing = metrics.end_request(request.endpoint, response.status_code)
+    if server_timing is not None:
+        response.headers["Server-Timing"] = server_timing
+    return response
+
+
+def collect_service_metrics():
+    """
+    model and job queue metrics read at scrape time
+    """
+    status = model_manager.status()
+    families = [("marabou_model_ready", "gauge", "1 if the model of the task is loaded and serving",
+                 [({"task": t}, int(s["state"] == "ready")) for t, s in status.items()]),
+                ("marabou_model_load_seconds", "gauge", "duration of the last model load of the task",
+                 [({"task": t}, s["load_time"]) for t, s in status.items() if s["load_time"] is not None]),
+                ("marabou_requests_in_flight", "gauge", "requests currently using the model of the task",
+                 [({"task": t}, s["in_flight"]) for t, s in status.items()])]
+    if job_store is not None:
+        families.append(("marabou_jobs", "gauge", "asynchronous jobs per state, the queued ones being the queue depth",
+                         [({"state": state}, n) for state, n in job_store.count_by_state().items()]))
+    return families
+
+
+metrics.registry.add_collector(collect_service_metrics)
+
+
+@app.errorhandler(ModelNotAvailableError)
+def model_not_available(error):
+    """
+    answers requests targeting a disabled or not yet loadable model
+    """
+    return json.dumps({"error": str(error)}), 503
+
+
 @app.route('/', methods=['POST', 'GET'])
 def index():
     """
@@ -145,37 +549,156 @@ def index():
     return render_template('index.html')
 
 
-def main():
-    """ if boolean is true bring the application up"""
-    app_up = len(sys.argv) < 2
-
-    sentiment_analysis_model = None
-    sentiment_analysis_model, preprocessor_file = SARNN.load_model()
+def load_sentiment_analysis(backend="keras", variant="rnn", cascade_band=None, long_document=None):
+    """
+    loads the sentiment analysis model and its preprocessor, scoring overlapping windows of long documents
+    if long_document settings are given and behind the tfidf model if cascade_band is set
+    """
+    if variant == "tfidf":
+        tfidf_scorer = TfidfScorer.load_model()
+        if tfidf_scorer is None:
+            raise ValueError("no tfidf scorer bundle found under trained_models")
+        return tfidf_scorer, None
+    sentiment_analysis_model, preprocessor_file = SARNN.load_model(backend=backend, variant=variant)
     if sentiment_analysis_model is None or preprocessor_file is None:
         raise ValueError("Please make sure to set the correct model path and Project root\
                          as environment variable MARABOU_HOME")
     sentiment_analysis_pre_processor = SAPreprocessor.load_preprocessor(preprocessor_file)
+    if long_document is not None:
+        sentiment_analysis_model = LongDocumentModel(sentiment_analysis_model, sentiment_analysis_pre_processor,
+                                                     **long_document)
+    if cascade_band is not None:
+        # the numpy scorer bundle is preferred over the pickled sklearn model
+        tfidf_model = TfidfScorer.load_model()
+        if tfidf_model is None:
+            tfidf_model = DumbModel.load_model()
+        if tfidf_model is None:
+            raise ValueError("the sentiment analysis cascade requires a tfidf model under trained_models")
+        sentiment_analysis_model = CascadeModel(tfidf_model, sentiment_analysis_model,
+                                                sentiment_analysis_pre_processor, cascade_band)
+    return sentiment_analysis_model, sentiment_analysis_pre_processor
 
-    ner_model, preprocessor_file = NERRNN.load_model()
-    ner_pre_processor = NERPreprocessor.load_preprocessor(preprocessor_file)
-    if ner_model is None or ner_pre_processor is None:
+
+def load_named_entity_recognition(backend="keras"):
+    """ loads the named entity recognition model and its preprocessor """
+    ner_model, preprocessor_file = NERRNN.load_model(backend=backend)
+    if ner_model is None or preprocessor_file is None:
         raise ValueError("Please make sure to set the correct model path and Project root\
                          as environment variable MARABOU_HOME")
+    ner_pre_processor = NERPreprocessor.load_preprocessor(preprocessor_file)
+    return ner_model, ner_pre_processor
+
 
-    clothing_model = CNNClothing.load_model()
+def load_clothing_classifier(backend="keras"):
+    """ loads the clothing classification model """
+    clothing_model = CNNClothing.load_model(backend=backend)
     if clothing_model is None:
         raise ValueError("Please make sure to set the correct model path and Project root\
                          as environment variable MARABOU_HOME")
+    return clothing_model
+
+
+def warm_up_sentiment_analysis(loaded_model, batch_sizes):
+    """ runs synthetic batches through the model so that steady state latency applies from the first request """
+    model, pre_processor = loaded_model
+    model.warm_up(batch_sizes)
+    PredictSentiment(model, pre_processor).get_from_service(["warm up"])
+
+
+def warm_up_named_entity_recognition(loaded_model, batch_sizes):
+    """ runs synthetic batches through the model so that steady state latency applies from the first request """
+    model, pre_processor = loaded_model
+    model.warm_up(batch_sizes)
+    PredictEntities(model, pre_processor).get_from_service(["warm up"])
+
+
+def warm_up_clothing_classifier(model, batch_sizes):
+    """ runs synthetic batches through the model so that steady state latency applies from the first request """
+    model.warm_up(batch_sizes)
+
+
+def register_models(serving_config: ServingConfigReader):
+    """
+    registers the loader and the warm up stage of every served model
+    Args:
+        serving_config: evaluation service configuration
+    Return:
+        None
+    """
+    batch_sizes = serving_config.warm_up_batch_sizes
+    cascade_band = serving_config.cascade_uncertainty_band if serving_config.cascade_enabled else None
+    long_document = serving_config.long_document_settings if serving_config.long_document_enabled else None
+    # only the files loaded by each model trigger its reload, not the other artifacts of the same task
+    variant = serving_config.model_variant(SENTIMENT_ANALYSIS)
+    sentiment_files = [model_file_suffix(serving_config.backend(SENTIMENT_ANALYSIS), variant), "preprocessor.pkl",
+                       variant + "_class.pkl"]
+    if cascade_band is not None:
+        sentiment_files += ["tfidf_model.pickle", "tfidf_scorer.npz"]
+    model_manager.register(SENTIMENT_ANALYSIS,
+                           partial(load_sentiment_analysis, backend=serving_config.backend(SENTIMENT_ANALYSIS),
+                                   variant=variant, cascade_band=cascade_band, long_document=long_document),
+                           partial(warm_up_sentiment_analysis, batch_sizes=batch_sizes),
+                           file_pattern="sentiment_analysis", file_suffixes=sentiment_files)
+    model_manager.register(NAMED_ENTITY_RECOGNITION,
+                           partial(load_named_entity_recognition,
+                                   backend=serving_config.backend(NAMED_ENTITY_RECOGNITION)),
+                           partial(warm_up_named_entity_recognition, batch_sizes=batch_sizes),
+                           file_pattern="named_entity_recognition",
+                           file_suffixes=[model_file_suffix(serving_config.backend(NAMED_ENTITY_RECOGNITION)),
+                                          "preprocessor.pkl", "rnn_class.pkl"])
+    model_manager.register(CLOTHING_CLASSIFIER,
+                           partial(load_clothing_classifier, backend=serving_config.backend(CLOTHING_CLASSIFIER)),
+                           partial(warm_up_clothing_classifier, batch_sizes=batch_sizes),
+                           file_pattern="fashion_imagenet",
+                           file_suffixes=[model_file_suffix(serving_config.backend(CLOTHING_CLASSIFIER)),
+                                          "rnn_class.pkl"])
+
+
+def start_job_workers(serving_config: ServingConfigReader, root_dir: str):
+    """
+    opens the job store and starts the workers processing the queued jobs
+    Args:
+        serving_config: evaluation service configuration
+        root_dir: project root directory
+    Return:
+        None
+    """
+    global job_store  # pylint: disable=global-statement
+    job_store = JobStore(os.path.join(root_dir, serving_config.jobs_directory))
+    scorers = {task_name: JOB_SCORERS[task_name] for task_name in model_manager.enabled_tasks}
+    JobWorkerPool(job_store, scorers, serving_config.jobs_n_workers, serving_config.jobs_batch_size).start()
+
+
+def main():
+    """ if boolean is true bring the application up"""
+    app_up = len(sys.argv) < 2
 
-    global_model_config.extend([sentiment_analysis_model, sentiment_analysis_pre_processor,
-                                ner_model, ner_pre_processor, clothing_model])
+    root_dir = os.environ.get("MARABOU_HOME")
+    if root_dir is None:
+        raise ValueError("please make sure to setup the environment variable MARABOU_HOME to point\
+                         for the root of the project")
+    config_file_path = os.path.join(root_dir, "marabou/evaluation/config/config_serving.json")
+    serving_config = ServingConfigReader(config_file_path)
+    # thread pools must be sized before the first tensorflow operation runs
+    configure_runtime_from_config(serving_config)
+    register_models(serving_config)
+    app.config["STREAMING_CHUNK_SIZE"] = serving_config.streaming_chunk_size
+    metrics.configure(serving_config.metrics_enabled, serving_config.server_timing_enabled)
+    model_manager.configure(serving_config.enabled_tasks)
     if app_up:
-        # the PredictSentiment methode will be executed in the sentimentAnalysis() method
+        # models are loaded in the background, or by the first request targeting them
+        if serving_config.preload_models:
+            model_manager.preload(background=True)
+        if serving_config.watch_models_interval > 0:
+            model_manager.watch(serving_config.watch_models_interval)
+        if serving_config.jobs_enabled:
+            start_job_workers(serving_config, root_dir)
         port = int(os.environ.get('PORT', 5000))
-        app.run(host='0.0.0.0', port=port, threaded=False)
+        # one thread per request: a model loading on first request or an ndjson stream only holds its own thread
+        app.run(host='0.0.0.0', port=port, threaded=True)
     else:
-        print(PredictSentiment(sentiment_analysis_model, sentiment_analysis_pre_processor))
-        print(PredictEntities(ner_model, ner_pre_processor))
+        model_manager.preload(background=False)
+        print(json.dumps(model_manager.status(), indent=2))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,227 @@
+import threading
+import numpy as np
+from src.models.inference import WARM_UP_BATCH_SIZES, build_predict_function, run_inference, warm_up
+
+
+class InferenceBackend:
+    """
+    Runtime executing the forward pass of a served model.
+    The evaluation models only go through this interface, so that the runtime of each task can be picked
+    in the configuration without touching the model or route code
+    """
+    name = None
+
+    def __init__(self, model_file, input_dtype=np.float32):
+        self.model_file = model_file
+        self.input_dtype = input_dtype
+        self.load()
+
+    def load(self):
+        """
+        Loads the model file into the runtime
+        """
+        raise NotImplementedError
+
+    @property
+    def input_signature(self):
+        """
+        shape of the model input, the batch dimension being None, and type of the input expected by the backend
+        """
+        raise NotImplementedError
+
+    def warm_up(self, batch_sizes=None):
+        """
+        Runs synthetic inputs of every served batch size through the model before it serves requests
+        Args:
+            batch_sizes: list of batch sizes served by the application
+        Return:
+            None
+        """
+        if batch_sizes is None:
+            batch_sizes = WARM_UP_BATCH_SIZES
+        sample_shape = tuple(self.input_signature[0][1:])
+        for batch_size in batch_sizes:
+            self.run_batch(np.zeros((batch_size,) + sample_shape, dtype=self.input_dtype))
+
+    def run_batch(self, inputs):
+        """
+        Inference method
+        Args:
+            inputs: batch of model inputs
+        Return:
+            numpy array containing the model outputs
+        """
+        raise NotImplementedError
+
+
+class KerasBackend(InferenceBackend):
+    """
+    Runs a keras model through its compiled forward pass, large batches falling back to model.predict.
+    Models loaded with standalone keras have no compiled forward pass and run through predict_on_batch.
+    The keras 2.3 models share the global keras graph and session and are not safe to call from several
+    request threads at once, so the batches of a model run one at a time
+    """
+    name = "keras"
+
+    def __init__(self, model_file, input_dtype=np.float32, load_function=None):
+        self.load_function = load_function
+        self.model = None
+        self.predict_function = None
+        self._lock = threading.Lock()
+        super().__init__(model_file, input_dtype)
+
+    def load(self):
+        if self.load_function is None:
+            from tensorflow.keras.models import load_model
+            self.load_function = load_model
+        self.model = self.load_function(self.model_file)
+        self.predict_function = build_predict_function(self.model, self.input_dtype)
+
+    @property
+    def input_signature(self):
+        return tuple(self.model.input_shape), self.input_dtype
+
+    def warm_up(self, batch_sizes=None):
+        with self._lock:
+            warm_up(self.model, self.predict_function, self.input_dtype, batch_sizes)
+
+    def run_batch(self, inputs):
+        with self._lock:
+            return run_inference(self.model, self.predict_function, inputs, self.input_dtype)
+
+
+class TFLiteBackend(InferenceBackend):
+    """
+    Runs a model exported by export_quantized through the lightweight tflite interpreter.
+    The tflite-runtime package is used when installed, tensorflow otherwise
+    """
+    name = "tflite"
+
+    def __init__(self, model_file, input_dtype=np.float32):
+        self.interpreter = None
+        self.input_details = None
+        self.output_details = None
+        self._lock = threading.Lock()
+        super().__init__(model_file, input_dtype)
+
+    def load(self):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite import Interpreter
+        self.interpreter = Interpreter(model_path=self.model_file)
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()[0]
+        self.output_details = self.interpreter.get_output_details()[0]
+
+    @property
+    def input_signature(self):
+        return (None,) + tuple(self.input_details['shape'][1:]), self.input_details['dtype']
+
+    def run_batch(self, inputs):
+        inputs = np.asarray(inputs, dtype=self.input_details['dtype'])
+        with self._lock:
+            if self.input_details['shape'][0] != len(inputs):
+                self.interpreter.resize_tensor_input(self.input_details['index'], list(inputs.shape))
+                self.interpreter.allocate_tensors()
+                self.input_details = self.interpreter.get_input_details()[0]
+            self.interpreter.set_tensor(self.input_details['index'], inputs)
+            self.interpreter.invoke()
+            return np.copy(self.interpreter.get_tensor(self.output_details['index']))
+
+
+class ONNXBackend(InferenceBackend):
+    """
+    Runs a model converted to onnx (see convert_to_onnx) through onnxruntime
+    """
+    name = "onnx"
+    onnx_dtypes = {"tensor(float)": np.float32, "tensor(double)": np.float64,
+                   "tensor(int32)": np.int32, "tensor(int64)": np.int64}
+
+    def __init__(self, model_file, input_dtype=np.float32):
+        self.session = None
+        self.input_name = None
+        self.input_shape = None
+        self.session_dtype = None
+        super().__init__(model_file, input_dtype)
+
+    def load(self):
+        try:
+            import onnxruntime
+        except ImportError as error:
+            raise ValueError("the onnx backend requires the onnxruntime package") from error
+        self.session = onnxruntime.InferenceSession(self.model_file)
+        session_input = self.session.get_inputs()[0]
+        self.input_name = session_input.name
+        self.input_shape = (None,) + tuple(d if isinstance(d, int) else None for d in session_input.shape[1:])
+        self.session_dtype = self.onnx_dtypes.get(session_input.type, np.float32)
+
+    @property
+    def input_signature(self):
+        return self.input_shape, self.session_dtype
+
+    def run_batch(self, inputs):
+        inputs = np.asarray(inputs, dtype=self.session_dtype)
+        return self.session.run(None, {self.input_name: inputs})[0]
+
+
+BACKENDS = {KerasBackend.name: KerasBackend, TFLiteBackend.name: TFLiteBackend, ONNXBackend.name: ONNXBackend}
+MODEL_SUFFIXES = {KerasBackend.name: "_model.h5",
+                  TFLiteBackend.name: "_model_quantized.tflite",
+                  ONNXBackend.name: "_model.onnx"}
+
+
+def model_file_suffix(backend_name, variant="rnn"):
+    """
+    Suffix of the model files run by a backend
+    Args:
+        backend_name: one of 'keras', 'tflite' or 'onnx'
+        variant: model variant saved at training time, 'rnn' or 'student' for the distilled sentiment model
+    Return:
+        the model file suffix, for instance 'rnn_model.h5'
+    """
+    if backend_name not in MODEL_SUFFIXES:
+        raise ValueError("backend must be one of %s" % list(MODEL_SUFFIXES.keys()))
+    return variant + MODEL_SUFFIXES[backend_name]
+
+
+def create_backend(backend_name, model_file, input_dtype=np.float32, keras_load_function=None):
+    """
+    Instantiates the backend serving a model file
+    Args:
+        backend_name: one of 'keras', 'tflite' or 'onnx'
+        model_file: url of the model file, its suffix must match model_file_suffix(backend_name)
+        input_dtype: type of the model input tensor
+        keras_load_function: function loading the keras model file, used by the keras backend only
+    Return:
+        the loaded InferenceBackend
+    """
+    if backend_name not in BACKENDS:
+        raise ValueError("backend must be one of %s" % list(BACKENDS.keys()))
+    if backend_name == KerasBackend.name:
+        return KerasBackend(model_file, input_dtype, keras_load_function)
+    return BACKENDS[backend_name](model_file, input_dtype)
+
+
+def convert_to_onnx(h5_file, onnx_file=None, opset=11):
+    """
+    Converts a saved keras model to onnx, requires the tf2onnx package
+    Args:
+        h5_file: url of the keras model saved by save_model
+        onnx_file: url of the converted model, defaults to the h5 file name with the onnx backend suffix
+        opset: onnx opset used by the converted model
+    Return:
+        url of the converted model
+    """
+    import tensorflow as tf
+    try:
+        import tf2onnx
+    except ImportError as error:
+        raise ValueError("the onnx conversion requires the tf2onnx package") from error
+    if onnx_file is None:
+        onnx_file = h5_file.replace(MODEL_SUFFIXES[KerasBackend.name], MODEL_SUFFIXES[ONNXBackend.name])
+    keras_model = tf.keras.models.load_model(h5_file, compile=False)
+    input_signature = [tf.TensorSpec(keras_model.input_shape, keras_model.inputs[0].dtype, name="input")]
+    tf2onnx.convert.from_keras(keras_model, input_signature=input_signature, opset=opset, output_path=onnx_file)
+    print("----> onnx model saved to %s" % onnx_file)
+    return onnx_file
@@ -7,6 +7,7 @@ from itertools import compress
 import numpy as np
 from keras.models import load_model
 from cv2 import cv2
+from src.models.backends import create_backend, model_file_suffix
 
 
 class CNNClothing:
@@ -18,26 +19,37 @@ class CNNClothing:
         self.pretrained_network_path = None
         self.pretrained_network_name = None
         self.pretrained_layer = None
-        self.model = None
+        self.backend = None
         self.n_labels = None
         self.idx_to_labels = None
         self.batch_size = None
-        self.init_from_files(kwargs['h5_file'], kwargs['class_file'])
+        self.init_from_files(kwargs['h5_file'], kwargs['class_file'], kwargs.get('backend', "keras"))
 
-    def init_from_files(self, h5_file, class_file):
+    def init_from_files(self, h5_file, class_file, backend="keras"):
         """
         Initializes the class from a previously saved model
         Args:
             h5_file: url to a saved class
+            backend: name of the inference backend running the model file
         Return:
             None
         """
-        self.model = load_model(h5_file)
+        self.backend = create_backend(backend, h5_file, np.float32, load_model)
         with open(class_file, 'rb') as f:
             self.image_height = pickle.load(f)
             self.image_width = pickle.load(f)
             self.idx_to_labels = pickle.load(f)
 
+    def warm_up(self, batch_sizes=None):
+        """
+        Runs synthetic inputs of every served batch size through the model before it serves requests
+        Args:
+            batch_sizes: list of batch sizes served by the application
+        Return:
+            None
+        """
+        self.backend.warm_up(batch_sizes)
+
     def predict(self, X_test):
         """
         Inference method
@@ -46,7 +58,7 @@ class CNNClothing:
         Return:
             numpy array containing the class for token character in the sentence
         """
-        probs = self.model.predict(X_test)
+        probs = self.backend.run_batch(X_test)
         labels = np.argmax(probs, axis=1)
         labels = [self.idx_to_labels[i] for i in labels]
         return labels
@@ -59,7 +71,7 @@ class CNNClothing:
         Return:
             numpy array containing the probabilities of a positive review for each list entry
         """
-        probs = self.model.predict(X_test)
+        probs = self.backend.run_batch(X_test)
         return probs
 
     def load_image(self, image_url):
@@ -78,35 +90,38 @@ class CNNClothing:
         return im
 
     @staticmethod
-    def load_model(h5_file_url=None, class_file_url=None, collect_from_gdrive=False):
+    def load_model(h5_file_url=None, class_file_url=None, collect_from_gdrive=False, backend="keras"):
         """
         Extracts a model saved using the save_model function
         Args:
             h5_file_url: gdrive link for the trained model
             class_file_url: gdrive link for the class file
             collect_from_gdrive: whether to collect the model file from google drive
+            backend: inference backend serving the model, 'keras', 'tflite' or 'onnx', it selects the model file
         Return:
             model object and a tokenizer object
         """
         trained_model = None
+        model_suffix = model_file_suffix(backend)
         root_dir = os.environ.get("MARABOU_HOME")
         if root_dir is None:
-            return None, None
+            return None
         if not os.path.isdir(os.path.join(root_dir, "marabou/evaluation/trained_models")):
-            return None, None
+            return None
         model_dir = os.path.join(root_dir, "marabou/evaluation/trained_models")
         if not collect_from_gdrive:
             model_files_list = os.listdir(model_dir)
             if len(model_files_list) > 0:
-                rnn_models_idx = [("fashion_imagenet" in f) and ("rnn" in f) for f in model_files_list]
+                rnn_models_idx = [("fashion_imagenet" in f) and f.endswith(model_suffix) for f in model_files_list]
                 if np.sum(rnn_models_idx) > 0:
                     rnn_model = list(compress(model_files_list, rnn_models_idx))
                     model_dates = [int(''.join(re.findall(r'\d+', f))) for f in rnn_model]
                     h5_file_name = rnn_model[np.argmax(model_dates)]
-                    class_file = h5_file_name.replace("rnn_model.h5", "rnn_class.pkl")
+                    class_file = h5_file_name.replace(model_suffix, "rnn_class.pkl")
                     if os.path.isfile(os.path.join(model_dir, class_file)):
                         trained_model = CNNClothing(h5_file=os.path.join(model_dir, h5_file_name),
-                                                    class_file=os.path.join(model_dir, class_file))
+                                                    class_file=os.path.join(model_dir, class_file),
+                                                    backend=backend)
                         return trained_model
                     return None
                 return None
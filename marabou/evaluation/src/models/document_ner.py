@@ -0,0 +1,144 @@
+from typing import List, Tuple
+import numpy as np
+from nltk.data import load
+from nltk.tokenize import word_tokenize
+
+QUOTES = ["``", "''"]
+
+
+def tokenize_with_offsets(text: str) -> List[List[Tuple[str, int, int]]]:
+    """
+    Splits a document into sentences of word tokens, keeping the character offsets of every token
+    Args:
+        text: raw document
+    Return:
+        list of sentences, each one being a list of (token, start, end) tuples
+    """
+    sentence_tokenizer = load('tokenizers/punkt/english.pickle')
+    sentences = []
+    for sentence_start, sentence_end in sentence_tokenizer.span_tokenize(text):
+        sentence = text[sentence_start:sentence_end]
+        cursor = 0
+        tokens = []
+        for token in word_tokenize(sentence):
+            # word_tokenize rewrites double quotes as `` or ''
+            candidates = [token, '"'] if token in QUOTES else [token]
+            for candidate in candidates:
+                start = sentence.find(candidate, cursor)
+                if start >= 0:
+                    cursor = start + len(candidate)
+                    tokens.append((text[sentence_start + start:sentence_start + cursor],
+                                   sentence_start + start, sentence_start + cursor))
+                    break
+        if len(tokens) > 0:
+            sentences.append(tokens)
+    return sentences
+
+
+def pack_sentences(documents: List[List[List[Tuple[str, int, int]]]], max_tokens: int):
+    """
+    Packs the consecutive sentences of each document into chunks of at most max_tokens tokens,
+    sentences longer than max_tokens being split
+    Args:
+        documents: list of tokenized documents as returned by tokenize_with_offsets
+        max_tokens: model input length
+    Return:
+        tuple containing the list of chunks, each one being a list of (token, start, end) tuples,
+        and the list giving the document index of each chunk
+    """
+    chunks, document_index = [], []
+    for i, sentences in enumerate(documents):
+        chunk = []
+        for sentence in sentences:
+            pieces = [sentence[start:start + max_tokens] for start in range(0, len(sentence), max_tokens)]
+            for piece in pieces:
+                if len(chunk) + len(piece) > max_tokens:
+                    chunks.append(chunk)
+                    document_index.append(i)
+                    chunk = []
+                chunk = chunk + piece
+        if len(chunk) > 0:
+            chunks.append(chunk)
+            document_index.append(i)
+    return chunks, document_index
+
+
+def merge_entities(tagged_tokens: List[dict]) -> List[dict]:
+    """
+    Merges consecutive tokens tagged B-<type> I-<type> ... into entity spans
+    Args:
+        tagged_tokens: list of dictionaries containing the token, its offsets and its tag
+    Return:
+        list of dictionaries containing the entity text, type and character offsets
+    """
+    entities = []
+    for token in tagged_tokens:
+        tag = token["tag"]
+        if tag == "O" or "-" not in tag:
+            continue
+        prefix, entity_type = tag.split("-", 1)
+        if prefix == "I" and len(entities) > 0 and entities[-1]["type"] == entity_type and\
+                entities[-1]["last_token"] == token["index"] - 1:
+            entities[-1]["end"] = token["end"]
+            entities[-1]["last_token"] = token["index"]
+        else:
+            entities.append({"type": entity_type, "start": token["start"], "end": token["end"],
+                             "last_token": token["index"]})
+    return [{"type": e["type"], "start": e["start"], "end": e["end"]} for e in entities]
+
+
+class DocumentNER:
+    """
+    Document level named entity recognition. Documents are split into sentences which are packed into chunks
+    of at most max_sequence_length tokens, the chunks of all the documents go through the model in a single
+    batch and the predicted tags are stitched back onto the character offsets of the documents
+    """
+    def __init__(self, model, pre_processor):
+        self.model = model
+        self.pre_processor = pre_processor
+        tokenizer_obj = pre_processor['tokenizer_obj']
+        self.word_index = tokenizer_obj.word_index
+        self.num_words = tokenizer_obj.num_words
+        self.lower = tokenizer_obj.lower
+        self.unknown_idx = self.word_index["pad"]
+
+    def encode_chunks(self, chunks: List[List[Tuple[str, int, int]]]) -> np.ndarray:
+        """
+        Encodes chunks of tokens, unknown tokens are encoded with the padding id instead of being dropped
+        so that every token keeps its position
+        Args:
+            chunks: list of chunks as returned by pack_sentences
+        Return:
+            array of padded token ids
+        """
+        encoded = np.full((len(chunks), self.pre_processor['max_sequence_length']), self.unknown_idx, dtype=np.int32)
+        for i, chunk in enumerate(chunks):
+            for j, (token, _, _) in enumerate(chunk):
+                idx = self.word_index.get(token.lower() if self.lower else token, self.unknown_idx)
+                encoded[i, j] = idx if self.num_words is None or idx < self.num_words else self.unknown_idx
+        return encoded
+
+    def predict_documents(self, documents: List[str]) -> List[dict]:
+        """
+        Inference method
+        Args:
+            documents: list of raw documents of any length
+        Return:
+            list containing, for each document, its tagged tokens and its entities with their character offsets
+        """
+        chunks, document_index = pack_sentences([tokenize_with_offsets(d) for d in documents],
+                                                self.pre_processor['max_sequence_length'])
+        results = [{"tokens": [], "entities": []} for _ in documents]
+        if len(chunks) == 0:
+            return results
+        labels_list = self.model.predict(self.encode_chunks(chunks), self.pre_processor["labels_to_idx"],
+                                         [len(chunk) for chunk in chunks])
+        for chunk, labels, i in zip(chunks, labels_list, document_index):
+            for (token, start, end), label in zip(chunk, labels):
+                results[i]["tokens"].append({"index": len(results[i]["tokens"]), "token": token, "start": start,
+                                             "end": end, "tag": "O" if label == "pad" else label})
+        for i, document in enumerate(documents):
+            results[i]["entities"] = merge_entities(results[i]["tokens"])
+            for entity in results[i]["entities"]:
+                entity["text"] = document[entity["start"]:entity["end"]]
+        return results
@@ -0,0 +1,78 @@
+import numpy as np
+import tensorflow as tf
+
+
+WARM_UP_BATCH_SIZES = [1, 8, 32]
+DIRECT_CALL_MAX_BATCH_SIZE = 64
+
+
+def build_predict_function(keras_model, input_dtype=np.float32):
+    """
+    Compiles the forward pass of a keras model as a tf.function with a fixed input signature,
+    so that it is traced once for all batch sizes at startup instead of lazily on the first request.
+    Only tf.keras models can be called inside a tf.function: standalone keras layers are built in the global
+    keras graph, so models loaded with keras.models.load_model (the ner crf model for instance) are served
+    through predict_on_batch instead
+    Args:
+        keras_model: a loaded keras model
+        input_dtype: type of the model input tensor
+    Return:
+        tf.function computing the model outputs for a batch of inputs, None for a standalone keras model
+    """
+    if not isinstance(keras_model, tf.keras.Model):
+        return None
+    input_signature = [tf.TensorSpec(shape=keras_model.input_shape, dtype=input_dtype)]
+
+    @tf.function(input_signature=input_signature)
+    def predict_function(inputs):
+        return keras_model(inputs, training=False)
+
+    return predict_function
+
+
+def warm_up(keras_model, predict_function, input_dtype=np.float32, batch_sizes=None):
+    """
+    Pushes synthetic inputs of every served batch size through a model, building the keras predict function,
+    tracing the compiled forward pass and allocating the tensorflow thread pools
+    Args:
+        keras_model: a loaded keras model
+        predict_function: compiled forward pass returned by build_predict_function, None for a standalone keras model
+        input_dtype: type of the model input tensor
+        batch_sizes: list of batch sizes served by the application
+    Return:
+        None
+    """
+    if batch_sizes is None:
+        batch_sizes = WARM_UP_BATCH_SIZES
+    sample_shape = tuple(keras_model.input_shape[1:])
+    for batch_size in batch_sizes:
+        inputs = np.zeros((batch_size,) + sample_shape, dtype=input_dtype)
+        keras_model.predict(inputs)
+        if predict_function is not None:
+            predict_function(tf.constant(inputs))
+        else:
+            keras_model.predict_on_batch(inputs)
+
+
+def run_inference(keras_model, predict_function, inputs, input_dtype=np.float32,
+                  max_direct_batch_size=DIRECT_CALL_MAX_BATCH_SIZE):
+    """
+    Low overhead inference path. Small batches go straight through the compiled forward pass,
+    skipping the data adapter, callbacks and progress loop that model.predict builds on every call.
+    Batches larger than max_direct_batch_size fall back to model.predict which splits them in mini-batches.
+    Standalone keras models, without compiled forward pass, run small batches through predict_on_batch
+    Args:
+        keras_model: a loaded keras model
+        predict_function: compiled forward pass returned by build_predict_function, None for a standalone keras model
+        inputs: batch of model inputs
+        input_dtype: type of the model input tensor
+        max_direct_batch_size: largest batch sent through the compiled forward pass in a single call
+    Return:
+        numpy array containing the model outputs
+    """
+    inputs = np.asarray(inputs, dtype=input_dtype)
+    if len(inputs) > max_direct_batch_size:
+        return keras_model.predict(inputs, batch_size=max_direct_batch_size)
+    if predict_function is None:
+        return np.asarray(keras_model.predict_on_batch(inputs))
+    return predict_function(tf.convert_to_tensor(inputs)).numpy()
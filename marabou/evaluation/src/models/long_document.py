@@ -0,0 +1,123 @@
+from typing import List
+import numpy as np
+
+AGGREGATIONS = ["mean", "attention", "max"]
+
+
+def split_windows(sequences: List[List[int]], window_length: int, stride: int, max_windows: int, pad_value=0):
+    """
+    Splits token sequences into overlapping windows covering each whole sequence. Windows are evenly spaced,
+    two consecutive windows being at most stride tokens apart, the first one starting at the first token
+    and the last one ending at the last token
+    Args:
+        sequences: list of token id lists, one per document
+        window_length: number of tokens per window, the model input length
+        stride: largest offset between two consecutive windows
+        max_windows: maximum number of windows per document, the stride grows for longer documents
+        pad_value: token id used to pad the documents shorter than a window
+    Return:
+        tuple containing the array of windows and the array giving the document index of each window
+    """
+    if len(sequences) == 0:
+        return np.zeros((0, window_length), dtype=np.int64), np.zeros(0, dtype=np.int64)
+    lengths = np.array([len(s) for s in sequences], dtype=np.int64)
+    flat_tokens = np.array([t for s in sequences for t in s] + [pad_value], dtype=np.int64)
+    document_offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    window_starts, document_index = [], []
+    for i, length in enumerate(lengths):
+        n_windows = 1
+        if length > window_length:
+            n_windows = min(int(np.ceil((length - window_length) / stride)) + 1, max_windows)
+        window_starts.append(np.round(np.linspace(0, max(length - window_length, 0), n_windows)).astype(np.int64))
+        document_index.append(np.full(n_windows, i))
+    window_starts = np.concatenate(window_starts)
+    document_index = np.concatenate(document_index)
+    positions = window_starts[:, None] + np.arange(window_length)[None, :]
+    valid = positions < lengths[document_index][:, None]
+    flat_positions = np.where(valid, document_offsets[document_index][:, None] + positions, len(flat_tokens) - 1)
+    windows = np.where(valid, flat_tokens[flat_positions], pad_value)
+    return windows, document_index
+
+
+def aggregate_window_scores(window_probs, document_index, n_documents: int, aggregation="mean"):
+    """
+    Aggregates the window probabilities into a probability per document
+    Args:
+        window_probs: positive class probability of every window
+        document_index: document index of every window
+        n_documents: number of documents
+        aggregation: 'mean' averages the windows, 'attention' weights each window by the softmax of its
+        confidence (absolute logit), 'max' keeps the window furthest from 0.5
+    Return:
+        array containing the positive class probability of every document
+    """
+    if aggregation not in AGGREGATIONS:
+        raise ValueError("aggregation must be one of %s" % AGGREGATIONS)
+    probs = np.clip(np.asarray(window_probs, dtype=np.float64), 1e-7, 1 - 1e-7)
+    if aggregation == "mean":
+        return np.bincount(document_index, weights=probs, minlength=n_documents) /\
+            np.bincount(document_index, minlength=n_documents)
+    confidence = np.abs(np.log(probs / (1 - probs)))
+    max_confidence = np.full(n_documents, -np.inf)
+    np.maximum.at(max_confidence, document_index, confidence)
+    if aggregation == "max":
+        is_max = confidence == max_confidence[document_index]
+        selected = np.zeros(n_documents, dtype=np.int64)
+        selected[document_index[is_max]] = np.nonzero(is_max)[0]
+        return probs[selected]
+    weights = np.exp(confidence - max_confidence[document_index])
+    return np.bincount(document_index, weights=weights * probs, minlength=n_documents) /\
+        np.bincount(document_index, weights=weights, minlength=n_documents)
+
+
+class LongDocumentModel:
+    """
+    Scores documents longer than the model input with overlapping windows. The windows of all the documents
+    of a request go through the model in a single batch before being aggregated per document
+    """
+    def __init__(self, model, pre_processor, stride=125, aggregation="mean", max_windows=32):
+        if aggregation not in AGGREGATIONS:
+            raise ValueError("aggregation must be one of %s" % AGGREGATIONS)
+        self.model_name = "long_document"
+        self.model = model
+        self.pre_processor = pre_processor
+        self.stride = stride
+        self.aggregation = aggregation
+        self.max_windows = max_windows
+
+    def warm_up(self, batch_sizes=None):
+        """
+        Runs synthetic inputs of every served batch size through the model before it serves requests
+        Args:
+            batch_sizes: list of batch sizes served by the application
+        Return:
+            None
+        """
+        self.model.warm_up(batch_sizes)
+
+    def predict_proba(self, input_list: List[str]):
+        """
+        Inference method
+        Args:
+            input_list: a list of raw texts to be evaluated
+        Return:
+            list containing the probability of a positive review for each list entry
+        """
+        if len(input_list) == 0:
+            return []
+        tokenizer_obj = self.pre_processor['tokenizer_obj']
+        sequences = tokenizer_obj.texts_to_sequences(input_list)
+        windows, document_index = split_windows(sequences, self.pre_processor['max_sequence_length'], self.stride,
+                                                self.max_windows, tokenizer_obj.word_index["pad"])
+        window_probs = self.model.predict_proba(windows)
+        return list(aggregate_window_scores(window_probs, document_index, len(input_list), self.aggregation))
+
+    def predict(self, input_list: List[str]):
+        """
+        Inference method
+        Args:
+            input_list: a list of raw texts to be evaluated
+        Return:
+            list containing the predicted class of each list entry
+        """
+        return [int(p > 0.5) for p in self.predict_proba(input_list)]
@@ -3,6 +3,7 @@ import pickle
 import re
 import time
 import subprocess
+from functools import partial
 from itertools import compress
 import numpy as np
 from nltk.tokenize import word_tokenize
@@ -12,6 +13,7 @@ from keras.preprocessing.sequence import pad_sequences
 from keras_contrib.layers import CRF
 from keras_contrib.losses import crf_loss
 from keras_contrib.metrics import crf_viterbi_accuracy
+from src.models.backends import create_backend, model_file_suffix
 download('punkt')
 
 
@@ -82,23 +84,25 @@ class RNNModel:
         self.max_length = None
         self.word_index = None
         self.embedding_layer = None
-        self.model = None
+        self.backend = None
         self.n_labels = None
         self.labels_to_idx = None
         self.n_iter = 5
-        self.init_from_files(kwargs['h5_file'], kwargs['class_file'])
+        self.init_from_files(kwargs['h5_file'], kwargs['class_file'], kwargs.get('backend', "keras"))
 
-    def init_from_files(self, h5_file, class_file):
+    def init_from_files(self, h5_file, class_file, backend="keras"):
         """
         Initialize the class from a previously saved model
         Args:
             h5_file: url to a saved class
+            backend: name of the inference backend running the model file
         Return:
             None
         """
-        self.model = load_model(h5_file, custom_objects={'CRF': CRF,
-                                                         'crf_loss': crf_loss,
-                                                         'crf_viterbi_accuracy': crf_viterbi_accuracy})
+        keras_load_function = partial(load_model, custom_objects={'CRF': CRF,
+                                                                  'crf_loss': crf_loss,
+                                                                  'crf_viterbi_accuracy': crf_viterbi_accuracy})
+        self.backend = create_backend(backend, h5_file, np.int32, keras_load_function)
 
         with open(class_file, 'rb') as f:
             self.use_pretrained_embedding = pickle.load(f)
@@ -108,6 +112,16 @@ class RNNModel:
             self.max_length = pickle.load(f)
             self.word_index = pickle.load(f)
 
+    def warm_up(self, batch_sizes=None):
+        """
+        Runs synthetic inputs of every served batch size through the model before it serves requests
+        Args:
+            batch_sizes: list of batch sizes served by the application
+        Return:
+            None
+        """
+        self.backend.warm_up(batch_sizes)
+
     def convert_idx_to_labels(self, classes_vector, labels_to_idx):
         """
         Utility function to convert encoded target idx to original labels
@@ -130,7 +144,7 @@ class RNNModel:
         Return:
             numpy array containing the class for token character in the sentence
         """
-        probs = self.model.predict(encoded_text_list)
+        probs = self.backend.run_batch(encoded_text_list)
         labels_list = []
         for i in range(len(probs)):
             if n_tokens_list is not None:
@@ -150,7 +164,7 @@ class RNNModel:
         Return:
             numpy array containing the probabilities of a positive review for each list entry
         """
-        probs = self.model.predict(encoded_text_list)
+        probs = self.backend.run_batch(encoded_text_list)
         real_probs_list = []
         for i in range(len(probs)):
             real_probs = probs[i][:n_tokens_list[i]]
@@ -158,7 +172,8 @@ class RNNModel:
         return real_probs_list
 
     @staticmethod
-    def load_model(h5_file_url=None, class_file_url=None, preprocessor_file_url=None, collect_from_gdrive=False):
+    def load_model(h5_file_url=None, class_file_url=None, preprocessor_file_url=None, collect_from_gdrive=False,
+                   backend="keras"):
         """
         Extracts a model saved using the save_model function
         Args:
@@ -166,10 +181,12 @@ class RNNModel:
             class_file_url: gdrive link for the class file
             preprocessor_file_url: gdrive link for the preprocessor file
             collect_from_gdrive: whether to collect the model file from google drive
+            backend: inference backend serving the model, 'keras', 'tflite' or 'onnx', it selects the model file
         Return:
             model object and a tokenizer object
         """
         trained_model = None
+        model_suffix = model_file_suffix(backend)
         root_dir = os.environ.get("MARABOU_HOME")
         if root_dir is None:
             return None, None
@@ -179,17 +196,19 @@ class RNNModel:
         if not collect_from_gdrive:
             model_files_list = os.listdir(model_dir)
             if len(model_files_list) > 0:
-                rnn_models_idx = [("named_entity_recognition" in f) and ("rnn" in f) for f in model_files_list]
+                rnn_models_idx = [("named_entity_recognition" in f) and f.endswith(model_suffix)
+                                  for f in model_files_list]
                 if np.sum(rnn_models_idx) > 0:
                     rnn_model = list(compress(model_files_list, rnn_models_idx))
                     model_dates = [int(''.join(re.findall(r'\d+', f))) for f in rnn_model]
                     h5_file_name = rnn_model[np.argmax(model_dates)]
-                    preprocessor_file = h5_file_name.replace("rnn_model.h5", "preprocessor.pkl")
-                    class_file = h5_file_name.replace("rnn_model.h5", "rnn_class.pkl")
+                    preprocessor_file = h5_file_name.replace(model_suffix, "preprocessor.pkl")
+                    class_file = h5_file_name.replace(model_suffix, "rnn_class.pkl")
                     if (os.path.isfile(os.path.join(model_dir, preprocessor_file))) and\
                             (os.path.isfile(os.path.join(model_dir, class_file))):
                         trained_model = RNNModel(h5_file=os.path.join(model_dir, h5_file_name),
-                                                 class_file=os.path.join(model_dir, class_file))
+                                                 class_file=os.path.join(model_dir, class_file),
+                                                 backend=backend)
                         return trained_model, preprocessor_file
                     return None, None
                 return None, None
@@ -7,6 +7,7 @@ from itertools import compress
 import numpy as np
 from tensorflow.keras.preprocessing.sequence import pad_sequences
 from tensorflow.keras.models import load_model
+from src.models.backends import create_backend, model_file_suffix
 
 
 class DataPreprocessor:
@@ -66,18 +67,19 @@ class RNNModel:
         self.max_length = None
         self.word_index = None
         self.embedding_layer = None
-        self.model = None
-        self.init_from_files(kwargs['h5_file'], kwargs['class_file'])
+        self.backend = None
+        self.init_from_files(kwargs['h5_file'], kwargs['class_file'], kwargs.get('backend', "keras"))
 
-    def init_from_files(self, h5_file, class_file):
+    def init_from_files(self, h5_file, class_file, backend="keras"):
         """
         Initializes the class from a previously saved model
         Args:
             h5_file: url to a saved class
+            backend: name of the inference backend running the model file
         Return:
             None
         """
-        self.model = load_model(h5_file)
+        self.backend = create_backend(backend, h5_file, np.int32, load_model)
         with open(class_file, 'rb') as f:
             self.use_pretrained_embedding = pickle.load(f)
             self.vocab_size = pickle.load(f)
@@ -87,6 +89,16 @@ class RNNModel:
             self.word_index = pickle.load(f)
         f.close()
 
+    def warm_up(self, batch_sizes=None):
+        """
+        Runs synthetic inputs of every served batch size through the model before it serves requests
+        Args:
+            batch_sizes: list of batch sizes served by the application
+        Return:
+            None
+        """
+        self.backend.warm_up(batch_sizes)
+
     def predict(self, encoded_text_list):
         """
         Inference method
@@ -96,7 +108,7 @@ class RNNModel:
         Return:
             numpy array containing the probabilities of a positive review for each list entry
         """
-        probs = self.model.predict(encoded_text_list)
+        probs = self.backend.run_batch(encoded_text_list)
         boolean_result = probs > 0.5
         return [int(b) for b in boolean_result]
 
@@ -109,11 +121,12 @@ class RNNModel:
         Return:
             numpy array containing the probabilities of a positive review for each list entry
         """
-        probs = self.model.predict(encoded_text_list)
+        probs = self.backend.run_batch(encoded_text_list)
         return [p[0] for p in probs]
 
     @staticmethod
-    def load_model(h5_file_url=None, class_file_url=None, preprocessor_file_url=None, collect_from_gdrive=False):
+    def load_model(h5_file_url=None, class_file_url=None, preprocessor_file_url=None, collect_from_gdrive=False,
+                   backend="keras", variant="rnn"):
         """
         Extracts a model saved using the save_model function
         Args:
@@ -121,10 +134,13 @@ class RNNModel:
             class_file_url: gdrive link for the class file
             preprocessor_file_url: gdrive link for the preprocessor file
             collect_from_gdrive: whether to collect the model file from google drive
+            backend: inference backend serving the model, 'keras', 'tflite' or 'onnx', it selects the model file
+            variant: 'rnn' or 'student' to serve the model distilled from the rnn model
         Return:
             model object and a tokenizer object
         """
         trained_model = None
+        model_suffix = model_file_suffix(backend, variant)
         root_dir = os.environ.get("MARABOU_HOME")
         if root_dir is None:
             return None, None
@@ -134,17 +150,18 @@ class RNNModel:
         if not collect_from_gdrive:
             model_files_list = os.listdir(model_dir)
             if len(model_files_list) > 0:
-                rnn_models_idx = [("sentiment_analysis" in f) and ("rnn" in f) for f in model_files_list]
+                rnn_models_idx = [("sentiment_analysis" in f) and f.endswith(model_suffix) for f in model_files_list]
                 if np.sum(rnn_models_idx) > 0:
                     rnn_model = list(compress(model_files_list, rnn_models_idx))
                     model_dates = [int(''.join(re.findall(r'\d+', f))) for f in rnn_model]
                     h5_file_name = rnn_model[np.argmax(model_dates)]
-                    preprocessor_file = h5_file_name.replace("rnn_model.h5", "preprocessor.pkl")
-                    class_file = h5_file_name.replace("rnn_model.h5", "rnn_class.pkl")
+                    preprocessor_file = h5_file_name.replace(model_suffix, "preprocessor.pkl")
+                    class_file = h5_file_name.replace(model_suffix, variant + "_class.pkl")
                     if (os.path.isfile(os.path.join(model_dir, preprocessor_file))) and\
                             (os.path.isfile(os.path.join(model_dir, class_file))):
                         trained_model = RNNModel(h5_file=os.path.join(model_dir, h5_file_name),
-                                                 class_file=os.path.join(model_dir, class_file))
+                                                 class_file=os.path.join(model_dir, class_file),
+                                                 backend=backend)
                         return trained_model, preprocessor_file
                     return None, None
                 return None, None
@@ -0,0 +1,200 @@
+import pickle
+import os
+import re
+from collections import Counter
+from itertools import compress
+from typing import List
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+class DumbModel():
+    """
+    NB network class. The class provides a wrapper for sklearn methods
+    """
+    def __init__(self, vocab_size=10_000):
+        self.model_name = "tfidf_model"
+        self.vocab_size = vocab_size
+        self.clf = None
+        self.vectorizer = None
+
+    def predict_proba(self, X):
+        """
+        Inference function
+        Args:
+            X: raw texts to perform inference on
+        Return:
+            probability array
+        """
+        X = self.vectorizer.transform(X)
+        probs = self.clf.predict_proba(X)
+        return [p[1] for p in probs]
+
+    def predict(self, X):
+        """
+        Prediction function
+        Args:
+            X: raw texts to perform inference on
+        Return:
+            prediction label
+        """
+        X = self.vectorizer.transform(X)
+        y_pred = self.clf.predict(X)
+        return y_pred
+
+    @staticmethod
+    def load_model():
+        """
+        Finds the most recent saved model and loads it, otherwise returns None object
+        Return:
+            model object
+        """
+        root_dir = os.environ.get("MARABOU_HOME")
+        if root_dir is None:
+            return None
+        model_dir = os.path.join(root_dir, "marabou/evaluation/trained_models")
+        if not os.path.isdir(model_dir):
+            return None
+        model_files_list = os.listdir(model_dir)
+        if len(model_files_list) > 0:
+            tfidf_models_idx = [("sentiment_analysis" in f) and f.endswith("tfidf_model.pickle")
+                                for f in model_files_list]
+            if sum(tfidf_models_idx) > 0:
+                tfidf_model = list(compress(model_files_list, tfidf_models_idx))
+                model_dates = [int(''.join(re.findall(r'\d+', f))) for f in tfidf_model]
+                model = DumbModel()
+                file_name = tfidf_model[np.argmax(model_dates)]
+                with open(os.path.join(model_dir, file_name), 'rb') as f:
+                    model.vocab_size = pickle.load(f)
+                    model.vectorizer = pickle.load(f)
+                    model.clf = pickle.load(f)
+                return model
+            return None
+        return None
+
+
+class TfidfScorer:
+    """
+    Numpy port of the tfidf and naive bayes sentiment model, loaded from the array bundle exported by
+    DumbModel.export_scorer. A batch is scored with a single sparse matrix product against the naive bayes
+    log odds, no sklearn object is unpickled
+    """
+    def __init__(self, scorer_file):
+        self.model_name = "tfidf_scorer"
+        bundle = np.load(scorer_file, allow_pickle=False)
+        self.vocabulary = {term: i for i, term in enumerate(bundle["vocabulary"].tolist())}
+        self.idf = bundle["idf"].astype(np.float64)
+        self.lowercase = bool(bundle["lowercase"])
+        self.token_pattern = re.compile(str(bundle["token_pattern"]))
+        self.min_n, self.max_n = [int(n) for n in bundle["ngram_range"]]
+        self.norm = str(bundle["norm"])
+        self.sublinear_tf = bool(bundle["sublinear_tf"])
+        classes = bundle["classes"].tolist()
+        positive_idx = classes.index(1) if 1 in classes else len(classes) - 1
+        negative_idx = 1 - positive_idx
+        feature_log_prob = bundle["feature_log_prob"].astype(np.float64)
+        class_log_prior = bundle["class_log_prior"].astype(np.float64)
+        # for two classes, the positive probability is the sigmoid of the difference of the joint log likelihoods
+        self.log_odds = feature_log_prob[positive_idx] - feature_log_prob[negative_idx]
+        self.prior_log_odds = class_log_prior[positive_idx] - class_log_prior[negative_idx]
+        bundle.close()
+
+    def analyze(self, text: str) -> List[str]:
+        """
+        Splits a text into the terms of the vocabulary, following the sklearn word analyzer
+        Args:
+            text: raw text
+        Return:
+            list of word n-grams
+        """
+        if self.lowercase:
+            text = text.lower()
+        tokens = self.token_pattern.findall(text)
+        if self.max_n == 1:
+            return tokens
+        terms = list(tokens) if self.min_n == 1 else []
+        for n in range(max(self.min_n, 2), self.max_n + 1):
+            terms.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return terms
+
+    def transform(self, X: List[str]):
+        """
+        Computes the normalized tfidf matrix of a batch of texts
+        Args:
+            X: raw texts
+        Return:
+            csr matrix of shape (number of texts, vocabulary size)
+        """
+        indptr, indices, counts = [0], [], []
+        for text in X:
+            term_counts = Counter(self.vocabulary[t] for t in self.analyze(text) if t in self.vocabulary)
+            indices.extend(term_counts.keys())
+            counts.extend(term_counts.values())
+            indptr.append(len(indices))
+        indices = np.asarray(indices, dtype=np.int32)
+        data = np.asarray(counts, dtype=np.float64)
+        if self.sublinear_tf:
+            data = 1 + np.log(data)
+        data *= self.idf[indices]
+        if self.norm in ["l1", "l2"]:
+            rows = np.repeat(np.arange(len(X)), np.diff(indptr))
+            weights = np.abs(data) if self.norm == "l1" else data ** 2
+            norms = np.bincount(rows, weights=weights, minlength=len(X))
+            if self.norm == "l2":
+                norms = np.sqrt(norms)
+            norms[norms == 0] = 1
+            data /= norms[rows]
+        return csr_matrix((data, indices, np.asarray(indptr)), shape=(len(X), len(self.idf)))
+
+    def predict_proba(self, X: List[str]):
+        """
+        Inference function
+        Args:
+            X: raw texts to perform inference on
+        Return:
+            probability array
+        """
+        scores = self.transform(X).dot(self.log_odds) + self.prior_log_odds
+        return list(1 / (1 + np.exp(-scores)))
+
+    def predict(self, X: List[str]):
+        """
+        Prediction function
+        Args:
+            X: raw texts to perform inference on
+        Return:
+            prediction label
+        """
+        return [int(p > 0.5) for p in self.predict_proba(X)]
+
+    def warm_up(self, batch_sizes=None):
+        """
+        Scores a synthetic batch of every served batch size
+        Args:
+            batch_sizes: list of batch sizes served by the application
+        Return:
+            None
+        """
+        for batch_size in batch_sizes or [1]:
+            self.predict_proba(["warm up"] * batch_size)
+
+    @staticmethod
+    def load_model():
+        """
+        Finds the most recent scorer bundle and loads it, otherwise returns None object
+        Return:
+            model object
+        """
+        root_dir = os.environ.get("MARABOU_HOME")
+        if root_dir is None:
+            return None
+        model_dir = os.path.join(root_dir, "marabou/evaluation/trained_models")
+        if not os.path.isdir(model_dir):
+            return None
+        model_files_list = os.listdir(model_dir)
+        scorer_idx = [("sentiment_analysis" in f) and f.endswith("tfidf_scorer.npz") for f in model_files_list]
+        if sum(scorer_idx) > 0:
+            scorer_files = list(compress(model_files_list, scorer_idx))
+            model_dates = [int(''.join(re.findall(r'\d+', f))) for f in scorer_files]
+            return TfidfScorer(os.path.join(model_dir, scorer_files[np.argmax(model_dates)]))
+        return None
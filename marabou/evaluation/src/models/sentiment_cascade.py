@@ -0,0 +1,84 @@
+import threading
+from typing import List
+import numpy as np
+from src.models.sentiment_analysis_rnn import DataPreprocessor
+
+
+class CascadeModel:
+    """
+    Scores every input with the sparse tfidf model first and only escalates the inputs whose probability
+    falls inside the uncertainty band to the rnn model, in a single batch
+    """
+    def __init__(self, fast_model, slow_model, pre_processor, uncertainty_band=(0.3, 0.7)):
+        self.model_name = "cascade"
+        self.fast_model = fast_model
+        self.slow_model = slow_model
+        self.pre_processor = pre_processor
+        self.lower_bound, self.upper_bound = uncertainty_band
+        self.n_inputs = 0
+        self.n_escalated = 0
+        self._lock = threading.Lock()
+
+    def warm_up(self, batch_sizes=None):
+        """
+        Runs synthetic inputs of every served batch size through the rnn model before it serves requests
+        Args:
+            batch_sizes: list of batch sizes served by the application
+        Return:
+            None
+        """
+        self.slow_model.warm_up(batch_sizes)
+        self.fast_model.predict_proba(["warm up"])
+
+    def escalation_mask(self, fast_probs):
+        """
+        Inputs whose fast model probability is not confident enough
+        Args:
+            fast_probs: array of probabilities returned by the tfidf model
+        Return:
+            boolean array, True for the inputs sent to the rnn model
+        """
+        fast_probs = np.asarray(fast_probs)
+        return (fast_probs >= self.lower_bound) & (fast_probs <= self.upper_bound)
+
+    def predict_proba(self, input_list: List[str]):
+        """
+        Inference method
+        Args:
+            input_list: a list of raw texts to be evaluated
+        Return:
+            list containing the probability of a positive review for each list entry
+        """
+        probs = np.asarray(self.fast_model.predict_proba(input_list), dtype=np.float64)
+        escalated = self.escalation_mask(probs)
+        if np.any(escalated):
+            escalated_inputs = [text for text, e in zip(input_list, escalated) if e]
+            if self.slow_model.model_name == "rnn":
+                escalated_inputs = DataPreprocessor.preprocess_data(escalated_inputs, self.pre_processor)
+            probs[escalated] = self.slow_model.predict_proba(escalated_inputs)
+        with self._lock:
+            self.n_inputs += len(input_list)
+            self.n_escalated += int(np.sum(escalated))
+        return list(probs)
+
+    def predict(self, input_list: List[str]):
+        """
+        Inference method
+        Args:
+            input_list: a list of raw texts to be evaluated
+        Return:
+            list containing the predicted class of each list entry
+        """
+        return [int(p > 0.5) for p in self.predict_proba(input_list)]
+
+    def stats(self):
+        """
+        Escalation counters since the model was loaded
+        Return:
+            dictionary containing the uncertainty band, the number of scored inputs and the escalation rate
+        """
+        with self._lock:
+            return {"uncertainty_band": [self.lower_bound, self.upper_bound],
+                    "n_inputs": self.n_inputs,
+                    "n_escalated": self.n_escalated,
+                    "escalation_rate": self.n_escalated / self.n_inputs if self.n_inputs > 0 else 0.}
@@ -0,0 +1,145 @@
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from src.models.backends import BACKENDS, KerasBackend, ONNXBackend, convert_to_onnx
+
+
+def synthetic_inputs(model, n_samples, seed=0):
+    """
+    Random inputs matching the input signature of a served model
+    Args:
+        model: evaluation model exposing an inference backend
+        n_samples: number of inputs
+        seed: random seed, the same inputs are sent to every backend
+    Return:
+        numpy array of model inputs
+    """
+    random_state = np.random.RandomState(seed)
+    input_shape = model.backend.input_signature[0]
+    shape = (n_samples,) + tuple(input_shape[1:])
+    vocab_size = getattr(model, "vocab_size", None)
+    if vocab_size is not None:
+        return random_state.randint(1, vocab_size, size=shape).astype(np.int32)
+    return random_state.uniform(0, 1, size=shape).astype(np.float32)
+
+
+def compare_outputs(reference_outputs, outputs):
+    """
+    Differences between the outputs of a backend and the keras reference
+    Args:
+        reference_outputs: outputs of the keras backend
+        outputs: outputs of the compared backend on the same inputs
+    Return:
+        dictionary containing the output differences and the agreement of the predicted classes
+    """
+    reference_outputs = np.asarray(reference_outputs, dtype=np.float32)
+    outputs = np.asarray(outputs, dtype=np.float32).reshape(reference_outputs.shape)
+    if reference_outputs.shape[-1] == 1:
+        reference_classes = reference_outputs[..., 0] > 0.5
+        classes = outputs[..., 0] > 0.5
+    else:
+        reference_classes = np.argmax(reference_outputs, axis=-1)
+        classes = np.argmax(outputs, axis=-1)
+    difference = np.abs(reference_outputs - outputs)
+    return {"max_abs_difference": float(np.max(difference)),
+            "mean_abs_difference": float(np.mean(difference)),
+            "prediction_agreement": float(np.mean(reference_classes == classes))}
+
+
+def time_batch(model, inputs, n_calls):
+    """
+    Mean duration in milliseconds of a batch run through the backend of a model
+    """
+    model.backend.run_batch(inputs)
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        model.backend.run_batch(inputs)
+    return 1000 * (time.perf_counter() - start) / n_calls
+
+
+def check_task(task_name, n_samples, n_calls, min_agreement, convert_onnx=False):
+    """
+    Runs the same inputs through every backend able to load the latest model of a task
+    and compares their outputs with the keras backend
+    Args:
+        task_name: name of the served task
+        n_samples: number of inputs in the compared batch
+        n_calls: number of timed calls per backend
+        min_agreement: lowest share of identical predictions accepted for a backend
+        convert_onnx: whether to convert the keras model to onnx before the check
+    Return:
+        list of dictionaries containing the result of each backend
+    """
+    from src import app
+    loaders = {app.SENTIMENT_ANALYSIS: app.load_sentiment_analysis,
+               app.NAMED_ENTITY_RECOGNITION: app.load_named_entity_recognition,
+               app.CLOTHING_CLASSIFIER: app.load_clothing_classifier}
+    print("===========> backend parity of %s" % task_name)
+    models = {}
+    for backend_name in BACKENDS:
+        if backend_name == ONNXBackend.name and convert_onnx and KerasBackend.name in models:
+            convert_to_onnx(models[KerasBackend.name].backend.model_file)
+        try:
+            loaded_model = loaders[task_name](backend=backend_name)
+        except (ValueError, ImportError, OSError) as e:
+            print("----> %s backend skipped: %s" % (backend_name, e))
+            continue
+        models[backend_name] = loaded_model[0] if isinstance(loaded_model, tuple) else loaded_model
+    if KerasBackend.name not in models:
+        raise ValueError("the keras model of %s is required as the parity reference" % task_name)
+    inputs = synthetic_inputs(models[KerasBackend.name], n_samples)
+    reference_outputs = models[KerasBackend.name].backend.run_batch(inputs)
+    results = []
+    for backend_name, model in models.items():
+        result = {"task": task_name, "backend": backend_name, "model_file": os.path.basename(model.backend.model_file)}
+        result.update(compare_outputs(reference_outputs, model.backend.run_batch(inputs)))
+        result["batch_ms"] = round(time_batch(model, inputs, n_calls), 3)
+        result["passed"] = result["prediction_agreement"] >= min_agreement
+        print("{:8} |{:12.6f} |{:12.6f} |{:10.4f} |{:10.3f} | {}".format(
+            backend_name, result["max_abs_difference"], result["mean_abs_difference"],
+            result["prediction_agreement"], result["batch_ms"], "ok" if result["passed"] else "FAILED"))
+        results.append(result)
+    return results
+
+
+def parse_arguments():
+    """
+    Parse file arguments
+    """
+    parser = argparse.ArgumentParser(description="Runs the same inputs through every inference backend "
+                                                 "and compares their outputs with keras")
+    parser.add_argument('--tasks', nargs='+', default=["sentiment_analysis", "named_entity_recognition",
+                                                       "clothing_classifier"])
+    parser.add_argument('--n-samples', type=int, default=32, help="number of inputs in the compared batch")
+    parser.add_argument('--n-calls', type=int, default=20, help="number of timed calls per backend")
+    parser.add_argument('--min-agreement', type=float, default=0.99,
+                        help="lowest share of predictions identical to keras accepted for a backend")
+    parser.add_argument('--convert-onnx', action='store_true',
+                        help="converts the latest keras model of each task to onnx before the check")
+    parser.add_argument('--output', default=None, help="optional .json file receiving the results")
+    return parser.parse_args()
+
+
+def main():
+    """main function"""
+    args = parse_arguments()
+    if os.environ.get("MARABOU_HOME") is None:
+        raise ValueError("please make sure to setup the environment variable MARABOU_HOME to point\
+                         for the root of the project")
+    print("{:8} |{:12} |{:12} |{:10} |{:10} |".format("backend", "max diff", "mean diff", "agreement", "batch ms"))
+    results = []
+    for task_name in args.tasks:
+        results.extend(check_task(task_name, args.n_samples, args.n_calls, args.min_agreement, args.convert_onnx))
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print("----> results saved to %s" % args.output)
+    if not all(result["passed"] for result in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
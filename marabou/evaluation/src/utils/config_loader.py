@@ -0,0 +1,200 @@
+import os
+import json
+
+
+class ServingConfigReader():
+    """
+    Loads the evaluation service parameters from a .json file
+    """
+    def __init__(self, file_name):
+        self.config = self.read_file(file_name)
+
+    def read_file(self, file_name):
+        """
+        used to load configuration file
+        Args:
+            file_name: relative path for the configuration .json file
+        """
+        with open(file_name, "r") as f:
+            return json.load(f)
+
+    @property
+    def enabled_tasks(self):
+        """
+        list of the tasks served by this deployment.
+        the environment variable MARABOU_ENABLED_TASKS takes precedence over the configuration file
+        """
+        env_tasks = os.environ.get("MARABOU_ENABLED_TASKS")
+        if env_tasks is not None:
+            return [t.strip() for t in env_tasks.split(",") if t.strip() != ""]
+        return self.config["enabled_tasks"]
+
+    @property
+    def preload_models(self):
+        """
+        whether to load the enabled models in background threads right after boot.
+        the environment variable MARABOU_PRELOAD_MODELS takes precedence over the configuration file
+        """
+        env_preload = os.environ.get("MARABOU_PRELOAD_MODELS")
+        if env_preload is not None:
+            return env_preload.lower() in ["1", "true", "yes"]
+        return self.config["preload_models"]
+
+    @property
+    def watch_models_interval(self):
+        """
+        polling period in seconds of the trained models directory, a task is reloaded whenever its files change.
+        0 disables the watcher, models can still be reloaded through the admin endpoint
+        """
+        return self.config["watch_models_interval"]
+
+    @property
+    def warm_up_batch_sizes(self):
+        """
+        batch sizes pushed through every model after it is loaded, before it serves requests
+        """
+        return self.config["warm_up_batch_sizes"]
+
+    @property
+    def backends(self):
+        """
+        inference backend serving each task: 'keras', 'tflite' or 'onnx'
+        """
+        return self.config["backends"]
+
+    def backend(self, task_name):
+        """
+        inference backend serving a task, tasks missing from the backends section are served by keras
+        Args:
+            task_name: name of the served task
+        """
+        return self.config["backends"].get(task_name, "keras")
+
+    @property
+    def model_variants(self):
+        """
+        model variant serving each task, 'student' serves the sentiment model distilled from the rnn model
+        """
+        return self.config["model_variants"]
+
+    def model_variant(self, task_name):
+        """
+        model variant serving a task, tasks missing from the model_variants section are served by the rnn model
+        Args:
+            task_name: name of the served task
+        """
+        return self.config["model_variants"].get(task_name, "rnn")
+
+    @property
+    def cascade_enabled(self):
+        """
+        whether the sentiment analysis inputs are scored by the tfidf model first, only the uncertain ones
+        being escalated to the rnn model
+        """
+        return self.config["sentiment_cascade"]["enabled"]
+
+    @property
+    def cascade_uncertainty_band(self):
+        """
+        [lower, upper] tfidf probabilities between which an input is escalated to the rnn model
+        """
+        return self.config["sentiment_cascade"]["uncertainty_band"]
+
+    @property
+    def long_document_enabled(self):
+        """
+        whether sentiment analysis documents longer than the model input are scored with overlapping windows
+        instead of being truncated to their last tokens
+        """
+        return self.config["long_document"]["enabled"]
+
+    @property
+    def long_document_settings(self):
+        """
+        stride, aggregation ('mean', 'attention' or 'max') and max_windows of the long document mode
+        """
+        return {key: self.config["long_document"][key] for key in ["stride", "aggregation", "max_windows"]}
+
+    @property
+    def metrics_enabled(self):
+        """
+        whether request and stage metrics are recorded and exposed on /metrics
+        """
+        return self.config["metrics"]["enabled"]
+
+    @property
+    def server_timing_enabled(self):
+        """
+        whether the stage timings of a request are returned in its Server-Timing header
+        """
+        return self.config["metrics"]["server_timing"]
+
+    @property
+    def streaming_chunk_size(self):
+        """
+        number of inputs scored at once by the streaming mode of the sentiment analysis and ner routes
+        """
+        return self.config["streaming_chunk_size"]
+
+    @property
+    def jobs_enabled(self):
+        """
+        whether large scoring requests can be submitted as asynchronous jobs
+        """
+        return self.config["jobs"]["enabled"]
+
+    @property
+    def jobs_directory(self):
+        """
+        directory of the job database, inputs and results, relative to MARABOU_HOME
+        """
+        return self.config["jobs"]["directory"]
+
+    @property
+    def jobs_n_workers(self):
+        """
+        number of background threads processing the queued jobs
+        """
+        return self.config["jobs"]["n_workers"]
+
+    @property
+    def jobs_batch_size(self):
+        """
+        number of items scored at once by a job worker
+        """
+        return self.config["jobs"]["batch_size"]
+
+    @property
+    def runtime(self):
+        """
+        cpu threading and affinity settings of the inference runtime
+        """
+        return self.config["runtime"]
+
+    @property
+    def intra_op_parallelism_threads(self):
+        """
+        threads used by tensorflow inside a single op, 0 lets tensorflow decide
+        """
+        return self.config["runtime"]["intra_op_parallelism_threads"]
+
+    @property
+    def inter_op_parallelism_threads(self):
+        """
+        threads used by tensorflow to run independent ops concurrently, 0 lets tensorflow decide
+        """
+        return self.config["runtime"]["inter_op_parallelism_threads"]
+
+    @property
+    def omp_num_threads(self):
+        """
+        OpenMP and MKL thread count, 0 leaves the environment untouched
+        """
+        return self.config["runtime"]["omp_num_threads"]
+
+    @property
+    def cpu_affinity(self):
+        """
+        cpu affinity of the worker: None, 'auto' or a list of cpu lists indexed by the worker id
+        """
+        return self.config["runtime"]["cpu_affinity"]
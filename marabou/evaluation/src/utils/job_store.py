@@ -0,0 +1,417 @@
+import os
+import json
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterator, List
+from src.utils.streaming import iter_ndjson_items
+
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+JOB_COLUMNS = ["job_id", "task_name", "state", "input_file", "result_file", "n_items", "n_done", "submitted_at",
+               "started_at", "finished_at", "error", "owner", "heartbeat_at"]
+# a running job whose worker has not written a batch for this long is considered interrupted
+JOB_LEASE_SECONDS = 600
+
+
+class JobNotFoundError(Exception):
+    """
+    Raised when a job id is unknown to the job store
+    """
+
+
+def read_items(input_file: str) -> Iterator:
+    """
+    Reads the items of a jsonl dataset, one json value per line. Objects are reduced to their 'content' field
+    Args:
+        input_file: path of the jsonl file
+    Return:
+        iterator over the items
+    """
+    with open(input_file, "r") as f:
+        yield from iter_ndjson_items(f)
+
+
+def process_is_alive(pid: int) -> bool:
+    """
+    Whether a process of the current host is running
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """
+    Local job store, the job metadata lives in a sqlite database and the inputs and results in jsonl files
+    next to it. Every call opens its own connection so that the store can be shared between threads, and the
+    jobs are claimed atomically so that it can be shared between server processes.
+    Input files, and the images of the clothing jobs, must be located under the input directory, the inputs
+    subdirectory by default
+    """
+    def __init__(self, directory: str, input_directory: str = None):
+        self.directory = directory
+        self.input_directory = os.path.realpath(input_directory or os.path.join(directory, "inputs"))
+        os.makedirs(directory, exist_ok=True)
+        os.makedirs(self.input_directory, exist_ok=True)
+        self.db_file = os.path.join(directory, "jobs.sqlite")
+        self.owner = "%s:%i" % (socket.gethostname(), os.getpid())
+        self._lock = threading.Lock()
+        with self._connect() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, task_name TEXT, state TEXT,"
+                               " input_file TEXT, result_file TEXT, n_items INTEGER, n_done INTEGER,"
+                               " submitted_at REAL, started_at REAL, finished_at REAL, error TEXT)")
+            existing_columns = [row[1] for row in connection.execute("PRAGMA table_info(jobs)")]
+            for column, column_type in [("owner", "TEXT"), ("heartbeat_at", "REAL")]:
+                if column not in existing_columns:
+                    connection.execute("ALTER TABLE jobs ADD COLUMN %s %s" % (column, column_type))
+
+    def resolve_input_path(self, path: str) -> str:
+        """
+        Absolute path of a file given by a client, relative paths being taken from the input directory
+        Args:
+            path: path of the file
+        Return:
+            the resolved path, symbolic links included
+        Raise:
+            ValueError if the file is outside the input directory
+        """
+        resolved = os.path.realpath(os.path.join(self.input_directory, path))
+        if os.path.commonpath([resolved, self.input_directory]) != self.input_directory:
+            raise ValueError("%s is outside the job input directory" % path)
+        return resolved
+
+    def _connect(self):
+        """
+        Opens a connection to the job database
+        Return:
+            sqlite3 connection, committing on exit when used as a context manager
+        """
+        return sqlite3.connect(self.db_file, timeout=30)
+
+    def submit(self, task_name: str, items: List = None, input_file: str = None) -> str:
+        """
+        Queues a new job, the dataset is either given inline or as the path of a jsonl file of the input directory
+        Args:
+            task_name: name of the task scoring the items
+            items: list of items to be scored
+            input_file: path of a jsonl file containing one item per line, relative to the input directory
+        Return:
+            id of the job
+        """
+        if (items is None) == (input_file is None):
+            raise ValueError("a job is either submitted with inline items or with an input file")
+        job_id = uuid.uuid4().hex
+        if items is not None:
+            input_file = os.path.join(self.directory, "%s_input.jsonl" % job_id)
+            with open(input_file, "w") as f:
+                for item in items:
+                    f.write(json.dumps(item) + "\n")
+            n_items = len(items)
+        else:
+            input_file = self.resolve_input_path(input_file)
+            if not os.path.isfile(input_file):
+                raise ValueError("input file %s does not exist" % input_file)
+            n_items = None
+        result_file = os.path.join(self.directory, "%s_results.jsonl" % job_id)
+        with self._lock, self._connect() as connection:
+            connection.execute("INSERT INTO jobs (job_id, task_name, state, input_file, result_file, n_items, n_done,"
+                               " submitted_at) VALUES (?, ?, ?, ?, ?, ?, 0, ?)",
+                               (job_id, task_name, QUEUED, os.path.abspath(input_file), result_file, n_items,
+                                time.time()))
+        return job_id
+
+    def get(self, job_id: str) -> Dict:
+        """
+        Metadata of a given job
+        Args:
+            job_id: id of the job
+        Return:
+            dictionary containing the job columns and its progress
+        """
+        with self._connect() as connection:
+            row = connection.execute("SELECT %s FROM jobs WHERE job_id = ?" % ", ".join(JOB_COLUMNS),
+                                     (job_id,)).fetchone()
+        if row is None:
+            raise JobNotFoundError("unknown job %s" % job_id)
+        job = dict(zip(JOB_COLUMNS, row))
+        job["progress"] = job["n_done"] / job["n_items"] if job["n_items"] else 0.
+        return job
+
+    def list_jobs(self, limit: int = 100) -> List[Dict]:
+        """
+        Most recently submitted jobs
+        Args:
+            limit: maximum number of jobs
+        Return:
+            list of job dictionaries
+        """
+        with self._connect() as connection:
+            job_ids = connection.execute("SELECT job_id FROM jobs ORDER BY submitted_at DESC LIMIT ?",
+                                         (limit,)).fetchall()
+        return [self.get(job_id) for job_id, in job_ids]
+
+    def count_by_state(self) -> Dict:
+        """
+        Number of jobs in every state
+        Return:
+            dictionary of job counts by state
+        """
+        with self._connect() as connection:
+            rows = connection.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        counts = {state: 0 for state in [QUEUED, RUNNING, DONE, FAILED, CANCELLED]}
+        counts.update(dict(rows))
+        return counts
+
+    def claim(self) -> Dict:
+        """
+        Marks the oldest queued job as running. The update only applies to a job that is still queued, so that
+        a job selected by several processes at once is claimed by one of them
+        Return:
+            the claimed job, None if no job is queued
+        """
+        with self._lock:
+            while True:
+                with self._connect() as connection:
+                    row = connection.execute("SELECT job_id FROM jobs WHERE state = ? ORDER BY submitted_at LIMIT 1",
+                                             (QUEUED,)).fetchone()
+                    if row is None:
+                        return None
+                    now = time.time()
+                    cursor = connection.execute("UPDATE jobs SET state = ?, started_at = ?, owner = ?, heartbeat_at = ?"
+                                                " WHERE job_id = ? AND state = ?",
+                                                (RUNNING, now, self.owner, now, row[0], QUEUED))
+                if cursor.rowcount == 1:
+                    return self.get(row[0])
+
+    def update(self, job_id: str, **fields):
+        """
+        Updates some columns of a given job
+        Args:
+            job_id: id of the job
+            fields: column values
+        Return:
+            None
+        """
+        unknown_columns = [c for c in fields if c not in JOB_COLUMNS]
+        if len(unknown_columns) > 0:
+            raise ValueError("unknown job columns %s" % unknown_columns)
+        assignments = ", ".join("%s = ?" % c for c in fields)
+        with self._lock, self._connect() as connection:
+            connection.execute("UPDATE jobs SET %s WHERE job_id = ?" % assignments, list(fields.values()) + [job_id])
+
+    def transition(self, job_id: str, states: List[str], owner: str = None, **fields) -> bool:
+        """
+        Updates some columns of a given job only while it is in one of the given states, so that a concurrent
+        state change (a cancellation for instance) is never overwritten
+        Args:
+            job_id: id of the job
+            states: states the job must be in
+            owner: if given, the job must also be owned by this store
+            fields: column values
+        Return:
+            True if the job was updated
+        """
+        unknown_columns = [c for c in fields if c not in JOB_COLUMNS]
+        if len(unknown_columns) > 0:
+            raise ValueError("unknown job columns %s" % unknown_columns)
+        assignments = ", ".join("%s = ?" % c for c in fields)
+        condition = "job_id = ? AND state IN (%s)" % ", ".join("?" * len(states))
+        values = list(fields.values()) + [job_id] + list(states)
+        if owner is not None:
+            condition += " AND owner = ?"
+            values.append(owner)
+        with self._lock, self._connect() as connection:
+            cursor = connection.execute("UPDATE jobs SET %s WHERE %s" % (assignments, condition), values)
+            return cursor.rowcount == 1
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancels a queued or running job, a running job stops after its current batch
+        Args:
+            job_id: id of the job
+        Return:
+            False if the job was already finished
+        """
+        self.get(job_id)
+        return self.transition(job_id, [QUEUED, RUNNING], state=CANCELLED, finished_at=time.time())
+
+    def is_interrupted(self, owner: str, heartbeat_at: float, lease: float) -> bool:
+        """
+        Whether a running job has lost its worker: its process of this host is gone, or it has not written a
+        batch for longer than the lease
+        """
+        if owner == self.owner:
+            return False
+        host, _, pid = (owner or "").rpartition(":")
+        if host == socket.gethostname() and pid.isdigit():
+            return not process_is_alive(int(pid))
+        return heartbeat_at is None or time.time() - heartbeat_at > lease
+
+    def requeue_interrupted(self, lease: float = JOB_LEASE_SECONDS):
+        """
+        Queues again the running jobs whose worker is gone, their partial results are discarded. The jobs still
+        run by another server process are left untouched
+        Args:
+            lease: seconds without progress after which a job of another host is considered interrupted
+        Return:
+            number of requeued jobs
+        """
+        n_requeued = 0
+        with self._lock, self._connect() as connection:
+            rows = connection.execute("SELECT job_id, result_file, owner, heartbeat_at FROM jobs WHERE state = ?",
+                                      (RUNNING,)).fetchall()
+            for job_id, result_file, owner, heartbeat_at in rows:
+                if not self.is_interrupted(owner, heartbeat_at, lease):
+                    continue
+                cursor = connection.execute("UPDATE jobs SET state = ?, n_done = 0, started_at = NULL, owner = NULL,"
+                                            " heartbeat_at = NULL WHERE job_id = ? AND state = ? AND owner IS ?",
+                                            (QUEUED, job_id, RUNNING, owner))
+                if cursor.rowcount == 1:
+                    if os.path.isfile(result_file):
+                        os.remove(result_file)
+                    n_requeued += 1
+        return n_requeued
+
+    def read_results(self, job_id: str, offset: int = 0, limit: int = None) -> List[str]:
+        """
+        Result lines written so far for a given job
+        Args:
+            job_id: id of the job
+            offset: number of result lines to skip
+            limit: maximum number of result lines, None reads all of them
+        Return:
+            list of json lines
+        """
+        result_file = self.get(job_id)["result_file"]
+        lines = []
+        if not os.path.isfile(result_file):
+            return lines
+        with open(result_file, "r") as f:
+            for i, line in enumerate(f):
+                if i < offset:
+                    continue
+                if limit is not None and len(lines) >= limit:
+                    break
+                lines.append(line)
+        return lines
+
+
+class JobWorkerPool:
+    """
+    Daemon threads processing the queued jobs in large batches. Each batch holds the served model
+    of the task for its duration only, so that a model reload applies from the next batch on
+    """
+    def __init__(self, job_store: JobStore, scorers: Dict[str, Callable], n_workers: int = 1, batch_size: int = 256,
+                 poll_interval: float = 1.):
+        self.job_store = job_store
+        self.scorers = scorers
+        self.n_workers = n_workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._threads = []
+
+    def start(self):
+        """
+        Requeues the jobs interrupted by a previous process and starts the worker threads
+        Return:
+            None
+        """
+        if len(self._threads) > 0:
+            return
+        n_requeued = self.job_store.requeue_interrupted()
+        if n_requeued > 0:
+            print("----> %i interrupted jobs queued again" % n_requeued)
+        for i in range(self.n_workers):
+            thread = threading.Thread(target=self._work, name="job-worker-%i" % i)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self):
+        """
+        Worker loop, claims the oldest queued job and processes it
+        Return:
+            None
+        """
+        while True:
+            job = self.job_store.claim()
+            if job is None:
+                # picks up the jobs of a server process that stopped meanwhile
+                self.job_store.requeue_interrupted()
+                time.sleep(self.poll_interval)
+                continue
+            try:
+                self.process(job)
+            except Exception as error:  # pylint: disable=broad-except
+                print("----> job %s failed: %s" % (job["job_id"], error))
+                self.job_store.transition(job["job_id"], [RUNNING], self.job_store.owner, state=FAILED,
+                                          error=str(error), finished_at=time.time())
+
+    def process(self, job: Dict):
+        """
+        Scores the items of a job batch by batch, appending the results to its result file
+        Args:
+            job: job dictionary as returned by the job store
+        Return:
+            None
+        """
+        job_id = job["job_id"]
+        if job["task_name"] not in self.scorers:
+            raise ValueError("task %s cannot be run as a job" % job["task_name"])
+        scorer = self.scorers[job["task_name"]]
+        if job["n_items"] is None:
+            self.job_store.update(job_id, n_items=sum(1 for _ in read_items(job["input_file"])))
+        print("===========> running job %s (%s)" % (job_id, job["task_name"]))
+        start = time.time()
+        n_done = 0
+        batch = []
+        with open(job["result_file"], "w") as result_file:
+            for item in read_items(job["input_file"]):
+                batch.append(item)
+                if len(batch) == self.batch_size:
+                    if not self._write_batch(job_id, scorer, batch, n_done, result_file):
+                        return
+                    n_done += len(batch)
+                    batch = []
+            if len(batch) > 0 and not self._write_batch(job_id, scorer, batch, n_done, result_file):
+                return
+            n_done += len(batch)
+        if not self.job_store.transition(job_id, [RUNNING], self.job_store.owner, state=DONE, n_done=n_done,
+                                         finished_at=time.time()):
+            print("----> job %s was cancelled or requeued meanwhile" % job_id)
+            return
+        print("----> job %s scored %i items in %.2fs" % (job_id, n_done, time.time() - start))
+
+    def _write_batch(self, job_id: str, scorer: Callable, batch: List, offset: int, result_file) -> bool:
+        """
+        Scores a batch and appends its results
+        Args:
+            job_id: id of the job
+            scorer: function scoring a list of items
+            batch: list of items
+            offset: index of the first item of the batch in the job
+            result_file: opened result file
+        Return:
+            False if the job was cancelled meanwhile
+        """
+        if self.job_store.get(job_id)["state"] == CANCELLED:
+            print("----> job %s cancelled" % job_id)
+            return False
+        results = scorer(batch)
+        for i, result in enumerate(results):
+            result_file.write(json.dumps({"index": offset + i, "result": result}) + "\n")
+        result_file.flush()
+        self.job_store.update(job_id, n_done=offset + len(batch), heartbeat_at=time.time())
+        return True
@@ -0,0 +1,265 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1., 2.5, 5., 10.)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def format_labels(labels: Dict) -> str:
+    """
+    Renders a label set in the prometheus text format
+    Args:
+        labels: dictionary of label names and values
+    Return:
+        string such as {task="ner",stage="predict"}, empty without labels
+    """
+    if len(labels) == 0:
+        return ""
+    escaped = [(k, str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n"))
+               for k, v in labels.items()]
+    return "{" + ",".join("%s=\"%s\"" % (k, v) for k, v in escaped) + "}"
+
+
+def format_value(value) -> str:
+    """
+    Renders a sample value in the prometheus text format
+    """
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Metric:
+    """
+    Base class of the metrics, samples being kept per label set
+    """
+    metric_type = None
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def samples(self) -> List[Tuple[str, Dict, float]]:
+        """
+        Samples of the metric
+        Return:
+            list of (sample name, labels, value) tuples
+        """
+        with self._lock:
+            return [(self.name, dict(zip(self.label_names, key)), value) for key, value in self._values.items()]
+
+
+class Counter(Metric):
+    """
+    Monotonically increasing value
+    """
+    metric_type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """
+    Value that can go up and down
+    """
+    metric_type = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values over cumulative buckets
+    """
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple = (), buckets: Tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(buckets) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    def samples(self) -> List[Tuple[str, Dict, float]]:
+        samples = []
+        with self._lock:
+            values = [(k, list(counts), total) for k, (counts, total) in self._values.items()]
+        for key, counts, total in values:
+            labels = dict(zip(self.label_names, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                samples.append((self.name + "_bucket", dict(labels, le=format_value(bound)), cumulative))
+            samples.append((self.name + "_sum", labels, total))
+            samples.append((self.name + "_count", labels, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    Holds the metrics of the application and renders them in the prometheus text format.
+    Collectors are functions called at scrape time, for values owned by other components
+    such as the model states or the job queue
+    """
+    def __init__(self):
+        self.enabled = False
+        self.server_timing = False
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable):
+        """
+        Registers a function returning a list of (name, type, documentation, [(labels, value)]) tuples
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """
+        Text exposition of every metric
+        Return:
+            string in the prometheus text format
+        """
+        lines = []
+        families = [(m.name, m.metric_type, m.documentation, m.samples()) for m in self._metrics]
+        for collector in self._collectors:
+            for name, metric_type, documentation, values in collector():
+                families.append((name, metric_type, documentation, [(name, labels, v) for labels, v in values]))
+        for name, metric_type, documentation, samples in families:
+            lines.append("# HELP %s %s" % (name, documentation))
+            lines.append("# TYPE %s %s" % (name, metric_type))
+            for sample_name, labels, value in samples:
+                lines.append("%s%s %s" % (sample_name, format_labels(labels), format_value(value)))
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+REQUESTS = registry.register(Counter("marabou_requests_total", "number of answered requests",
+                                     ("endpoint", "status")))
+REQUEST_DURATION = registry.register(Histogram("marabou_request_duration_seconds", "request duration in seconds",
+                                               ("endpoint",)))
+STAGE_DURATION = registry.register(Histogram("marabou_stage_duration_seconds",
+                                             "duration of every stage of a request in seconds", ("task", "stage")))
+BATCH_SIZE = registry.register(Histogram("marabou_batch_size", "number of inputs scored per model call", ("task",),
+                                         BATCH_SIZE_BUCKETS))
+
+_request_state = threading.local()
+
+
+def configure(enabled: bool, server_timing: bool = False):
+    """
+    Turns the instrumentation on or off
+    Args:
+        enabled: whether the metrics are recorded and exposed
+        server_timing: whether the stage timings of a request are returned in its Server-Timing header
+    Return:
+        None
+    """
+    registry.enabled = enabled
+    registry.server_timing = enabled and server_timing
+
+
+@contextmanager
+def _timed_stage(task_name: str, stage_name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_DURATION.observe(duration, task=task_name, stage=stage_name)
+        timings = getattr(_request_state, "timings", None)
+        if timings is not None:
+            timings.append((stage_name, duration))
+
+
+class _NoOpStage:
+    """
+    Stage timer used while the instrumentation is off
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NO_OP_STAGE = _NoOpStage()
+
+
+def stage(task_name: str, stage_name: str):
+    """
+    Context manager timing a stage of a request, a shared no-op object being returned when metrics are off
+    Args:
+        task_name: name of the task
+        stage_name: name of the stage, such as 'preprocess' or 'predict'
+    Return:
+        context manager
+    """
+    if not registry.enabled:
+        return NO_OP_STAGE
+    return _timed_stage(task_name, stage_name)
+
+
+def observe_batch_size(task_name: str, batch_size: int):
+    """
+    Records the number of inputs of a model call
+    """
+    if registry.enabled:
+        BATCH_SIZE.observe(batch_size, task=task_name)
+
+
+def start_request():
+    """
+    Marks the start of a request handled by the current thread
+    """
+    if registry.enabled:
+        _request_state.start = time.perf_counter()
+        _request_state.timings = [] if registry.server_timing else None
+
+
+def end_request(endpoint: str, status: int) -> str:
+    """
+    Records the duration and status of the request handled by the current thread
+    Args:
+        endpoint: name of the flask endpoint
+        status: http status code of the response
+    Return:
+        value of the Server-Timing header, None if disabled
+    """
+    start = getattr(_request_state, "start", None)
+    if not registry.enabled or start is None:
+        return None
+    _request_state.start = None
+    duration = time.perf_counter() - start
+    REQUESTS.inc(endpoint=endpoint, status=status)
+    REQUEST_DURATION.observe(duration, endpoint=endpoint)
+    timings = getattr(_request_state, "timings", None)
+    _request_state.timings = None
+    if timings is None:
+        return None
+    entries = ["%s;dur=%.3f" % (name, 1000 * d) for name, d in timings]
+    return ", ".join(entries + ["total;dur=%.3f" % (1000 * duration)])
@@ -0,0 +1,360 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+
+
+NOT_LOADED = "not_loaded"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+DISABLED = "disabled"
+
+
+class ModelNotAvailableError(Exception):
+    """
+    Raised when a model is requested for a task that is disabled or could not be loaded
+    """
+
+
+class ServedModel:
+    """
+    A loaded model together with the number of requests currently using it
+    """
+    def __init__(self, model, version: str = None):
+        self.model = model
+        self.version = version
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def enter(self):
+        """
+        Marks the start of a request using the model
+        """
+        with self._condition:
+            self.in_flight += 1
+
+    def leave(self):
+        """
+        Marks the end of a request using the model
+        """
+        with self._condition:
+            self.in_flight -= 1
+            if self.in_flight == 0:
+                self._condition.notify_all()
+
+    def drain(self, timeout: float = None) -> bool:
+        """
+        Waits for all the requests using the model to finish
+        Args:
+            timeout: maximum waiting time in seconds, None waits forever
+        Return:
+            True if the model is not used anymore
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self.in_flight == 0, timeout)
+
+
+class ModelManager:
+    """
+    Keeps track of the models served by the application.
+    Each model is loaded either on its first request or in a background thread right after boot,
+    every task having its own lock so that a slow model never blocks the others
+    """
+    def __init__(self, drain_timeout: float = 60):
+        self.enabled_tasks = []
+        self.drain_timeout = drain_timeout
+        self._loaders = {}
+        self._warmups = {}
+        self._file_patterns = {}
+        self._file_suffixes = {}
+        self._models = {}
+        self._states = {}
+        self._errors = {}
+        self._load_times = {}
+        self._locks = {}
+        self._reload_locks = {}
+        self._reload_states = {}
+        self._swap_lock = threading.Lock()
+        self._watcher = None
+
+    def register(self, task_name: str, loader: Callable, warmup: Callable = None, file_pattern: str = None,
+                 file_suffixes: List[str] = None):
+        """
+        Registers the function used to load the model of a given task
+        Args:
+            task_name: name of the task served by the model
+            loader: function without arguments returning the object to be served
+            warmup: function called with the loaded object before it starts serving requests
+            file_pattern: pattern contained in the names of the task files under the trained models directory
+            file_suffixes: suffixes of the files loaded by the task, the other files matching the pattern are ignored
+        Return:
+            None
+        """
+        self._loaders[task_name] = loader
+        self._warmups[task_name] = warmup
+        self._file_patterns[task_name] = file_pattern
+        self._file_suffixes[task_name] = tuple(file_suffixes) if file_suffixes is not None else ("",)
+        self._locks[task_name] = threading.Lock()
+        self._reload_locks[task_name] = threading.Lock()
+        self._states[task_name] = NOT_LOADED
+        self._reload_states[task_name] = None
+
+    def configure(self, enabled_tasks: List[str]):
+        """
+        Selects the subset of registered tasks served by this deployment
+        Args:
+            enabled_tasks: names of the tasks to be served, the other tasks are disabled
+        Return:
+            None
+        """
+        unknown_tasks = [t for t in enabled_tasks if t not in self._loaders]
+        if len(unknown_tasks) > 0:
+            raise ValueError("unknown tasks %s, possible values are %s" % (unknown_tasks, list(self._loaders)))
+        self.enabled_tasks = list(enabled_tasks)
+        for task_name in self._loaders:
+            if task_name not in self.enabled_tasks:
+                self._states[task_name] = DISABLED
+            elif self._states[task_name] == DISABLED:
+                self._states[task_name] = NOT_LOADED
+
+    def get(self, task_name: str):
+        """
+        Returns the model of a given task, loading it first if needed
+        Args:
+            task_name: name of the task
+        Return:
+            the object built by the task loader
+        """
+        state = self._states.get(task_name, DISABLED)
+        if state == DISABLED:
+            raise ModelNotAvailableError("task %s is not enabled on this deployment" % task_name)
+        if state != READY:
+            self.load(task_name)
+        if self._states[task_name] != READY:
+            raise ModelNotAvailableError("model for task %s could not be loaded: %s" %
+                                         (task_name, self._errors.get(task_name)))
+        return self._models[task_name].model
+
+    @contextmanager
+    def acquire(self, task_name: str):
+        """
+        Context manager handing out the model of a given task for the duration of a request.
+        A model swapped out by a reload is only released once all the requests holding it are done
+        Args:
+            task_name: name of the task
+        Return:
+            the object built by the task loader
+        """
+        self.get(task_name)
+        with self._swap_lock:
+            served_model = self._models[task_name]
+            served_model.enter()
+        try:
+            yield served_model.model
+        finally:
+            served_model.leave()
+
+    def _build(self, task_name: str) -> ServedModel:
+        """
+        Loads and warms up a new instance of the model of a given task
+        Args:
+            task_name: name of the task
+        Return:
+            the loaded model, ready to serve
+        """
+        version = self._fingerprint(task_name)
+        model = self._loaders[task_name]()
+        if self._warmups[task_name] is not None:
+            print("===========> warming up %s model" % task_name)
+            self._warmups[task_name](model)
+        return ServedModel(model, version)
+
+    def load(self, task_name: str):
+        """
+        Loads the model of a given task unless it is already loaded.
+        Concurrent callers for the same task wait for a single load
+        Args:
+            task_name: name of the task
+        Return:
+            None
+        """
+        with self._locks[task_name]:
+            if self._states[task_name] in [READY, DISABLED]:
+                return
+            self._states[task_name] = LOADING
+            print("===========> loading %s model" % task_name)
+            start = time.time()
+            try:
+                served_model = self._build(task_name)
+            except Exception as error:  # pylint: disable=broad-except
+                self._errors[task_name] = str(error)
+                self._states[task_name] = FAILED
+                print("----> %s model loading failed: %s" % (task_name, error))
+                return
+            self._load_times[task_name] = time.time() - start
+            with self._swap_lock:
+                self._models[task_name] = served_model
+            self._errors.pop(task_name, None)
+            self._states[task_name] = READY
+            print("----> %s model loaded in %.2fs" % (task_name, self._load_times[task_name]))
+
+    def preload(self, background: bool = True):
+        """
+        Loads every enabled model
+        Args:
+            background: if true each model is loaded in its own daemon thread and the method returns immediately
+        Return:
+            None
+        """
+        for task_name in self.enabled_tasks:
+            if background:
+                thread = threading.Thread(target=self.load, args=(task_name,), name="load-%s" % task_name)
+                thread.daemon = True
+                thread.start()
+            else:
+                self.load(task_name)
+
+    def status(self) -> Dict:
+        """
+        Readiness state of every registered task
+        Return:
+            dictionary containing the state, load time, last loading error and requests in flight of each task
+        """
+        return {task_name: {"state": self._states[task_name],
+                            "load_time": self._load_times.get(task_name),
+                            "error": self._errors.get(task_name),
+                            "reload": self._reload_states[task_name],
+                            "version": self._models[task_name].version if task_name in self._models else None,
+                            "in_flight": self._models[task_name].in_flight if task_name in self._models else 0}
+                for task_name in self._loaders}
+
+    def is_ready(self, task_name: str) -> bool:
+        """
+        Whether the model of a given task is loaded and can serve requests
+        Args:
+            task_name: name of the task
+        Return:
+            boolean
+        """
+        return self._states.get(task_name) == READY
+
+    def reload(self, task_name: str, background: bool = True) -> bool:
+        """
+        Loads and warms up the latest model of a given task next to the one currently serving,
+        swaps it in atomically and releases the previous model once its in-flight requests are done.
+        If loading fails the previous model keeps serving
+        Args:
+            task_name: name of the task
+            background: if true the reload runs in a daemon thread and the method returns immediately
+        Return:
+            False if a reload of the same task is already running, True otherwise
+        """
+        if self._states.get(task_name, DISABLED) == DISABLED:
+            raise ModelNotAvailableError("task %s is not enabled on this deployment" % task_name)
+        if not self._reload_locks[task_name].acquire(blocking=False):
+            return False
+        if background:
+            thread = threading.Thread(target=self._reload, args=(task_name,), name="reload-%s" % task_name)
+            thread.daemon = True
+            thread.start()
+        else:
+            self._reload(task_name)
+        return True
+
+    def _reload(self, task_name: str):
+        """
+        Reload worker, expects the reload lock of the task to be held
+        Args:
+            task_name: name of the task
+        Return:
+            None
+        """
+        try:
+            if self._states[task_name] != READY:
+                self.load(task_name)
+                return
+            self._reload_states[task_name] = LOADING
+            print("===========> reloading %s model" % task_name)
+            start = time.time()
+            try:
+                served_model = self._build(task_name)
+            except Exception as error:  # pylint: disable=broad-except
+                self._reload_states[task_name] = FAILED
+                self._errors[task_name] = str(error)
+                print("----> %s model reloading failed, keeping the current model: %s" % (task_name, error))
+                return
+            with self._swap_lock:
+                previous_model = self._models[task_name]
+                self._models[task_name] = served_model
+            self._load_times[task_name] = time.time() - start
+            self._errors.pop(task_name, None)
+            self._reload_states[task_name] = READY
+            print("----> %s model swapped in after %.2fs" % (task_name, self._load_times[task_name]))
+            if not previous_model.drain(self.drain_timeout):
+                print("----> %s previous model still has %i requests in flight after %is" %
+                      (task_name, previous_model.in_flight, self.drain_timeout))
+            del previous_model
+        finally:
+            self._reload_locks[task_name].release()
+
+    def _fingerprint(self, task_name: str):
+        """
+        Summary of the files of a given task under the trained models directory
+        Args:
+            task_name: name of the task
+        Return:
+            string changing whenever a task file is added, removed or modified, None if unknown
+        """
+        file_pattern = self._file_patterns[task_name]
+        file_suffixes = self._file_suffixes[task_name]
+        root_dir = os.environ.get("MARABOU_HOME")
+        if file_pattern is None or root_dir is None:
+            return None
+        model_dir = os.path.join(root_dir, "marabou/evaluation/trained_models")
+        if not os.path.isdir(model_dir):
+            return None
+        files = []
+        for f in sorted(os.listdir(model_dir)):
+            if file_pattern in f and f.endswith(file_suffixes):
+                file_stat = os.stat(os.path.join(model_dir, f))
+                files.append("%s:%i:%i" % (f, file_stat.st_size, file_stat.st_mtime))
+        return "|".join(files)
+
+    def watch(self, interval: float):
+        """
+        Starts a daemon thread reloading a task whenever its files under the trained models directory change.
+        A change is only acted upon once the files stayed identical for a full interval,
+        so that a model still being copied is never loaded. Files failing to load are not retried until they change
+        Args:
+            interval: polling period in seconds
+        Return:
+            None
+        """
+        if self._watcher is not None:
+            return
+
+        def watch_loop():
+            pending = {}
+            failed = {}
+            while True:
+                time.sleep(interval)
+                for task_name in self.enabled_tasks:
+                    if self._states[task_name] != READY:
+                        continue
+                    fingerprint = self._fingerprint(task_name)
+                    if fingerprint is None or fingerprint in (self._models[task_name].version, failed.get(task_name)):
+                        pending.pop(task_name, None)
+                    elif pending.get(task_name) != fingerprint:
+                        pending[task_name] = fingerprint
+                    else:
+                        pending.pop(task_name)
+                        if self.reload(task_name, background=False) and self._reload_states[task_name] == FAILED:
+                            failed[task_name] = fingerprint
+                        else:
+                            failed.pop(task_name, None)
+
+        self._watcher = threading.Thread(target=watch_loop, name="model-watcher")
+        self._watcher.daemon = True
+        self._watcher.start()
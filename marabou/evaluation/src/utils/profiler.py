@@ -0,0 +1,152 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler sampling the python stacks of every thread of the process at a fixed interval.
+    Samples are aggregated as collapsed stacks, one 'frame;frame;frame count' line per distinct stack,
+    the input format of flamegraph.pl and speedscope. Optionally records the tensorflow op level trace
+    of the same period with the tensorflow profiler
+    """
+    def __init__(self, interval=0.005, max_duration=None, trace_tensorflow=False):
+        self.interval = interval
+        self.max_duration = max_duration
+        self.trace_tensorflow = trace_tensorflow
+        self.stacks = Counter()
+        self.n_samples = 0
+        self.start_time = None
+        self.duration = None
+        self.tensorflow_trace_dir = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def collapse(frame):
+        """
+        Root first representation of a python stack
+        Args:
+            frame: innermost frame of the stack
+        Return:
+            string of 'function (file:line)' entries separated by semicolons
+        """
+        entries = []
+        while frame is not None:
+            code = frame.f_code
+            entries.append("%s (%s:%i)" % (code.co_name, os.path.basename(code.co_filename), frame.f_lineno))
+            frame = frame.f_back
+        return ";".join(reversed(entries))
+
+    def _sample(self):
+        """
+        Sampling loop, runs until stop is called or max_duration is reached
+        """
+        thread_names = {}
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            if self.max_duration is not None and time.time() - self.start_time > self.max_duration:
+                break
+            if len(thread_names) != threading.active_count():
+                thread_names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():  # pylint: disable=protected-access
+                if thread_id == own_id:
+                    continue
+                self.stacks["%s;%s" % (thread_names.get(thread_id, thread_id), self.collapse(frame))] += 1
+            self.n_samples += 1
+        self._stop_tensorflow_trace()
+        self.duration = time.time() - self.start_time
+
+    def _start_tensorflow_trace(self, trace_dir):
+        try:
+            import tensorflow as tf
+            tf.profiler.experimental.start(trace_dir)
+            self.tensorflow_trace_dir = trace_dir
+        except Exception as error:  # pylint: disable=broad-except
+            print("----> tensorflow trace unavailable: %s" % error)
+
+    def _stop_tensorflow_trace(self):
+        if self.tensorflow_trace_dir is None:
+            return
+        try:
+            import tensorflow as tf
+            tf.profiler.experimental.stop()
+        except Exception as error:  # pylint: disable=broad-except
+            print("----> tensorflow trace could not be saved: %s" % error)
+            self.tensorflow_trace_dir = None
+
+    def start(self, tensorflow_trace_dir=None):
+        """
+        Starts sampling in a daemon thread
+        Args:
+            tensorflow_trace_dir: directory receiving the tensorflow trace, if trace_tensorflow is set
+        Return:
+            None
+        """
+        self.start_time = time.time()
+        if self.trace_tensorflow and tensorflow_trace_dir is not None:
+            self._start_tensorflow_trace(tensorflow_trace_dir)
+        self._thread = threading.Thread(target=self._sample, name="sampling-profiler")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops sampling and waits for the sampling thread to finish
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def save(self, file_name_prefix, perf_dir):
+        """
+        Writes the collapsed stacks and a short summary of the hottest frames under the perf directory
+        Args:
+            file_name_prefix: a file name prefix having the following format 'serving_%Y%m%d_%H%M%S'
+            perf_dir: output directory
+        Return:
+            path of the collapsed stacks file
+        """
+        os.makedirs(perf_dir, exist_ok=True)
+        collapsed_file = os.path.join(perf_dir, file_name_prefix + "_profile.collapsed")
+        with open(collapsed_file, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write("%s %i\n" % (stack, count))
+        leaf_counts = Counter()
+        for stack, count in self.stacks.items():
+            leaf_counts[stack.rsplit(";", 1)[-1]] += count
+        n_stack_samples = max(sum(leaf_counts.values()), 1)
+        summary_file = os.path.join(perf_dir, file_name_prefix + "_profile.txt")
+        with open(summary_file, "w") as f:
+            f.write("{:25} |{:>12}|\n".format("duration (s)", "%.2f" % (self.duration or 0)))
+            f.write("{:25} |{:>12}|\n".format("samples", self.n_samples))
+            f.write("{:25} |{:>12}|\n".format("interval (ms)", "%.1f" % (1000 * self.interval)))
+            if self.tensorflow_trace_dir is not None:
+                f.write("tensorflow trace: %s\n" % self.tensorflow_trace_dir)
+            f.write("\n{:80} |{:>8}|\n".format("hottest frames", "%"))
+            for frame, count in leaf_counts.most_common(30):
+                f.write("{:80} |{:8.2f}|\n".format(frame[:80], 100 * count / n_stack_samples))
+        print("----> profile saved to %s" % collapsed_file)
+        return collapsed_file
+
+
+def profile_for(duration, file_name_prefix, perf_dir, interval=0.005, trace_tensorflow=False):
+    """
+    Samples the whole process for a fixed duration while it keeps serving requests, then saves the profile
+    Args:
+        duration: sampling duration in seconds
+        file_name_prefix: a file name prefix having the following format 'serving_%Y%m%d_%H%M%S'
+        perf_dir: output directory
+        interval: sampling period in seconds
+        trace_tensorflow: whether the tensorflow op level trace is recorded along with the python stacks
+    Return:
+        path of the collapsed stacks file
+    """
+    profiler = SamplingProfiler(interval, duration, trace_tensorflow)
+    print("===========> profiling the service for %is" % duration)
+    profiler.start(os.path.join(perf_dir, file_name_prefix + "_tf_trace"))
+    time.sleep(duration)
+    profiler.stop()
+    return profiler.save(file_name_prefix, perf_dir)
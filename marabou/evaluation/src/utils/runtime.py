@@ -0,0 +1,243 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from typing import List
+from src.utils.config_loader import ServingConfigReader
+
+
+def get_worker_cpus(cpu_affinity) -> List[int]:
+    """
+    Cpus the current worker should be pinned to
+    Args:
+        cpu_affinity: None, 'auto' or a list of cpu lists indexed by the worker id
+    Return:
+        list of cpu ids, None to keep the default affinity
+    """
+    if cpu_affinity is None or not hasattr(os, "sched_getaffinity"):
+        return None
+    worker_id = int(os.environ.get("MARABOU_WORKER_ID", 0))
+    if cpu_affinity == "auto":
+        available_cpus = sorted(os.sched_getaffinity(0))
+        n_workers = int(os.environ.get("MARABOU_N_WORKERS", 1))
+        n_cpus = max(1, len(available_cpus) // n_workers)
+        start = (worker_id * n_cpus) % len(available_cpus)
+        return available_cpus[start:start + n_cpus]
+    return cpu_affinity[worker_id % len(cpu_affinity)]
+
+
+def set_thread_environment(omp_num_threads: int):
+    """
+    Sets OMP_NUM_THREADS and MKL_NUM_THREADS. The OpenMP and BLAS libraries size their thread pools when they
+    are loaded, so this must run before numpy and tensorflow are imported
+    Args:
+        omp_num_threads: OpenMP and MKL thread count, 0 leaves the environment untouched
+    Return:
+        None
+    """
+    if omp_num_threads <= 0:
+        return
+    if "numpy" in sys.modules or "tensorflow" in sys.modules:
+        print("----> numpy or tensorflow is already imported, OMP_NUM_THREADS=%i may not apply" % omp_num_threads)
+    os.environ["OMP_NUM_THREADS"] = str(omp_num_threads)
+    os.environ["MKL_NUM_THREADS"] = str(omp_num_threads)
+
+
+def set_thread_environment_from_config():
+    """
+    Applies omp_num_threads of the runtime section of the evaluation service configuration, if there is one,
+    unless OMP_NUM_THREADS is already set. Called by the entry point before its numpy and tensorflow imports
+    """
+    root_dir = os.environ.get("MARABOU_HOME")
+    if root_dir is None or "OMP_NUM_THREADS" in os.environ:
+        return
+    config_file_path = os.path.join(root_dir, "marabou/evaluation/config/config_serving.json")
+    if os.path.isfile(config_file_path):
+        set_thread_environment(ServingConfigReader(config_file_path).omp_num_threads)
+
+
+def configure_runtime(intra_op_threads: int, inter_op_threads: int, cpu_affinity=None):
+    """
+    Applies the tensorflow threading settings and the cpu affinity of the inference runtime.
+    Must be called before the first tensorflow operation runs, thread pools can not be resized afterwards
+    Args:
+        intra_op_threads: threads used inside a single op, 0 lets tensorflow decide
+        inter_op_threads: threads used to run independent ops concurrently, 0 lets tensorflow decide
+        cpu_affinity: None, 'auto' or a list of cpu lists indexed by the worker id
+    Return:
+        None
+    """
+    cpus = get_worker_cpus(cpu_affinity)
+    if cpus is not None:
+        os.sched_setaffinity(0, cpus)
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    print("----> runtime configured: intra op threads %i, inter op threads %i, omp threads %s, cpus %s" %
+          (intra_op_threads, inter_op_threads, os.environ.get("OMP_NUM_THREADS", "default"), cpus))
+
+
+def configure_runtime_from_config(serving_config: ServingConfigReader):
+    """
+    Applies the tensorflow threading settings of the runtime section of the evaluation service configuration,
+    omp_num_threads being applied by set_thread_environment_from_config before the imports
+    Args:
+        serving_config: evaluation service configuration
+    Return:
+        None
+    """
+    configure_runtime(serving_config.intra_op_parallelism_threads, serving_config.inter_op_parallelism_threads,
+                      serving_config.cpu_affinity)
+
+
+def measure_throughput(task_name: str, batch_size: int, duration: float) -> float:
+    """
+    Runs synthetic batches through the model of a task for a given duration
+    Args:
+        task_name: name of the task to measure
+        batch_size: number of inputs per batch
+        duration: measure duration in seconds
+    Return:
+        number of inputs scored per second
+    """
+    import numpy as np
+    from src import app
+    loaders = {app.SENTIMENT_ANALYSIS: app.load_sentiment_analysis,
+               app.NAMED_ENTITY_RECOGNITION: app.load_named_entity_recognition,
+               app.CLOTHING_CLASSIFIER: app.load_clothing_classifier}
+    loaded_model = loaders[task_name]()
+    model = loaded_model[0] if isinstance(loaded_model, tuple) else loaded_model
+    model.warm_up([batch_size])
+    inputs = np.zeros((batch_size,) + tuple(model.backend.input_signature[0][1:]))
+    if task_name == app.NAMED_ENTITY_RECOGNITION:
+        n_tokens_list = [inputs.shape[1]] * batch_size
+        score = lambda: model.predict_proba(inputs, n_tokens_list)
+    else:
+        score = lambda: model.predict_proba(inputs)
+    n_inputs = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        score()
+        n_inputs += batch_size
+    return n_inputs / (time.perf_counter() - start)
+
+
+def candidate_settings(n_workers: int) -> List[dict]:
+    """
+    Threading settings tried by the autotuner, sized on the cpus available to each worker
+    Args:
+        n_workers: number of workers sharing the host
+    Return:
+        list of runtime settings
+    """
+    n_cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    cpus_per_worker = max(1, n_cpus // n_workers)
+    intra_op_candidates = sorted({1, 2, max(1, cpus_per_worker // 2), cpus_per_worker})
+    settings = []
+    for intra_op_threads in intra_op_candidates:
+        for inter_op_threads in [1, 2]:
+            settings.append({"intra_op_parallelism_threads": intra_op_threads,
+                             "inter_op_parallelism_threads": inter_op_threads,
+                             "omp_num_threads": intra_op_threads,
+                             "cpu_affinity": "auto" if n_workers > 1 else None})
+    return settings
+
+
+def run_setting(setting: dict, task_name: str, n_workers: int, batch_size: int, duration: float) -> float:
+    """
+    Measures the total throughput of n_workers concurrent processes using the same runtime setting
+    Args:
+        setting: runtime settings to measure
+        task_name: name of the task to measure
+        n_workers: number of concurrent worker processes
+        batch_size: number of inputs per batch
+        duration: measure duration in seconds
+    Return:
+        number of inputs scored per second by all the workers
+    """
+    source_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    processes = []
+    for worker_id in range(n_workers):
+        env = dict(os.environ, MARABOU_WORKER_ID=str(worker_id), MARABOU_N_WORKERS=str(n_workers),
+                   PYTHONPATH=source_dir, TF_CPP_MIN_LOG_LEVEL="3")
+        command = [sys.executable, "-m", "src.utils.runtime", "--measure", "--task", task_name,
+                   "--batch-size", str(batch_size), "--duration", str(duration),
+                   "--setting", json.dumps(setting)]
+        processes.append(subprocess.Popen(command, env=env, stdout=subprocess.PIPE, universal_newlines=True))
+    throughput = 0.
+    for process in processes:
+        output, _ = process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError("measuring %s failed" % json.dumps(setting))
+        throughput += json.loads(output.strip().splitlines()[-1])["throughput"]
+    return throughput
+
+
+def autotune(config_file_path: str, task_name: str, n_workers: int, batch_size: int, duration: float) -> dict:
+    """
+    Measures the throughput of a few threading settings on the current host and writes the best one
+    back to the runtime section of the configuration file
+    Args:
+        config_file_path: path of the evaluation service configuration file
+        task_name: name of the task to measure
+        n_workers: number of workers sharing the host in production
+        batch_size: number of inputs per batch
+        duration: measure duration in seconds for each setting
+    Return:
+        the best runtime settings
+    """
+    print("===========> autotuning runtime settings for %s with %i workers" % (task_name, n_workers))
+    best_setting, best_throughput = None, 0.
+    for setting in candidate_settings(n_workers):
+        throughput = run_setting(setting, task_name, n_workers, batch_size, duration)
+        print("{:3} intra |{:3} inter |{:10.1f} inputs/s".format(
+            setting["intra_op_parallelism_threads"], setting["inter_op_parallelism_threads"], throughput))
+        if throughput > best_throughput:
+            best_setting, best_throughput = setting, throughput
+    if best_setting is None:
+        raise RuntimeError("no setting scored any input, %s is left unchanged" % config_file_path)
+    with open(config_file_path, "r") as f:
+        config = json.load(f)
+    config["runtime"].update(best_setting)
+    with open(config_file_path, "w") as f:
+        json.dump(config, f, indent=4)
+    print("----> best setting %s (%.1f inputs/s) saved to %s" % (best_setting, best_throughput, config_file_path))
+    return best_setting
+
+
+def parse_arguments():
+    """
+    Parse file arguments
+    """
+    parser = argparse.ArgumentParser(description="Finds the best cpu threading settings of the inference runtime")
+    parser.add_argument('--task', default="sentiment_analysis", help="task whose model is measured")
+    parser.add_argument('--workers', type=int, default=1, help="number of workers sharing the host in production")
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10, help="measure duration in seconds per setting")
+    parser.add_argument('--measure', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--setting', default=None, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    """main function"""
+    args = parse_arguments()
+    if args.measure:
+        setting = json.loads(args.setting)
+        set_thread_environment(setting["omp_num_threads"])
+        configure_runtime(setting["intra_op_parallelism_threads"], setting["inter_op_parallelism_threads"],
+                          setting["cpu_affinity"])
+        print(json.dumps({"throughput": measure_throughput(args.task, args.batch_size, args.duration)}))
+        return
+    root_dir = os.environ.get("MARABOU_HOME")
+    if root_dir is None:
+        raise ValueError("please make sure to setup the environment variable MARABOU_HOME to point\
+                         for the root of the project")
+    config_file_path = os.path.join(root_dir, "marabou/evaluation/config/config_serving.json")
+    autotune(config_file_path, args.task, args.workers, args.batch_size, args.duration)
+
+
+if __name__ == '__main__':
+    main()
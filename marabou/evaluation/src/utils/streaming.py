@@ -0,0 +1,61 @@
+import json
+from typing import Callable, Iterable, Iterator, List
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+def iter_ndjson_items(lines: Iterable) -> Iterator:
+    """
+    Parses newline delimited json lazily, one json value per line. Objects are reduced to their 'content' field
+    Args:
+        lines: iterable over the lines of the body, bytes or strings
+    Return:
+        iterator over the items
+    """
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if line.strip() == "":
+            continue
+        item = json.loads(line)
+        yield item["content"] if isinstance(item, dict) else item
+
+
+def iter_chunks(items: Iterable, chunk_size: int) -> Iterator[List]:
+    """
+    Groups items into lists of chunk_size items, the last one possibly being shorter
+    Args:
+        items: iterable over the items
+        chunk_size: number of items per chunk
+    Return:
+        iterator over the chunks
+    """
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if len(chunk) > 0:
+        yield chunk
+
+
+def stream_results(lines: Iterable, scorer: Callable, chunk_size: int) -> Iterator[str]:
+    """
+    Scores a newline delimited json body chunk by chunk and yields one json line per item as soon as its chunk
+    is done, only a single chunk being held in memory. A failing chunk ends the stream with an error line
+    Args:
+        lines: iterable over the lines of the body
+        scorer: function scoring a list of items
+        chunk_size: number of items scored at once
+    Return:
+        iterator over the result lines
+    """
+    offset = 0
+    try:
+        for chunk in iter_chunks(iter_ndjson_items(lines), chunk_size):
+            results = scorer(chunk)
+            yield "".join(json.dumps({"index": offset + i, "result": r}) + "\n" for i, r in enumerate(results))
+            offset += len(chunk)
+    except Exception as error:  # pylint: disable=broad-except
+        yield json.dumps({"index": offset, "error": str(error)}) + "\n"
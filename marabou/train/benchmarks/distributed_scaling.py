@@ -0,0 +1,149 @@
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+import argparse
+import json
+import multiprocessing
+import shutil
+import tempfile
+import time
+from benchmarks.hot_paths import TRAIN_DIR, SyntheticCorpus
+
+MODULE = "benchmarks.distributed_scaling"
+
+
+def write_config(corpus, task, n_epochs):
+    """
+    Copy of the task config training the embedding from scratch for a fixed number of epochs
+    """
+    name = "sentiment_analysis" if task == "sentiment" else "named_entity_recognition"
+    with open(os.path.join(TRAIN_DIR, "config", "config_%s.json" % name)) as f:
+        config = json.load(f)
+    config.update({"pre_trained_embedding": False, "experimental_mode": False, "n_epochs": n_epochs,
+                   "early_stopping_patience": 0, "vocab_size": 10000})
+    os.makedirs(os.path.join(corpus.train_dir, "config"), exist_ok=True)
+    config_file = os.path.join(corpus.train_dir, "config", "config_%s.json" % name)
+    with open(config_file, "w") as f:
+        json.dump(config, f)
+    return config_file
+
+
+def prepare_sentiment(corpus, config_file):
+    """
+    Encoded synthetic reviews, labeled by which of two frequent words they contain most often
+    """
+    from src.utils.config_loader import SentimentAnalysisConfigReader
+    from src.models.sentiment_analysis_rnn import DataPreprocessor, RNNModel
+    config = SentimentAnalysisConfigReader(config_file)
+    data_preprocessor = DataPreprocessor(config.max_sequence_length, config.validation_split, config.vocab_size)
+    y = [int(r.count(corpus.vocabulary[1]) > r.count(corpus.vocabulary[2])) for r in corpus.reviews]
+    X = data_preprocessor.tokenize_text(data_preprocessor.clean_data(corpus.reviews))
+    X_train, X_test, y_train, y_test = data_preprocessor.split_train_test(X, y)
+
+    def fit(process_group):
+        model = RNNModel(config=config, data_preprocessor=data_preprocessor)
+        history = model.fit(X_train, y_train, X_test, y_test, process_group=process_group)
+        return model, history
+
+    return fit, len(X_train)
+
+
+def prepare_ner(corpus, config_file):
+    """
+    Encoded synthetic kaggle like sentences
+    """
+    from src.utils.config_loader import NamedEntityRecognitionConfigReader
+    from src.models.named_entity_recognition_rnn import DataPreprocessor, RNNModel
+    config = NamedEntityRecognitionConfigReader(config_file)
+    data_preprocessor = DataPreprocessor(config.max_sequence_length, config.validation_split, config.vocab_size)
+    cleaned = data_preprocessor.clean_data([list(s) for s in corpus.sentences])
+    X, y = data_preprocessor.tokenize_text(cleaned, [list(t) for t in corpus.tags])
+    X_train, X_test, y_train, y_test = data_preprocessor.split_train_test(X, y)
+
+    def fit(process_group):
+        model = RNNModel(config=config, data_preprocessor=data_preprocessor)
+        history, _ = model.fit(X_train, y_train, X_test, y_test, data_preprocessor.labels_to_idx,
+                               process_group=process_group)
+        return model, history
+
+    # validation_split keeps the last 10% of the training set
+    return fit, int(len(X_train) * 0.9)
+
+
+def parse_arguments():
+    """
+    Parse file arguments
+    """
+    parser = argparse.ArgumentParser(description="Scaling efficiency of the data parallel training of the RNN models")
+    parser.add_argument('--task', choices=["sentiment", "ner"], default="sentiment")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help="numbers of processes compared")
+    parser.add_argument('--epochs', type=int, default=2)
+    parser.add_argument('--scale', type=float, default=1., help="multiplies the size of the synthetic corpora")
+    parser.add_argument('--sync-every', type=int, default=16, help="number of batches between two weight averagings")
+    parser.add_argument('--threads-per-worker', type=int, default=None,
+                        help="threads of every process, the cpu count divided by the largest number of workers "
+                             "by default so that every run has the same per process resources")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="optional .json file receiving the results")
+    parser.add_argument('--join', default=None, help="internal, runs a worker")
+    return parser.parse_args()
+
+
+def main():
+    """main function"""
+    args = parse_arguments()
+    if args.join is not None:
+        from src.utils.distributed import run_worker
+        from src.models.named_entity_recognition_rnn import CUSTOM_OBJECTS
+        run_worker(args.join, CUSTOM_OBJECTS)
+        return
+    n_threads = args.threads_per_worker or max(1, multiprocessing.cpu_count() // max(args.workers))
+    # inherited by the spawned workers, read by keras when it creates its session
+    os.environ["OMP_NUM_THREADS"] = str(n_threads)
+    if args.output is not None:
+        args.output = os.path.abspath(args.output)
+    root_dir = tempfile.mkdtemp(prefix="marabou_scaling_")
+    os.environ["MARABOU_HOME"] = root_dir
+    print("===========> generating synthetic corpora under %s" % root_dir)
+    corpus = SyntheticCorpus(root_dir, args.scale, args.seed)
+    from src.utils.checkpoints import seed_everything
+    from src.utils.distributed import ProcessGroup
+    config_file = write_config(corpus, args.task, args.epochs)
+    prepare = prepare_sentiment if args.task == "sentiment" else prepare_ner
+    fit, n_train = prepare(corpus, config_file)
+    results = []
+    try:
+        for n_workers in args.workers:
+            print("===========> training with %i processes" % n_workers)
+            seed_everything(args.seed)
+            process_group = None
+            if n_workers > 1:
+                process_group = ProcessGroup.create(n_workers, "127.0.0.1:0", 0, MODULE, args.sync_every)
+            try:
+                model, history = fit(process_group)
+            finally:
+                if process_group is not None:
+                    process_group.close()
+            wall_time = model.telemetry.summary()["wall_time_s"]
+            samples = (n_train // n_workers) * n_workers * args.epochs
+            results.append({"workers": n_workers, "threads_per_worker": n_threads, "wall_time_s": wall_time,
+                            "samples_per_sec": round(samples / wall_time, 1),
+                            "val_loss": round(float(history.history["val_loss"][-1]), 4)})
+    finally:
+        shutil.rmtree(root_dir, ignore_errors=True)
+    reference = next((r for r in results if r["workers"] == 1), results[0])
+    print("{:10}|{:>14}|{:>14}|{:>10}|{:>12}|{:>10}|".format(
+        "workers", "wall time (s)", "samples/s", "speedup", "efficiency", "val loss"))
+    for r in results:
+        r["speedup"] = round(r["samples_per_sec"] / reference["samples_per_sec"], 3)
+        r["efficiency"] = round(r["speedup"] * reference["workers"] / r["workers"], 3)
+        print("{:10}|{:>14.1f}|{:>14.1f}|{:>10.2f}|{:>12.2f}|{:>10.4f}|".format(
+            r["workers"], r["wall_time_s"], r["samples_per_sec"], r["speedup"], r["efficiency"], r["val_loss"]))
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump({"timestamp": time.strftime("%Y-%m-%d %H:%M:%S"), "arguments": vars(args),
+                       "results": results}, f, indent=2)
+        print("----> results saved to %s" % args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+import argparse
+import contextlib
+import io
+import json
+import shutil
+import string
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+TRAIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NER_TAGS = ["B-geo", "I-geo", "B-tim", "I-tim", "B-org", "I-org", "B-gpe", "I-gpe", "B-per", "I-per"]
+
+
+def measure(stage, function, setup=None, n_items=1, min_time=1., min_calls=3):
+    """
+    Calls a function until min_time seconds and min_calls calls are reached, then runs it once more
+    under tracemalloc. The setup function builds the call arguments and is not timed
+    Args:
+        stage: name displayed in the report
+        function: function to benchmark
+        setup: function returning the tuple of arguments of a call, None for no arguments
+        n_items: number of items (texts, words, images...) processed by a call
+        min_time: minimum total duration of the timed calls in seconds
+        min_calls: minimum number of timed calls
+    Return:
+        dictionary containing the throughput and allocations of the stage
+    """
+    durations = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        while sum(durations) < min_time or len(durations) < min_calls:
+            args = setup() if setup is not None else ()
+            start = time.perf_counter()
+            function(*args)
+            durations.append(time.perf_counter() - start)
+        args = setup() if setup is not None else ()
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        function(*args)
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    n_allocations = sum(s.count_diff for s in after.compare_to(before, "lineno") if s.count_diff > 0)
+    mean_duration = float(np.mean(durations))
+    result = {"stage": stage, "n_calls": len(durations), "mean_ms": round(1000 * mean_duration, 3),
+              "ops_per_sec": round(1 / mean_duration, 3), "items_per_sec": round(n_items / mean_duration, 1),
+              "peak_kb": round(peak / 1024, 1), "allocations": n_allocations}
+    print("{:32} |{:>12.3f}|{:>12.1f}|{:>12.1f}|{:>12}|".format(
+        stage, result["ops_per_sec"], result["items_per_sec"], result["peak_kb"], result["allocations"]))
+    return result
+
+
+class SyntheticCorpus:
+    """
+    Fixed synthetic corpora and files standing in for the imdb reviews, the kaggle ner dataset and the
+    pretrained embeddings, generated from a seed under a temporary MARABOU_HOME so that nothing is downloaded
+    """
+    def __init__(self, root_dir, scale=1., seed=0):
+        self.root_dir = root_dir
+        self.train_dir = os.path.join(root_dir, "marabou/train")
+        self.rng = np.random.RandomState(seed)
+        self.vocabulary = self.words(20000)
+        self.n_reviews = int(2000 * scale)
+        self.n_sentences = int(5000 * scale)
+        self.reviews = [self.review() for _ in range(self.n_reviews)]
+        self.sentences, self.tags = zip(*[self.sentence() for _ in range(self.n_sentences)])
+        os.makedirs(os.path.join(self.train_dir, "embeddings"), exist_ok=True)
+        os.makedirs(os.path.join(self.train_dir, "data"), exist_ok=True)
+        # the loaders call the download scripts, which find the files below and return
+        shutil.copytree(os.path.join(TRAIN_DIR, "bash_scripts"), os.path.join(self.train_dir, "bash_scripts"))
+
+    def words(self, n_words):
+        """
+        Distinct random lowercase words
+        """
+        letters = np.array(list(string.ascii_lowercase))
+        words = set()
+        while len(words) < n_words:
+            words.add("".join(self.rng.choice(letters, self.rng.randint(3, 11))))
+        return sorted(words)
+
+    def sample_words(self, n_words):
+        """
+        Words drawn from the vocabulary following a zipf distribution
+        """
+        idx = np.minimum(self.rng.zipf(1.2, n_words), len(self.vocabulary)) - 1
+        return [self.vocabulary[i] for i in idx]
+
+    def review(self):
+        """
+        Imdb like review with capitalized words, punctuation and html breaks
+        """
+        words = self.sample_words(max(10, int(self.rng.normal(230, 60))))
+        for i in self.rng.randint(0, len(words), len(words) // 12):
+            words[i] = words[i] + self.rng.choice([".", ",", "!", "?", "<br /><br />"])
+        words[0] = words[0].capitalize()
+        return " ".join(words)
+
+    def sentence(self):
+        """
+        Kaggle ner like sentence, given as a list of tokens, with its tags
+        """
+        words = self.sample_words(max(3, int(self.rng.normal(22, 6))))
+        words = [w.capitalize() if self.rng.rand() < 0.1 else w for w in words] + ["."]
+        tags = [str(self.rng.choice(NER_TAGS)) if self.rng.rand() < 0.15 else "O" for _ in words[:-1]] + ["O"]
+        return words, tags
+
+    def write_glove(self, dimension):
+        """
+        Glove 6B like embedding file of the given dimension, the 50d file being checked by the download script
+        """
+        for dim in sorted(set([50, dimension])):
+            with open(os.path.join(self.train_dir, "embeddings", "glove.6B.%id.txt" % dim), "w") as f:
+                for word in self.vocabulary:
+                    f.write(word + " " + " ".join("%.5f" % v for v in self.rng.randn(dim)) + "\n")
+
+    def write_fasttext(self):
+        """
+        Fasttext wiki news like embedding file, header line included
+        """
+        with open(os.path.join(self.train_dir, "embeddings", "wiki-news-300d-1M.vec"), "w") as f:
+            f.write("%i 300\n" % len(self.vocabulary))
+            for word in self.vocabulary:
+                f.write(word + " " + " ".join("%.4f" % v for v in self.rng.randn(300)) + "\n")
+
+    def write_kaggle_csv(self):
+        """
+        Kaggle ner dataset csv, the sentence number only being set on the first word of a sentence
+        """
+        lines = ["Sentence #,Word,POS,Tag"]
+        for i, (words, tags) in enumerate(zip(self.sentences, self.tags)):
+            for j, (word, tag) in enumerate(zip(words, tags)):
+                lines.append("%s,%s,NN,%s" % ("Sentence: %i" % (i + 1) if j == 0 else "", word, tag))
+        with open(os.path.join(self.train_dir, "data", "ner_dataset.csv"), "w", encoding="latin1") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+def benchmark_sentiment(corpus, min_time):
+    """
+    Sentiment analysis preprocessing stages
+    """
+    from src.models.sentiment_analysis_rnn import DataPreprocessor
+    data_preprocessor = DataPreprocessor(250, 0.2, 10000)
+    with contextlib.redirect_stdout(io.StringIO()):
+        cleaned = data_preprocessor.clean_data(corpus.reviews)
+        data_preprocessor.tokenize_text(cleaned)
+    preprocessor = {"tokenizer_obj": data_preprocessor.tokenizer_obj, "max_sequence_length": 250}
+    return [measure("sentiment.clean_data", data_preprocessor.clean_data, lambda: (corpus.reviews,),
+                    len(corpus.reviews), min_time),
+            measure("sentiment.tokenize_text", data_preprocessor.tokenize_text, lambda: (cleaned,),
+                    len(cleaned), min_time),
+            measure("sentiment.preprocess_data", DataPreprocessor.preprocess_data, lambda: (cleaned, preprocessor),
+                    len(cleaned), min_time)]
+
+
+def benchmark_ner(corpus, min_time):
+    """
+    Named entity recognition preprocessing stages
+    """
+    from src.models.named_entity_recognition_rnn import DataPreprocessor
+    data_preprocessor = DataPreprocessor(75, 0.2, 10000)
+    sentences = list(corpus.sentences)
+    tags = list(corpus.tags)
+    with contextlib.redirect_stdout(io.StringIO()):
+        cleaned = data_preprocessor.clean_data(sentences)
+        data_preprocessor.tokenize_text(cleaned, tags)
+    preprocessor = {"tokenizer_obj": data_preprocessor.tokenizer_obj, "max_sequence_length": 75}
+    raw_sentences = [" ".join(s) for s in sentences]
+    return [measure("ner.clean_data", data_preprocessor.clean_data, lambda: (sentences,), len(sentences), min_time),
+            measure("ner.tokenize_text", data_preprocessor.tokenize_text, lambda: (cleaned, tags), len(cleaned),
+                    min_time),
+            measure("ner.preprocess_data", DataPreprocessor.preprocess_data, lambda: (raw_sentences, preprocessor),
+                    len(raw_sentences), min_time)]
+
+
+def benchmark_embeddings(corpus, min_time):
+    """
+    Pretrained embedding matrices built from the synthetic embedding files
+    """
+    from src.models.embedding_layers import Glove6BEmbedding, FastTextEmbedding
+    word_index = {word: i + 1 for i, word in enumerate(corpus.vocabulary)}
+    corpus.write_glove(100)
+    corpus.write_fasttext()
+    with contextlib.redirect_stdout(io.StringIO()):
+        glove = Glove6BEmbedding(100, word_index, 10000, None, 250)
+        fasttext = FastTextEmbedding(word_index, 10000, None, 250)
+    return [measure("glove.get_embedding_matrix", glove.get_embedding_matrix, None, len(corpus.vocabulary),
+                    min_time),
+            measure("fasttext.get_embedding_matrix", fasttext.get_embedding_matrix, None, len(corpus.vocabulary),
+                    min_time)]
+
+
+def benchmark_kaggle(corpus, min_time):
+    """
+    Kaggle ner dataset parsing, the csv being written again before every call since get_set deletes it
+    """
+    from src.utils.data_utils import KaggleDataset
+
+    def setup():
+        corpus.write_kaggle_csv()
+        return ()
+
+    setup()
+    with contextlib.redirect_stdout(io.StringIO()):
+        dataset = KaggleDataset()
+    return [measure("kaggle.get_set", dataset.get_set, setup, len(corpus.sentences), min_time)]
+
+
+BENCHMARKS = {"sentiment": benchmark_sentiment,
+              "ner": benchmark_ner,
+              "embeddings": benchmark_embeddings,
+              "kaggle": benchmark_kaggle}
+
+
+def parse_arguments():
+    """
+    Parse file arguments
+    """
+    parser = argparse.ArgumentParser(description="Throughput and allocations of the training data hot paths")
+    parser.add_argument('--stages', nargs='+', default=list(BENCHMARKS), help="groups of stages to run")
+    parser.add_argument('--scale', type=float, default=1., help="multiplies the size of the synthetic corpora")
+    parser.add_argument('--min-time', type=float, default=1., help="minimum timed duration per stage in seconds")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="optional .json file receiving the results")
+    return parser.parse_args()
+
+
+def main():
+    """main function"""
+    args = parse_arguments()
+    if args.output is not None:
+        args.output = os.path.abspath(args.output)
+    root_dir = tempfile.mkdtemp(prefix="marabou_hot_paths_")
+    os.environ["MARABOU_HOME"] = root_dir
+    print("===========> generating synthetic corpora under %s" % root_dir)
+    corpus = SyntheticCorpus(root_dir, args.scale, args.seed)
+    # the glove loader reads the embeddings folder of the working directory
+    os.chdir(corpus.train_dir)
+    print("{:32} |{:>12}|{:>12}|{:>12}|{:>12}|".format("stage", "ops/s", "items/s", "peak kb", "allocations"))
+    results = []
+    try:
+        for stage in args.stages:
+            results.extend(BENCHMARKS[stage](corpus, args.min_time))
+    finally:
+        shutil.rmtree(root_dir, ignore_errors=True)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump({"timestamp": time.strftime("%Y-%m-%d %H:%M:%S"), "arguments": vars(args),
+                       "results": results}, f, indent=2)
+        print("----> results saved to %s" % args.output)
+
+
+if __name__ == '__main__':
+    main()
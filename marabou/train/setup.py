@@ -39,7 +39,9 @@ setup(name='marabou',
       entry_points={
           'console_scripts': ['marabou-train-sentiment-analysis=src.scripts.train_sentiment_analysis:main',
                               'marabou-eval-sentiment-analysis=src.scripts.eval_sentiment_analysis:main',
+                              'marabou-eval-sentiment-cascade=src.scripts.eval_sentiment_cascade:main',
                               'marabou-train-ner=src.scripts.train_named_entity_recognition:main',
+                              'marabou-search-hyperparameters=src.scripts.search_hyperparameters:main',
                               'marabou-eval-ner=src.scripts.eval_named_entity_recognition:main',
                               'marabou-train-fashion-classifier=src.scripts.train_fashion_classifier:main',
                               'marabou-eval-fashion-classifier=src.scripts.eval_fashion_classifier:main']
@@ -10,11 +10,13 @@ from keras.applications.vgg16 import VGG16
 from keras.models import Model, load_model
 from keras.layers import Dense, Flatten, Dropout
 from keras.utils import to_categorical
-import pandas as pd
 from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report
 import matplotlib.pyplot as plt
 from src.utils.config_loader import FashionClassifierConfigReader
+from src.utils.quantization import export_quantized_model, save_quantization_report
+from src.utils.telemetry import TrainingTelemetry
+from src.utils.checkpoints import ResumableTraining
+from src.utils.evaluation import classification_report, format_report, save_report
 
 
 class DataPreprocessor:
@@ -80,6 +82,12 @@ class CNNClothing:
         self.n_labels = None
         self.idx_to_labels = None
         self.batch_size = None
+        self.n_iter = 10
+        self.checkpoint_every_n_epochs = 1
+        self.early_stopping_patience = 0
+        self.seed = None
+        self.telemetry = None
+        self.training = None
         keys = kwargs.keys()
         if 'config' in keys:
             self.init_from_config_file(args[0], kwargs['config'])
@@ -112,7 +120,10 @@ class CNNClothing:
         self.use_pretrained_cnn = config.pre_trained_cnn
         self.pretrained_cnn_name = config.pretrained_network_name
         self.model = None
-        self.n_iter = 10
+        self.n_iter = config.n_epochs
+        self.checkpoint_every_n_epochs = config.checkpoint_every_n_epochs
+        self.early_stopping_patience = config.early_stopping_patience
+        self.seed = config.seed
         self.image_height = config.image_height
         self.image_width = config.image_width
         self.idx_to_labels = idx_to_labels
@@ -146,7 +157,29 @@ class CNNClothing:
         print(model.summary())
         return model
 
-    def fit(self, X_train, y_train, X_test=None, y_test=None):
+    def training_callbacks(self, file_name_prefix, resume):
+        """
+        Callbacks of a training run: telemetry, plus checkpoints and early stopping when a file name prefix is
+        given. When resuming, the model is reloaded from the last checkpoint of the run
+        Args:
+            file_name_prefix: a file name prefix having the following format 'fashion_imagenet_%Y%m%d_%H%M%S'
+            resume: whether the training continues from the last checkpoint of the run
+        Return:
+            tuple containing the callbacks, the initial epoch and the number of epochs
+        """
+        self.telemetry = TrainingTelemetry("cnn")
+        if file_name_prefix is None:
+            return [self.telemetry], 0, self.n_iter
+        self.training = ResumableTraining(file_name_prefix, "cnn", self.checkpoint_every_n_epochs,
+                                          self.early_stopping_patience, self.seed)
+        initial_epoch = 0
+        if resume and self.training.has_checkpoint():
+            self.model = load_model(self.training.model_file)
+            initial_epoch = self.training.restore()
+        n_epochs = initial_epoch if self.training.stopped else self.n_iter
+        return [self.telemetry, self.training], initial_epoch, n_epochs
+
+    def fit(self, X_train, y_train, X_test=None, y_test=None, file_name_prefix=None, resume=False):
         """
         Fits the model object to the data
         Args:
@@ -154,22 +187,24 @@ class CNNClothing:
             y_train: numpy array containing training targets
             X_test: numpy array containing encoded test features
             y_test: numpy array containing test targets
+            file_name_prefix: prefix of the run checkpoints, None disables checkpoints and early stopping
+            resume: whether the training continues from the last checkpoint of the run
         Return:
             history of mertrics + classification report
         """
         report = None
+        callbacks, initial_epoch, n_epochs = self.training_callbacks(file_name_prefix, resume)
         if (X_test is not None) and (y_test is not None):
-            history = self.model.fit(x=X_train, y=y_train, epochs=self.n_iter,
+            history = self.model.fit(x=X_train, y=y_train, epochs=n_epochs, initial_epoch=initial_epoch,
                                      batch_size=self.batch_size, validation_data=(X_test, y_test),
-                                     verbose=2)
-            y_hat = self.predict(X_test)
+                                     verbose=2, callbacks=callbacks)
+            y_hat = np.argmax(self.model.predict(X_test, batch_size=self.batch_size), axis=1)
             y = np.argmax(y_test, axis=1)
-            y = [self.idx_to_labels[i] for i in y]
-            report = classification_report(y, y_hat, output_dict=True)
-            df = pd.DataFrame(report).transpose().round(2)
-            print(df)
+            report = classification_report(y, y_hat, [self.idx_to_labels[i] for i in range(self.n_labels)])
+            print(format_report(report))
         else:
-            history = self.model.fit(x=X_train, y=y_train, epochs=self.n_iter, batch_size=self.batch_size, verbose=2)
+            history = self.model.fit(x=X_train, y=y_train, epochs=n_epochs, initial_epoch=initial_epoch,
+                                     batch_size=self.batch_size, verbose=2, callbacks=callbacks)
         return history, report
 
     def predict(self, X_test):
@@ -218,30 +253,38 @@ class CNNClothing:
         print("----> model saved to %s" % file_url_keras_model)
         print("----> class saved to %s" % file_url_class)
 
+    def export_quantized(self, file_name_prefix, mode="dynamic", calibration_data=None, X_holdout=None,
+                         y_holdout=None):
+        """
+        Exports a quantized tflite version of the model saved by save_model and compares it with the float model
+        Args:
+            file_name_prefix: a file name prefix having the following format 'fashion_imagenet_%Y%m%d_%H%M%S'
+            mode: quantization mode, 'dynamic' or 'int8'
+            calibration_data: array of training features, required for the 'int8' mode
+            X_holdout: array of held-out features used for the accuracy check
+            y_holdout: array of held-out class ids used for the accuracy check
+        Return:
+            accuracy check report
+        """
+        root_dir = os.environ.get("MARABOU_HOME")
+        model_folder = os.path.join(root_dir, "marabou/train/trained_models")
+        file_url_keras_model = os.path.join(model_folder, file_name_prefix + "_rnn_model.h5")
+        if not os.path.isfile(file_url_keras_model):
+            self.save_model(file_name_prefix)
+        _, report = export_quantized_model(file_url_keras_model, mode, calibration_data, X_holdout, y_holdout)
+        save_quantization_report(report, file_name_prefix)
+        return report
+
     def save_classification_report(self, report, file_name_prefix):
         """
         Saves the classification report to a txt file
         Args:
-            report: a classification report object
-            file_name_prefix: a file name prefix having the following format 'sentiment_analysis_%Y%m%d_%H%M%S'
+            report: a classification report dictionary
+            file_name_prefix: a file name prefix having the following format 'fashion_imagenet_%Y%m%d_%H%M%S'
         Return:
             None
         """
-        root_dir = os.environ.get("MARABOU_HOME")
-        if not os.path.isdir(os.path.join(root_dir, "marabou/train/perf")):
-            os.mkdir(os.path.join(root_dir, "marabou/train/perf"))
-        plot_folder = os.path.join(root_dir, "marabou/train/perf")
-        report_file_url = os.path.join(plot_folder, file_name_prefix + "_report.txt")
-        df = pd.DataFrame(report).transpose().round(2)
-        df['classes'] = df.index
-        f = open(report_file_url, "w")
-        line = "{:15} |{:10} |{:10} |{:10} |{:10}|\n".format("classes", "precision", "recall", "f1-score", "support")
-        f.write(line)
-        for _, row in df.iterrows():
-            line = "{:15} |{:10} |{:10} |{:10} |{:10}|\n".format(row[4], row[0], row[1], row[2], row[3])
-            f.write(line)
-        f.close()
-        print("----> classification report saved to %s" % report_file_url)
+        save_report(report, file_name_prefix)
 
     def save_learning_curve(self, history, file_name_prefix):
         """
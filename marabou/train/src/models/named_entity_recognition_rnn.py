@@ -18,13 +18,18 @@ from keras.preprocessing.text import Tokenizer
 from keras_contrib.layers import CRF
 from keras_contrib.losses import crf_loss
 from keras_contrib.metrics import crf_viterbi_accuracy
-import pandas as pd
 from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report
 import matplotlib.pyplot as plt
 from src.utils.config_loader import NamedEntityRecognitionConfigReader
+from src.utils.quantization import export_quantized_model, save_quantization_report
+from src.utils.telemetry import TrainingTelemetry
+from src.utils.checkpoints import ResumableTraining
+from src.utils.distributed import distribute_training
+from src.utils.evaluation import classification_report, entity_report, format_report, save_report
 from src.models.embedding_layers import FastTextEmbedding, Glove6BEmbedding
 
+CUSTOM_OBJECTS = {'CRF': CRF, 'crf_loss': crf_loss, 'crf_viterbi_accuracy': crf_viterbi_accuracy}
+
 
 class DataPreprocessor:
     """
@@ -190,6 +195,14 @@ class RNNModel:
         self.n_labels = None
         self.labels_to_idx = None
         self.n_iter = 5
+        self.lstm_units = 50
+        self.batch_size = 64
+        self.checkpoint_every_n_epochs = 1
+        self.early_stopping_patience = 0
+        self.seed = None
+        self.telemetry = None
+        self.training = None
+        self.entity_report = None
         keys = kwargs.keys()
         if 'config' in keys and 'data_preprocessor' in keys:
             self.init_from_config_file(kwargs['config'], kwargs['data_preprocessor'])
@@ -234,6 +247,12 @@ class RNNModel:
         elif self.embeddings_name == "fasttext":
             self.embeddings_path = config.embeddings_path_fasttext
         self.max_length = config.max_sequence_length
+        self.n_iter = config.n_epochs
+        self.lstm_units = config.lstm_units
+        self.batch_size = config.batch_size
+        self.checkpoint_every_n_epochs = config.checkpoint_every_n_epochs
+        self.early_stopping_patience = config.early_stopping_patience
+        self.seed = config.seed
         self.n_labels = len(data_preprocessor.labels_to_idx)
         self.word_index = data_preprocessor.tokenizer_obj.word_index
         self.labels_to_idx = data_preprocessor.labels_to_idx
@@ -289,8 +308,9 @@ class RNNModel:
         # model.compile(loss='categorical_crossentropy', optimizer="adam", metrics=['acc'])
 
         # # archi 3: crf layer
-        x = Bidirectional(LSTM(units=50, return_sequences=True, recurrent_dropout=0.2, dropout=0.2))(x)
-        x_rnn = Bidirectional(LSTM(units=50, return_sequences=True, recurrent_dropout=0.2, dropout=0.2))(x)
+        x = Bidirectional(LSTM(units=self.lstm_units, return_sequences=True, recurrent_dropout=0.2, dropout=0.2))(x)
+        x_rnn = Bidirectional(LSTM(units=self.lstm_units, return_sequences=True, recurrent_dropout=0.2,
+                                   dropout=0.2))(x)
         x = add([x, x_rnn])  # residual connection to the first biLSTM
         x = TimeDistributed(Dense(50, activation='relu'))(x)
         crf = CRF(self.n_labels)
@@ -323,18 +343,38 @@ class RNNModel:
         Return:
             numpy array containing the class for token character in the sentence
         """
-        probs = self.model.predict(encoded_text_list)
+        classes = np.argmax(self.model.predict(encoded_text_list), axis=2)
+        idx_to_labels = np.array(sorted(labels_to_idx, key=labels_to_idx.get), dtype=object)
         labels_list = []
-        for i in range(len(probs)):
-            if n_tokens_list is not None:
-                real_probs = probs[i][:n_tokens_list[i]]
-            else:
-                real_probs = probs[i]
-            classes = np.argmax(real_probs, axis=1)
-            labels_list.append(self.convert_idx_to_labels(classes, labels_to_idx))
+        for i in range(len(classes)):
+            real_classes = classes[i][:n_tokens_list[i]] if n_tokens_list is not None else classes[i]
+            labels_list.append(idx_to_labels[real_classes].tolist())
         return labels_list
 
-    def fit(self, X_train, y_train, X_test=None, y_test=None, labels_to_idx=None):
+    def training_callbacks(self, file_name_prefix, resume):
+        """
+        Callbacks of a training run: telemetry, plus checkpoints and early stopping when a file name prefix is
+        given. When resuming, the model is reloaded from the last checkpoint of the run
+        Args:
+            file_name_prefix: a file name prefix having the following format 'named_entity_recognition_%Y%m%d_%H%M%S'
+            resume: whether the training continues from the last checkpoint of the run
+        Return:
+            tuple containing the callbacks, the initial epoch and the number of epochs
+        """
+        self.telemetry = TrainingTelemetry(self.model_name)
+        if file_name_prefix is None:
+            return [self.telemetry], 0, self.n_iter
+        self.training = ResumableTraining(file_name_prefix, self.model_name, self.checkpoint_every_n_epochs,
+                                          self.early_stopping_patience, self.seed)
+        initial_epoch = 0
+        if resume and self.training.has_checkpoint():
+            self.model = load_model(self.training.model_file, custom_objects=CUSTOM_OBJECTS)
+            initial_epoch = self.training.restore()
+        n_epochs = initial_epoch if self.training.stopped else self.n_iter
+        return [self.telemetry, self.training], initial_epoch, n_epochs
+
+    def fit(self, X_train, y_train, X_test=None, y_test=None, labels_to_idx=None, file_name_prefix=None,
+            resume=False, process_group=None):
         """
         Fits the model object to the data
         Args:
@@ -343,28 +383,41 @@ class RNNModel:
             X_test: numpy array containing encoded test features
             y_test: numpy array containing test targets
             labels_to_idx: a dictionary containing the conversion from each class label to its id
+            file_name_prefix: prefix of the run checkpoints, None disables checkpoints and early stopping
+            resume: whether the training continues from the last checkpoint of the run
+            process_group: coordinator ProcessGroup of a distributed training, None trains on this process only
         Return:
             list of values related to each datasets and loss function
         """
         wts = 10 * np.ones((y_train.shape[0], y_train.shape[1]))
         classes = np.argmax(y_train, axis=2)
         wts[classes == self.labels_to_idx["pad"]] = 1
+        callbacks, initial_epoch, n_epochs = self.training_callbacks(file_name_prefix, resume)
+        validation = {"validation_split": 0.1}
+        if process_group is not None and process_group.world_size > 1:
+            # same validation set as validation_split, taken before sharding so that every shard has the same size
+            split_at = int(len(X_train) * 0.9)
+            validation = {"validation_data": (X_train[split_at:], y_train[split_at:])}
+            X_train, y_train, averaging = distribute_training(process_group, self.model, X_train[:split_at],
+                                                              y_train[:split_at], self.batch_size, n_epochs,
+                                                              initial_epoch)
+            callbacks.append(averaging)
         if (X_test is not None) and (y_test is not None):
             # history = self.model.fit(x=X_train, y=y_train, epochs=self.n_iter, batch_size=64,
             #                        sample_weight=wts, validation_split=0.1, verbose=2)
-            history = self.model.fit(X_train, y_train, batch_size=64, epochs=self.n_iter,
-                                     validation_split=0.1)
-            y_hat = self.predict(X_test, labels_to_idx)
-            true_classes = np.argmax(y_test, axis=2).tolist()
-            y = [self.convert_idx_to_labels(sublist, labels_to_idx) for sublist in true_classes]
-            y_flat = [val for sublist in y for val in sublist]
-            y_hat_flat = [val for sublist in y_hat for val in sublist]
-            report = classification_report(y_flat, y_hat_flat, output_dict=True)
-            df = pd.DataFrame(report).transpose().round(2)
-            print(df)
+            history = self.model.fit(X_train, y_train, batch_size=self.batch_size, epochs=n_epochs,
+                                     initial_epoch=initial_epoch, callbacks=callbacks, **validation)
+            y_hat = np.argmax(self.model.predict(X_test, batch_size=self.batch_size), axis=2)
+            y = np.argmax(y_test, axis=2)
+            target_names = sorted(labels_to_idx, key=labels_to_idx.get)
+            report = classification_report(y, y_hat, target_names, ignore=labels_to_idx["pad"])
+            self.entity_report = entity_report(y, y_hat, target_names, ignore=labels_to_idx["pad"])
+            print(format_report(report))
+            print(format_report(self.entity_report))
         else:
             report = None
-            history = self.model.fit(x=X_train, y=y_train, epochs=self.n_iter, batch_size=64, verbose=2)
+            history = self.model.fit(x=X_train, y=y_train, epochs=n_epochs, initial_epoch=initial_epoch,
+                                     batch_size=self.batch_size, verbose=2, callbacks=callbacks)
         return history, report
 
     def predict_proba(self, encoded_text_list, n_tokens_list):
@@ -408,30 +461,45 @@ class RNNModel:
         print("----> model saved to %s" % file_url_keras_model)
         print("----> class saved to %s" % file_url_class)
 
+    def export_quantized(self, file_name_prefix, mode="dynamic", calibration_data=None, X_holdout=None,
+                         y_holdout=None):
+        """
+        Exports a quantized tflite version of the model saved by save_model and compares it with the float model
+        Args:
+            file_name_prefix: a file name prefix having the following format 'named_entity_recognition_%Y%m%d_%H%M%S'
+            mode: quantization mode, 'dynamic' or 'int8'
+            calibration_data: array of training features, required for the 'int8' mode
+            X_holdout: array of held-out features used for the accuracy check
+            y_holdout: array of held-out class ids used for the accuracy check
+        Return:
+            accuracy check report
+        """
+        root_dir = os.environ.get("MARABOU_HOME")
+        model_folder = os.path.join(root_dir, "marabou/train/trained_models")
+        file_url_keras_model = os.path.join(model_folder, file_name_prefix + "_rnn_model.h5")
+        if not os.path.isfile(file_url_keras_model):
+            self.save_model(file_name_prefix)
+        try:
+            _, report = export_quantized_model(file_url_keras_model, mode, calibration_data, X_holdout, y_holdout)
+        except ValueError as error:
+            # the keras_contrib CRF layer can not be loaded by tf.keras, hence not converted to tflite
+            print("----> quantized export skipped: %s" % error)
+            return None
+        save_quantization_report(report, file_name_prefix)
+        return report
+
     def save_classification_report(self, report, file_name_prefix):
         """
-        Saves the classification report to a txt file
+        Saves the token level classification report, and the entity level report of the last evaluation, to txt files
         Args:
-            report: a classification report object
-            file_name_prefix: a file name prefix having the following format 'sentiment_analysis_%Y%m%d_%H%M%S'
+            report: a classification report dictionary
+            file_name_prefix: a file name prefix having the following format 'named_entity_recognition_%Y%m%d_%H%M%S'
         Return:
             None
         """
-        root_dir = os.environ.get("MARABOU_HOME")
-        if not os.path.isdir(os.path.join(root_dir, "marabou/train/perf")):
-            os.mkdir(os.path.join(root_dir, "marabou/train/perf"))
-        plot_folder = os.path.join(root_dir, "marabou/train/perf")
-        report_file_url = os.path.join(plot_folder, file_name_prefix + "_report.txt")
-        df = pd.DataFrame(report).transpose().round(2)
-        df['classes'] = df.index
-        f = open(report_file_url, "w")
-        line = "{:15} |{:10} |{:10} |{:10} |{:10}|\n".format("classes", "precision", "recall", "f1-score", "support")
-        f.write(line)
-        for _, row in df.iterrows():
-            line = "{:15} |{:10} |{:10} |{:10} |{:10}|\n".format(row[4], row[0], row[1], row[2], row[3])
-            f.write(line)
-        f.close()
-        print("----> classification report saved to %s" % report_file_url)
+        save_report(report, file_name_prefix)
+        if self.entity_report is not None:
+            save_report(self.entity_report, file_name_prefix, "entity_report")
 
     def save_learning_curve(self, history, file_name_prefix):
         """
@@ -17,6 +17,10 @@ from keras.layers import Embedding, Dense, LSTM
 from sklearn.model_selection import train_test_split
 import matplotlib.pyplot as plt
 from src.utils.config_loader import SentimentAnalysisConfigReader
+from src.utils.quantization import export_quantized_model, save_quantization_report
+from src.utils.telemetry import TrainingTelemetry
+from src.utils.checkpoints import ResumableTraining
+from src.utils.distributed import distribute_training
 from src.models.embedding_layers import Glove6BEmbedding, FastTextEmbedding
 nltk.download('punkt')
 nltk.download('stopwords')
@@ -78,6 +82,18 @@ class DataPreprocessor:
         print("features tensor shape ", review_pad.shape)
         return review_pad
 
+    def encode_texts(self, X: List):
+        """
+        Cleans and encodes new texts with the already fitted tokenizer
+        Args:
+            X: list of raw texts
+        Return:
+            padded sequences of token ids
+        """
+        sequences = self.tokenizer_obj.texts_to_sequences(self.clean_data(X))
+        return pad_sequences(sequences, maxlen=self.max_sequence_length, padding="post",
+                             value=self.tokenizer_obj.word_index["pad"])
+
     def split_train_test(self, X, y):
         """
         Wrapper method to split training data into a validation set and a training set
@@ -164,6 +180,14 @@ class RNNModel:
         self.word_index = None
         self.embedding_layer = None
         self.model = None
+        self.n_iter = 5
+        self.lstm_units = 64
+        self.batch_size = 128
+        self.checkpoint_every_n_epochs = 1
+        self.early_stopping_patience = 0
+        self.seed = None
+        self.telemetry = None
+        self.training = None
         keys = kwargs.keys()
         if 'config' in keys and 'data_preprocessor' in keys:
             self.init_from_config_file(kwargs['config'], kwargs['data_preprocessor'])
@@ -200,7 +224,12 @@ class RNNModel:
         self.vocab_size = config.vocab_size
         self.embedding_dimension = config.embedding_dimension
         self.embeddings_name = config.embedding_algorithm
-        self.n_iter = 5
+        self.n_iter = config.n_epochs
+        self.lstm_units = config.lstm_units
+        self.batch_size = config.batch_size
+        self.checkpoint_every_n_epochs = config.checkpoint_every_n_epochs
+        self.early_stopping_patience = config.early_stopping_patience
+        self.seed = config.seed
         if self.embeddings_name == "glove":
             self.embeddings_path = config.embeddings_path_glove
         elif self.embeddings_name == "fasttext":
@@ -240,7 +269,7 @@ class RNNModel:
         # Run the function
         input_layer = Input(shape=(self.max_length,), name='input')
         x = self.embedding_layer(input_layer)
-        x = LSTM(64, dropout=0.2, recurrent_dropout=0.2)(x)
+        x = LSTM(self.lstm_units, dropout=0.2, recurrent_dropout=0.2)(x)
         x = Dense(250, activation='relu')(x)
         x = Dense(1, activation='sigmoid')(x)
         model = Model(inputs=input_layer, outputs=x)
@@ -255,7 +284,30 @@ class RNNModel:
         print(model.summary())
         return model
 
-    def fit(self, X_train, y_train, X_test=None, y_test=None):
+    def training_callbacks(self, file_name_prefix, resume):
+        """
+        Callbacks of a training run: telemetry, plus checkpoints and early stopping when a file name prefix is
+        given. When resuming, the model is reloaded from the last checkpoint of the run
+        Args:
+            file_name_prefix: a file name prefix having the following format 'sentiment_analysis_%Y%m%d_%H%M%S'
+            resume: whether the training continues from the last checkpoint of the run
+        Return:
+            tuple containing the callbacks, the initial epoch and the number of epochs
+        """
+        self.telemetry = TrainingTelemetry(self.model_name)
+        if file_name_prefix is None:
+            return [self.telemetry], 0, self.n_iter
+        self.training = ResumableTraining(file_name_prefix, self.model_name, self.checkpoint_every_n_epochs,
+                                          self.early_stopping_patience, self.seed)
+        initial_epoch = 0
+        if resume and self.training.has_checkpoint():
+            self.model = load_model(self.training.model_file)
+            initial_epoch = self.training.restore()
+        n_epochs = initial_epoch if self.training.stopped else self.n_iter
+        return [self.telemetry, self.training], initial_epoch, n_epochs
+
+    def fit(self, X_train, y_train, X_test=None, y_test=None, file_name_prefix=None, resume=False,
+            process_group=None):
         """
         Fits the model object to the data
         Args:
@@ -263,15 +315,24 @@ class RNNModel:
             y_train: numpy array containing training targets
             X_test: numpy array containing encoded test features
             y_test: numpy array containing test targets
+            file_name_prefix: prefix of the run checkpoints, None disables checkpoints and early stopping
+            resume: whether the training continues from the last checkpoint of the run
+            process_group: coordinator ProcessGroup of a distributed training, None trains on this process only
         Return:
             list of values related to each datasets and loss function
         """
+        callbacks, initial_epoch, n_epochs = self.training_callbacks(file_name_prefix, resume)
+        if process_group is not None and process_group.world_size > 1:
+            X_train, y_train, averaging = distribute_training(process_group, self.model, X_train, y_train,
+                                                              self.batch_size, n_epochs, initial_epoch)
+            callbacks.append(averaging)
         if (X_test is not None) and (y_test is not None):
-            history = self.model.fit(x=X_train, y=y_train, epochs=self.n_iter,
-                                     batch_size=128, validation_data=(X_test, y_test),
-                                     verbose=2)
+            history = self.model.fit(x=X_train, y=y_train, epochs=n_epochs, initial_epoch=initial_epoch,
+                                     batch_size=self.batch_size, validation_data=(X_test, y_test),
+                                     verbose=2, callbacks=callbacks)
         else:
-            history = self.model.fit(x=X_train, y=y_train, epochs=self.n_iter, batch_size=128, verbose=2)
+            history = self.model.fit(x=X_train, y=y_train, epochs=n_epochs, initial_epoch=initial_epoch,
+                                     batch_size=self.batch_size, verbose=2, callbacks=callbacks)
         return history
 
     def predict(self, encoded_text_list):
@@ -311,9 +372,9 @@ class RNNModel:
         if not os.path.isdir(os.path.join(root_dir, "marabou/train/trained_models")):
             os.mkdir(os.path.join(root_dir, "marabou/train/trained_models"))
         model_folder = os.path.join(root_dir, "marabou/train/trained_models")
-        file_url_keras_model = os.path.join(model_folder, file_name_prefix + "_rnn_model.h5")
+        file_url_keras_model = os.path.join(model_folder, file_name_prefix + "_%s_model.h5" % self.model_name)
         self.model.save(file_url_keras_model)
-        file_url_class = os.path.join(model_folder, file_name_prefix + "_rnn_class.pkl")
+        file_url_class = os.path.join(model_folder, file_name_prefix + "_%s_class.pkl" % self.model_name)
         with open(file_url_class, 'wb') as handle:
             pickle.dump(self.use_pretrained_embedding, handle)
             pickle.dump(self.vocab_size, handle)
@@ -324,6 +385,28 @@ class RNNModel:
         print("----> model saved to %s" % file_url_keras_model)
         print("----> class saved to %s" % file_url_class)
 
+    def export_quantized(self, file_name_prefix, mode="dynamic", calibration_data=None, X_holdout=None,
+                         y_holdout=None):
+        """
+        Exports a quantized tflite version of the model saved by save_model and compares it with the float model
+        Args:
+            file_name_prefix: a file name prefix having the following format 'sentiment_analysis_%Y%m%d_%H%M%S'
+            mode: quantization mode, 'dynamic' or 'int8'
+            calibration_data: array of training features, required for the 'int8' mode
+            X_holdout: array of held-out features used for the accuracy check
+            y_holdout: array of held-out class ids used for the accuracy check
+        Return:
+            accuracy check report
+        """
+        root_dir = os.environ.get("MARABOU_HOME")
+        model_folder = os.path.join(root_dir, "marabou/train/trained_models")
+        file_url_keras_model = os.path.join(model_folder, file_name_prefix + "_%s_model.h5" % self.model_name)
+        if not os.path.isfile(file_url_keras_model):
+            self.save_model(file_name_prefix)
+        _, report = export_quantized_model(file_url_keras_model, mode, calibration_data, X_holdout, y_holdout)
+        save_quantization_report(report, file_name_prefix, self.model_name)
+        return report
+
     def save_learning_curve(self, history, file_name_prefix):
         """
         Saves the learning curve plot
@@ -0,0 +1,136 @@
+import os
+import time
+import numpy as np
+from keras.models import Model, Input
+from keras.layers import Embedding, Dense, GlobalAveragePooling1D
+from src.utils.config_loader import SentimentAnalysisConfigReader
+from src.models.sentiment_analysis_rnn import RNNModel, DataPreprocessor
+
+
+class StudentModel(RNNModel):
+    """
+    Pooled embedding model distilled from the RNN model. It shares the preprocessor and the input format
+    of the RNN model so that it can be served in its place
+    """
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.model_name = "student"
+
+    def init_from_config_file(self, config: SentimentAnalysisConfigReader, data_preprocessor: DataPreprocessor):
+        """
+        initialize the class for the first time from a given configuration file and data processor
+        Args:
+            config: .json configuration reader
+            data_preprocessor: preprocessing tool for the training data
+        Return:
+            None
+        """
+        self.use_pretrained_embedding = False
+        self.vocab_size = config.vocab_size
+        self.embedding_dimension = config.student_embedding_dimension
+        self.embeddings_path = None
+        self.n_iter = 10
+        self.checkpoint_every_n_epochs = config.checkpoint_every_n_epochs
+        self.early_stopping_patience = config.early_stopping_patience
+        self.seed = config.seed
+        self.max_length = config.max_sequence_length
+        self.word_index = data_preprocessor.tokenizer_obj.word_index
+        self.model = self.build_model()
+
+    def build_model(self):
+        """
+        Builds the student model: an embedding averaged over the sequence followed by a logistic output
+        Return:
+            None
+        """
+        print("===========> build student model")
+        input_layer = Input(shape=(self.max_length,), name='input')
+        x = Embedding(self.vocab_size, self.embedding_dimension, input_length=self.max_length)(input_layer)
+        x = GlobalAveragePooling1D()(x)
+        x = Dense(1, activation='sigmoid')(x)
+        model = Model(inputs=input_layer, outputs=x)
+        model.compile(loss='binary_crossentropy', optimizer="adam", metrics=['acc'])
+        print(model.summary())
+        return model
+
+
+def soften_probabilities(probs, temperature=1.):
+    """
+    Softens the positive class probabilities of the teacher by dividing their logits by a temperature
+    Args:
+        probs: array of probabilities
+        temperature: values above 1 move the probabilities towards 0.5
+    Return:
+        array of softened probabilities
+    """
+    probs = np.clip(np.asarray(probs, dtype=np.float64), 1e-7, 1 - 1e-7)
+    logits = np.log(probs / (1 - probs)) / temperature
+    return 1 / (1 + np.exp(-logits))
+
+
+def measure_latency(model, X, n_calls=50):
+    """
+    Mean duration in milliseconds of a single query and of a batch of 32 queries
+    Args:
+        model: keras model
+        X: array of encoded features, at least 32 rows
+        n_calls: number of timed calls
+    Return:
+        tuple containing the single query latency and the batch latency
+    """
+    latencies = []
+    for batch_size in [1, 32]:
+        batch = X[:batch_size]
+        model.predict_on_batch(batch)
+        start = time.perf_counter()
+        for _ in range(n_calls):
+            model.predict_on_batch(batch)
+        latencies.append(1000 * (time.perf_counter() - start) / n_calls)
+    return latencies[0], latencies[1]
+
+
+def compare_with_teacher(teacher: RNNModel, student: StudentModel, X_test, y_test):
+    """
+    Accuracy and latency trade-off of the student model against its teacher
+    Args:
+        teacher: trained RNN model
+        student: distilled student model
+        X_test: array of held-out encoded features
+        y_test: array of held-out targets
+    Return:
+        dictionary containing the accuracy, agreement, size and latency of both models
+    """
+    teacher_preds = np.asarray(teacher.predict(X_test))
+    student_preds = np.asarray(student.predict(X_test))
+    teacher_single_ms, teacher_batch_ms = measure_latency(teacher.model, X_test)
+    student_single_ms, student_batch_ms = measure_latency(student.model, X_test)
+    return {"teacher_accuracy": float(np.mean(teacher_preds == y_test)),
+            "student_accuracy": float(np.mean(student_preds == y_test)),
+            "prediction_agreement": float(np.mean(teacher_preds == student_preds)),
+            "teacher_parameters": teacher.model.count_params(),
+            "student_parameters": student.model.count_params(),
+            "teacher_single_query_ms": teacher_single_ms,
+            "student_single_query_ms": student_single_ms,
+            "teacher_batch_32_ms": teacher_batch_ms,
+            "student_batch_32_ms": student_batch_ms,
+            "single_query_speedup": teacher_single_ms / student_single_ms}
+
+
+def save_distillation_report(report, file_name_prefix):
+    """
+    Saves the accuracy and latency trade-off of the student model to a txt file
+    Args:
+        report: dictionary returned by compare_with_teacher
+        file_name_prefix: a file name prefix having the following format 'sentiment_analysis_%Y%m%d_%H%M%S'
+    Return:
+        None
+    """
+    root_dir = os.environ.get("MARABOU_HOME")
+    if not os.path.isdir(os.path.join(root_dir, "marabou/train/perf")):
+        os.mkdir(os.path.join(root_dir, "marabou/train/perf"))
+    plot_folder = os.path.join(root_dir, "marabou/train/perf")
+    report_file_url = os.path.join(plot_folder, file_name_prefix + "_distillation_report.txt")
+    with open(report_file_url, "w") as f:
+        for key, value in report.items():
+            f.write("{:25} |{:>12}|\n".format(key, str(round(value, 4) if isinstance(value, float) else value)))
+    print("----> distillation report saved to %s" % report_file_url)
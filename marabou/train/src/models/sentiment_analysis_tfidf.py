@@ -3,8 +3,9 @@ import os
 import re
 from itertools import compress
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer, TfidfTransformer
 from sklearn.naive_bayes import MultinomialNB
+from sklearn.pipeline import make_pipeline
 
 
 class DumbModel():
@@ -65,14 +66,45 @@ class DumbModel():
         Return:
             None
         """
-        model_folder = os.path.join(os.getcwd(), "models")
-        if not os.path.isdir(model_folder):
-            os.mkdir(model_folder)
+        root_dir = os.environ.get("MARABOU_HOME")
+        if not os.path.isdir(os.path.join(root_dir, "marabou/train/trained_models")):
+            os.mkdir(os.path.join(root_dir, "marabou/train/trained_models"))
+        model_folder = os.path.join(root_dir, "marabou/train/trained_models")
         file_url = os.path.join(model_folder, file_name_prefix + "_tfidf_model.pickle")
         with open(file_url, 'wb') as f:
             pickle.dump(self.vocab_size, f)
             pickle.dump(self.vectorizer, f)
             pickle.dump(self.clf, f)
+        print("----> model saved to %s" % file_url)
+
+    def export_scorer(self, file_name_prefix):
+        """
+        Compiles the fitted vectorizer and naive bayes classifier into an array bundle
+        served by the numpy scorer of the evaluation app, without any pickled sklearn object
+        Args:
+            file_name_prefix: a file name prefix having the following format 'sentiment_analysis_%Y%m%d_%H%M%S'
+        Return:
+            url of the exported bundle
+        """
+        root_dir = os.environ.get("MARABOU_HOME")
+        if not os.path.isdir(os.path.join(root_dir, "marabou/train/trained_models")):
+            os.mkdir(os.path.join(root_dir, "marabou/train/trained_models"))
+        model_folder = os.path.join(root_dir, "marabou/train/trained_models")
+        file_url = os.path.join(model_folder, file_name_prefix + "_tfidf_scorer.npz")
+        vocabulary = sorted(self.vectorizer.vocabulary_.items(), key=lambda item: item[1])
+        np.savez_compressed(file_url,
+                            vocabulary=np.array([term for term, _ in vocabulary], dtype=str),
+                            idf=self.vectorizer.idf_.astype(np.float32),
+                            feature_log_prob=self.clf.feature_log_prob_.astype(np.float32),
+                            class_log_prior=self.clf.class_log_prior_,
+                            classes=np.asarray(self.clf.classes_),
+                            lowercase=np.array(self.vectorizer.lowercase),
+                            token_pattern=np.array(self.vectorizer.token_pattern),
+                            ngram_range=np.array(self.vectorizer.ngram_range),
+                            norm=np.array(self.vectorizer.norm or ""),
+                            sublinear_tf=np.array(self.vectorizer.sublinear_tf))
+        print("----> scorer bundle saved to %s" % file_url)
+        return file_url
 
     def get_output(self, probs, query_list):
         """
@@ -97,10 +129,14 @@ class DumbModel():
             model object
         """
         model = None
-        model_dir = os.path.join(os.getcwd(), "models")
+        root_dir = os.environ.get("MARABOU_HOME")
+        if not os.path.isdir(os.path.join(root_dir, "marabou/evaluation/trained_models")):
+            os.mkdir(os.path.join(root_dir, "marabou/evaluation/trained_models"))
+        model_dir = os.path.join(root_dir, "marabou/evaluation/trained_models")
         model_files_list = os.listdir(model_dir)
         if len(model_files_list) > 0:
-            tfidf_models_idx = [("sentiment_analysis" in f) and ("tfidf" in f) for f in model_files_list]
+            tfidf_models_idx = [("sentiment_analysis" in f) and f.endswith("tfidf_model.pickle")
+                                for f in model_files_list]
             if sum(tfidf_models_idx) > 0:
                 tfidf_model = list(compress(model_files_list, tfidf_models_idx))
                 model_dates = [int(''.join(re.findall(r'\d+', f))) for f in tfidf_model]
@@ -113,3 +149,61 @@ class DumbModel():
                 return model
             return None
         return None
+
+
+class StreamingTfidfModel(DumbModel):
+    """
+    Out-of-core variant of the tfidf model. Texts are vectorized by a stateless hashing vectorizer,
+    the idf weights are estimated online from the document frequencies seen so far and the naive bayes
+    classifier is updated chunk by chunk, so the model size only depends on the number of hashed features.
+    The saved model has the same format as the DumbModel one and is served the same way
+    """
+    def __init__(self, n_features=2 ** 20):
+        super().__init__(vocab_size=n_features)
+        self.model_name = "tfidf_streaming_model"
+        self.n_docs = 0
+        self.document_frequencies = np.zeros(n_features, dtype=np.int64)
+        self.hashing_vectorizer = HashingVectorizer(n_features=n_features, alternate_sign=False, norm=None)
+        self.tfidf_transformer = TfidfTransformer()
+        self.vectorizer = make_pipeline(self.hashing_vectorizer, self.tfidf_transformer)
+        self.clf = MultinomialNB()
+
+    def partial_fit(self, X_chunk, y_chunk):
+        """
+        Updates the document frequencies, the idf estimate and the classifier with a chunk of texts
+        Args:
+            X_chunk: list of texts
+            y_chunk: list of targets
+        Return:
+            None
+        """
+        counts = self.hashing_vectorizer.transform(X_chunk)
+        self.n_docs += counts.shape[0]
+        self.document_frequencies += np.bincount(counts.indices, minlength=self.vocab_size)
+        # smoothed idf, as computed by TfidfTransformer on the documents seen so far
+        self.tfidf_transformer.idf_ = np.log((1 + self.n_docs) / (1 + self.document_frequencies)) + 1
+        self.clf.partial_fit(self.tfidf_transformer.transform(counts), y_chunk, classes=[0, 1])
+
+    def fit_stream(self, chunks, X_valid=None, y_valid=None):
+        """
+        Training function consuming an iterator of chunks, only one chunk is held in memory at a time
+        Args:
+            chunks: iterator of (texts, targets) tuples
+            X_valid: optional list of held-out texts evaluated after every chunk
+            y_valid: optional list of held-out targets
+        Return:
+            None
+        """
+        for i, (X_chunk, y_chunk) in enumerate(chunks):
+            self.partial_fit(X_chunk, y_chunk)
+            message = "----> chunk %i: %i documents seen" % (i + 1, self.n_docs)
+            if X_valid is not None and y_valid is not None:
+                accuracy = np.mean(np.asarray(self.predict(X_valid)) == np.asarray(y_valid))
+                message += ", validation accuracy %.4f" % accuracy
+            print(message)
+
+    def export_scorer(self, file_name_prefix):
+        """
+        Hashed features have no vocabulary to compile into a scorer bundle
+        """
+        raise ValueError("the streaming tfidf model uses hashed features and can not be exported as a scorer bundle")
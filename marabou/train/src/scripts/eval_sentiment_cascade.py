@@ -0,0 +1,131 @@
+import warnings
+warnings.filterwarnings('ignore')
+import argparse
+import os
+import time
+from typing import List, Tuple
+import numpy as np
+from src.models.sentiment_analysis_tfidf import DumbModel
+from src.models.sentiment_analysis_rnn import RNNModel, DataPreprocessor
+from src.utils.config_loader import SentimentAnalysisConfigReader
+from src.utils.data_utils import ImdbDataset
+
+
+def score_test_set(X_test: List[str]) -> Tuple[np.ndarray, np.ndarray, float, float]:
+    """
+    Scores the test reviews with both sentiment models and measures their cost
+    Args:
+        X_test: list of raw test reviews
+    Return:
+        tuple containing the tfidf probabilities, the rnn probabilities and the mean time in milliseconds
+        spent per input by each model, preprocessing included
+    """
+    tfidf_model = DumbModel.load_model()
+    rnn_model, preprocessor_file = RNNModel.load_model()
+    if tfidf_model is None or rnn_model is None:
+        raise ValueError("the cascade evaluation requires both a tfidf and a rnn sentiment analysis model")
+    pre_processor = DataPreprocessor.load_preprocessor(preprocessor_file)
+    start = time.perf_counter()
+    tfidf_probs = np.asarray(tfidf_model.predict_proba(X_test))
+    tfidf_ms = 1000 * (time.perf_counter() - start) / len(X_test)
+    start = time.perf_counter()
+    rnn_probs = np.asarray(rnn_model.predict_proba(DataPreprocessor.preprocess_data(X_test, pre_processor)))
+    rnn_ms = 1000 * (time.perf_counter() - start) / len(X_test)
+    return tfidf_probs, rnn_probs, tfidf_ms, rnn_ms
+
+
+def evaluate_band(lower_bound: float, upper_bound: float, tfidf_probs: np.ndarray, rnn_probs: np.ndarray,
+                  y_test: np.ndarray, tfidf_ms: float, rnn_ms: float) -> dict:
+    """
+    Accuracy and cost of the cascade for a given uncertainty band
+    Args:
+        lower_bound: lowest tfidf probability escalated to the rnn model
+        upper_bound: highest tfidf probability escalated to the rnn model
+        tfidf_probs: tfidf probabilities of the test reviews
+        rnn_probs: rnn probabilities of the test reviews
+        y_test: test targets
+        tfidf_ms: mean time spent per input by the tfidf model
+        rnn_ms: mean time spent per input by the rnn model
+    Return:
+        dictionary containing the escalation rate, the accuracy of the cascade and of the rnn model alone
+        and the estimated cost per input of the cascade relative to the rnn model alone
+    """
+    escalated = (tfidf_probs >= lower_bound) & (tfidf_probs <= upper_bound)
+    cascade_probs = np.where(escalated, rnn_probs, tfidf_probs)
+    escalation_rate = float(np.mean(escalated))
+    cascade_ms = tfidf_ms + escalation_rate * rnn_ms
+    return {"band": "%.2f-%.2f" % (lower_bound, upper_bound),
+            "escalation_rate": escalation_rate,
+            "cascade_accuracy": float(np.mean((cascade_probs > 0.5) == y_test)),
+            "rnn_accuracy": float(np.mean((rnn_probs > 0.5) == y_test)),
+            "cascade_ms_per_input": cascade_ms,
+            "relative_cost": cascade_ms / rnn_ms}
+
+
+def save_cascade_report(results: List[dict]) -> None:
+    """
+    Saves the cascade evaluation of every band to a txt file
+    Args:
+        results: list of dictionaries returned by evaluate_band
+    Return:
+        None
+    """
+    root_dir = os.environ.get("MARABOU_HOME")
+    if not os.path.isdir(os.path.join(root_dir, "marabou/train/perf")):
+        os.mkdir(os.path.join(root_dir, "marabou/train/perf"))
+    plot_folder = os.path.join(root_dir, "marabou/train/perf")
+    report_file_url = os.path.join(plot_folder, "sentiment_analysis_%s_cascade_report.txt" %
+                                   time.strftime("%Y%m%d_%H%M%S"))
+    with open(report_file_url, "w") as f:
+        f.write(format_row(results[0].keys()))
+        for result in results:
+            f.write(format_row(result.values()))
+    print("----> cascade report saved to %s" % report_file_url)
+
+
+def format_row(values) -> str:
+    """
+    Formats a line of the cascade report
+    """
+    return "".join("{:>22}|".format(str(round(v, 4)) if isinstance(v, float) else str(v)) for v in values) + "\n"
+
+
+def parse_arguments():
+    """
+    Parse file arguments
+    """
+    parser = argparse.ArgumentParser(description="Escalation rate and accuracy of the tfidf to rnn sentiment "
+                                                 "analysis cascade for several uncertainty bands")
+    parser.add_argument('--bands', nargs='+', default=["0.45,0.55", "0.4,0.6", "0.3,0.7", "0.2,0.8", "0.1,0.9"],
+                        help="uncertainty bands formatted as 'lower,upper'")
+    parser.add_argument('--limit', type=int, default=5000, help="number of imdb test reviews evaluated")
+    return parser.parse_args()
+
+
+def main():
+    """main function"""
+    args = parse_arguments()
+    root_dir = os.environ.get("MARABOU_HOME")
+    if root_dir is None:
+        raise ValueError("please make sure to setup the environment variable MARABOU_ROOT to\
+                         point for the root of the project")
+    config_file_path = os.path.join(root_dir, "marabou/train/config/config_sentiment_analysis.json")
+    valid_config = SentimentAnalysisConfigReader(config_file_path)
+    dataset = ImdbDataset(valid_config.dataset_url)
+    X_test, y_test = dataset.get_set("test")
+    ind = np.random.permutation(len(X_test))[:args.limit]
+    X_test = [X_test[i] for i in ind]
+    y_test = np.asarray(y_test)[ind]
+    tfidf_probs, rnn_probs, tfidf_ms, rnn_ms = score_test_set(X_test)
+    results = []
+    for band in args.bands:
+        lower_bound, upper_bound = [float(b) for b in band.split(",")]
+        results.append(evaluate_band(lower_bound, upper_bound, tfidf_probs, rnn_probs, y_test, tfidf_ms, rnn_ms))
+    print(format_row(results[0].keys()), end="")
+    for result in results:
+        print(format_row(result.values()), end="")
+    save_cascade_report(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,365 @@
+import argparse
+import contextlib
+import glob
+import itertools
+import json
+import math
+import os
+import pickle
+import tempfile
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from typing import Dict, List
+import numpy as np
+from src.utils.checkpoints import checkpoint_dir, seed_everything
+
+TASKS = ["sentiment_analysis", "named_entity_recognition"]
+CONFIG_FILES = {"sentiment_analysis": "marabou/train/config/config_sentiment_analysis.json",
+                "named_entity_recognition": "marabou/train/config/config_named_entity_recognition.json"}
+DEFAULT_SPACES = {"sentiment_analysis": {"vocab_size": [20000, 50000],
+                                         "max_sequence_length": [150, 250],
+                                         "embedding_algorithm": ["glove", "fasttext"],
+                                         "lstm_units": [32, 64, 128],
+                                         "batch_size": [64, 128]},
+                  "named_entity_recognition": {"vocab_size": [20000, 35000],
+                                               "max_sequence_length": [50, 75],
+                                               "embedding_algorithm": ["glove", "fasttext"],
+                                               "lstm_units": [50, 100],
+                                               "batch_size": [32, 64]}}
+# parameters changing the encoded dataset, every other parameter only changes the model
+PREPROCESSING_PARAMETERS = ["vocab_size", "max_sequence_length"]
+
+
+def sample_trials(space: Dict, n_trials: int, seed: int) -> List[Dict]:
+    """
+    Draws distinct parameter combinations from a grid
+    Args:
+        space: dictionary mapping config fields to the list of their candidate values
+        n_trials: number of combinations, the whole grid if larger than the grid
+        seed: seed of the draw
+    Return:
+        list of dictionaries of config field values
+    """
+    names = sorted(space)
+    grid = [dict(zip(names, values)) for values in itertools.product(*[space[n] for n in names])]
+    if n_trials >= len(grid):
+        return grid
+    rng = np.random.RandomState(seed)
+    return [grid[i] for i in sorted(rng.choice(len(grid), n_trials, replace=False))]
+
+
+def rung_epochs(min_epochs: int, max_epochs: int, eta: int) -> List[int]:
+    """
+    Cumulative number of epochs of every successive halving rung, e.g. [1, 3, 9] for 1, 9 and 3
+    """
+    epochs = [min_epochs]
+    while epochs[-1] < max_epochs:
+        epochs.append(min(max_epochs, epochs[-1] * eta))
+    return epochs
+
+
+def load_raw_data(task: str, config):
+    """
+    Loads and cleans the dataset of a task, the cleaning not depending on any searched parameter
+    Args:
+        task: 'sentiment_analysis' or 'named_entity_recognition'
+        config: configuration reader of the task
+    Return:
+        tuple of the cleaned features and the labels
+    """
+    if task == "sentiment_analysis":
+        from src.utils.data_utils import ImdbDataset
+        from src.models.sentiment_analysis_rnn import DataPreprocessor
+        dataset = ImdbDataset(config.dataset_url)
+        X, y = dataset.get_set("train")
+        X_test, y_test = dataset.get_set("test")
+        X, y = X + X_test, y + y_test
+    else:
+        from src.utils.data_utils import KaggleDataset
+        from src.models.named_entity_recognition_rnn import DataPreprocessor
+        X, y = KaggleDataset(config.dataset_url).get_set()
+    if config.experimental_mode:
+        ind = np.random.randint(0, len(X), 1000)
+        X = [X[i] for i in ind]
+        y = [y[i] for i in ind]
+    cleaned = DataPreprocessor(config.max_sequence_length, config.validation_split, config.vocab_size).clean_data(X)
+    return cleaned, y
+
+
+def prepare_datasets(task: str, config, cleaned: List, y: List, trials: List[Dict], data_dir: str) -> None:
+    """
+    Encodes and splits the dataset once per distinct preprocessing of the trials. Arrays are saved as .npy files
+    memory mapped read-only by the trials, the fitted preprocessors are pickled next to them
+    Args:
+        task: 'sentiment_analysis' or 'named_entity_recognition'
+        config: configuration reader of the task
+        cleaned: cleaned features
+        y: labels
+        trials: list of trial parameters
+        data_dir: output directory
+    Return:
+        None
+    """
+    if task == "sentiment_analysis":
+        from src.models.sentiment_analysis_rnn import DataPreprocessor
+    else:
+        from src.models.named_entity_recognition_rnn import DataPreprocessor
+    for key in sorted(set(preprocessing_key(config, trial) for trial in trials)):
+        vocab_size, max_sequence_length = key
+        print("===========> encoding the dataset for vocab_size=%i max_sequence_length=%i" % key)
+        data_preprocessor = DataPreprocessor(max_sequence_length, config.validation_split, vocab_size)
+        if task == "sentiment_analysis":
+            encoded = data_preprocessor.tokenize_text(cleaned)
+            labels = y
+        else:
+            encoded, labels = data_preprocessor.tokenize_text(cleaned, y)
+        # every preprocessing gets the same split
+        seed_everything(config.seed)
+        X_train, X_test, y_train, y_test = data_preprocessor.split_train_test(encoded, labels)
+        prefix = os.path.join(data_dir, "%i_%i" % key)
+        for name, array in [("X_train", X_train), ("X_test", X_test), ("y_train", y_train), ("y_test", y_test)]:
+            np.save("%s_%s.npy" % (prefix, name), np.asarray(array))
+        with open(prefix + "_preprocessor.pkl", "wb") as f:
+            pickle.dump(data_preprocessor, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def preprocessing_key(config, trial: Dict):
+    """
+    Vocabulary size and sequence length of a trial, the config values being used for the fields not searched
+    """
+    return tuple(trial.get(name, getattr(config, name)) for name in PREPROCESSING_PARAMETERS)
+
+
+def limit_threads(n_threads: int) -> None:
+    """
+    Pool initializer limiting the threads of the tensorflow and blas libraries of a trial process,
+    it runs before tensorflow is imported so that the limits apply to the keras session
+    """
+    for variable in ["OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "TF_NUM_INTRAOP_THREADS"]:
+        os.environ[variable] = str(n_threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+    os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(n_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+def run_trial(task: str, trial_id: str, config_file: str, data_prefix: str, n_epochs: int, resume: bool,
+              log_file: str) -> Dict:
+    """
+    Trains a trial up to n_epochs epochs, continuing from its checkpoint of the previous rung when resuming
+    Args:
+        task: 'sentiment_analysis' or 'named_entity_recognition'
+        trial_id: file name prefix of the trial
+        config_file: configuration file of the trial
+        data_prefix: prefix of the encoded dataset files of the trial
+        n_epochs: cumulative number of epochs at the end of the rung
+        resume: whether the trial continues from its last checkpoint
+        log_file: file receiving the output of the training
+    Return:
+        dictionary containing the best validation loss and metrics of the trial
+    """
+    start = time.time()
+    try:
+        with open(log_file, "a") as log, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+            arrays = {name: np.load("%s_%s.npy" % (data_prefix, name), mmap_mode="r")
+                      for name in ["X_train", "X_test", "y_train", "y_test"]}
+            with open(data_prefix + "_preprocessor.pkl", "rb") as f:
+                data_preprocessor = pickle.load(f)
+            if task == "sentiment_analysis":
+                from src.utils.config_loader import SentimentAnalysisConfigReader
+                from src.models.sentiment_analysis_rnn import RNNModel
+                config = SentimentAnalysisConfigReader(config_file)
+            else:
+                from src.utils.config_loader import NamedEntityRecognitionConfigReader
+                from src.models.named_entity_recognition_rnn import RNNModel
+                config = NamedEntityRecognitionConfigReader(config_file)
+            seed_everything(config.seed)
+            model = RNNModel(config=config, data_preprocessor=data_preprocessor)
+            # the rung sets the epoch budget, the checkpoint holds the epochs already trained
+            model.n_iter = n_epochs
+            if task == "sentiment_analysis":
+                history = model.fit(arrays["X_train"], arrays["y_train"], arrays["X_test"], arrays["y_test"],
+                                    trial_id, resume)
+            else:
+                history, _ = model.fit(arrays["X_train"], arrays["y_train"], arrays["X_test"], arrays["y_test"],
+                                       data_preprocessor.labels_to_idx, trial_id, resume)
+        best_epoch = int(np.argmin(history.history["val_loss"]))
+        metrics = {k: float(v[best_epoch]) for k, v in history.history.items() if k.startswith("val_")}
+        return {"status": "ok", "epochs": len(history.history["val_loss"]), "best_epoch": best_epoch + 1,
+                "val_loss": metrics.pop("val_loss"), "metrics": metrics, "duration_s": round(time.time() - start, 1)}
+    except Exception:  # pylint: disable=broad-except
+        with open(log_file, "a") as log:
+            log.write(traceback.format_exc())
+        return {"status": "failed", "val_loss": math.inf, "duration_s": round(time.time() - start, 1),
+                "error": traceback.format_exc().strip().splitlines()[-1]}
+
+
+def remove_checkpoints(trial_id: str) -> None:
+    """
+    Deletes the checkpoints of a pruned trial
+    """
+    for file_url in glob.glob(os.path.join(checkpoint_dir(), trial_id + "_*")):
+        os.remove(file_url)
+
+
+def successive_halving(task: str, trials: List[Dict], search_dir: str, n_workers: int, n_threads: int,
+                       epochs: List[int], eta: int) -> List[Dict]:
+    """
+    Runs every trial for the epochs of the first rung, keeps the best 1/eta trials by validation loss,
+    continues them from their checkpoints up to the epochs of the next rung, and so on.
+    Only the checkpoints of the best trial of the last rung are kept
+    Args:
+        task: 'sentiment_analysis' or 'named_entity_recognition'
+        trials: list of trial dictionaries containing the trial id, parameters, config file and data prefix
+        search_dir: directory receiving the trial logs
+        n_workers: number of trials trained in parallel
+        n_threads: number of threads of every trial
+        epochs: cumulative number of epochs of every rung
+        eta: reduction factor between two rungs
+    Return:
+        the trials updated with their results
+    """
+    context = multiprocessing.get_context("spawn")
+    alive = list(trials)
+    with ProcessPoolExecutor(n_workers, mp_context=context, initializer=limit_threads,
+                             initargs=(n_threads,)) as pool:
+        for rung, n_epochs in enumerate(epochs):
+            print("===========> rung %i: %i trials trained up to %i epochs" % (rung, len(alive), n_epochs))
+            futures = [pool.submit(run_trial, task, trial["trial_id"], trial["config_file"], trial["data_prefix"],
+                                   n_epochs, rung > 0, os.path.join(search_dir, trial["trial_id"] + ".log"))
+                       for trial in alive]
+            for trial, future in zip(alive, futures):
+                trial.update(future.result())
+                trial["rung"] = rung
+                print("----> %s %s val_loss %.4f in %.0f s" % (trial["trial_id"], trial["status"], trial["val_loss"],
+                                                               trial["duration_s"]))
+            if rung == len(epochs) - 1:
+                break
+            ranked = sorted([t for t in alive if t["status"] == "ok"], key=lambda t: t["val_loss"])
+            survivors = ranked[:max(1, int(math.ceil(len(alive) / eta)))]
+            for trial in alive:
+                if trial not in survivors:
+                    trial["status"] = "pruned" if trial["status"] == "ok" else trial["status"]
+                    remove_checkpoints(trial["trial_id"])
+            alive = survivors
+    finalists = sorted([t for t in alive if t["status"] == "ok"], key=lambda t: t["val_loss"])
+    for trial in alive:
+        if trial not in finalists[:1]:
+            remove_checkpoints(trial["trial_id"])
+    return trials
+
+
+def save_leaderboard(trials: List[Dict], search_prefix: str) -> None:
+    """
+    Saves the trials ranked by rung reached then validation loss, as a txt table and a json file under perf/
+    Args:
+        trials: trials updated with their results
+        search_prefix: a file name prefix having the following format 'search_sentiment_analysis_%Y%m%d_%H%M%S'
+    Return:
+        None
+    """
+    root_dir = os.environ.get("MARABOU_HOME")
+    if not os.path.isdir(os.path.join(root_dir, "marabou/train/perf")):
+        os.mkdir(os.path.join(root_dir, "marabou/train/perf"))
+    perf_folder = os.path.join(root_dir, "marabou/train/perf")
+    ranked = sorted(trials, key=lambda t: (-t.get("rung", -1), t["val_loss"]))
+    with open(os.path.join(perf_folder, search_prefix + "_leaderboard.json"), "w") as f:
+        json.dump([{k: v for k, v in t.items() if k not in ["config_file", "data_prefix"]} for t in ranked], f,
+                  indent=2, default=str)
+    file_url = os.path.join(perf_folder, search_prefix + "_leaderboard.txt")
+    with open(file_url, "w") as f:
+        f.write("{:>5}|{:>10}|{:>8}|{:>8}|{:>10}|{:>10}| {}\n".format(
+            "rank", "trial", "status", "epochs", "val_loss", "time (s)", "parameters"))
+        for rank, t in enumerate(ranked):
+            f.write("{:>5}|{:>10}|{:>8}|{:>8}|{:>10.4f}|{:>10.0f}| {}\n".format(
+                rank + 1, t["trial_id"].rsplit("_", 1)[-1], t["status"], t.get("epochs", 0), t["val_loss"],
+                t["duration_s"], json.dumps(t["parameters"], sort_keys=True)))
+    print("----> leaderboard saved to %s" % file_url)
+
+
+def search(task: str, space: Dict, n_trials: int, n_workers: int, n_threads: int, min_epochs: int,
+           max_epochs: int, eta: int) -> None:
+    """
+    Hyperparameter search over the config fields of a task. The dataset is loaded and cleaned once, encoded
+    once per distinct preprocessing, then shared read-only by the trials trained in a process pool
+    Args:
+        task: 'sentiment_analysis' or 'named_entity_recognition'
+        space: dictionary mapping config fields to the list of their candidate values
+        n_trials: number of parameter combinations tried
+        n_workers: number of trials trained in parallel
+        n_threads: number of threads of every trial
+        min_epochs: epochs of the first rung
+        max_epochs: epochs of the last rung
+        eta: reduction factor between two rungs
+    Return:
+        None
+    """
+    from src.utils.config_loader import SentimentAnalysisConfigReader, NamedEntityRecognitionConfigReader
+    root_dir = os.environ.get("MARABOU_HOME")
+    config_file = os.path.join(root_dir, CONFIG_FILES[task])
+    config = SentimentAnalysisConfigReader(config_file) if task == "sentiment_analysis" \
+        else NamedEntityRecognitionConfigReader(config_file)
+    unknown = [name for name in space if name not in config.config]
+    if len(unknown) > 0:
+        raise ValueError("unknown config fields in the search space: %s" % ", ".join(unknown))
+    search_prefix = "search_%s_%s" % (task, time.strftime("%Y%m%d_%H%M%S"))
+    search_dir = tempfile.mkdtemp(prefix=search_prefix + "_")
+    seed_everything(config.seed)
+    parameters = sample_trials(space, n_trials, config.seed)
+    print("===========> %i trials, logs and encoded datasets under %s" % (len(parameters), search_dir))
+    cleaned, y = load_raw_data(task, config)
+    prepare_datasets(task, config, cleaned, y, parameters, search_dir)
+    del cleaned, y
+    trials = []
+    for i, trial_parameters in enumerate(parameters):
+        trial_id = "%s_trial%02d" % (search_prefix, i)
+        trial_config_file = os.path.join(search_dir, trial_id + ".json")
+        with open(trial_config_file, "w") as f:
+            json.dump(dict(config.config, **trial_parameters), f, indent=4)
+        trials.append({"trial_id": trial_id, "parameters": trial_parameters, "config_file": trial_config_file,
+                       "data_prefix": os.path.join(search_dir, "%i_%i" % preprocessing_key(config, trial_parameters)),
+                       "val_loss": math.inf, "duration_s": 0.})
+    trials = successive_halving(task, trials, search_dir, n_workers, n_threads,
+                                rung_epochs(min_epochs, max_epochs, eta), eta)
+    save_leaderboard(trials, search_prefix)
+
+
+def parse_arguments():
+    """
+    Parse file arguments
+    """
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter search with successive halving")
+    parser.add_argument('--task', choices=TASKS, default="sentiment_analysis")
+    parser.add_argument('--space', default=None,
+                        help="json file mapping config fields to the list of their candidate values, "
+                             "a default space over the vocabulary, sequence length, embedding, lstm units and batch "
+                             "size is used otherwise")
+    parser.add_argument('--n-trials', type=int, default=16, help="number of parameter combinations tried")
+    parser.add_argument('--n-workers', type=int, default=2, help="number of trials trained in parallel")
+    parser.add_argument('--threads-per-trial', type=int, default=None,
+                        help="threads of every trial, the cpu count divided by the number of workers by default")
+    parser.add_argument('--min-epochs', type=int, default=1, help="epochs of the first successive halving rung")
+    parser.add_argument('--max-epochs', type=int, default=9, help="epochs of the surviving trials")
+    parser.add_argument('--eta', type=int, default=3, help="only the best 1/eta trials are kept at every rung")
+    return parser.parse_args()
+
+
+def main():
+    """main function"""
+    args = parse_arguments()
+    if os.environ.get("MARABOU_HOME") is None:
+        raise ValueError("please make sure to setup the environment variable MARABOU_ROOT to\
+                         point for the root of the project")
+    space = DEFAULT_SPACES[args.task]
+    if args.space is not None:
+        with open(args.space, "r") as f:
+            space = json.load(f)
+    n_threads = args.threads_per_trial or max(1, multiprocessing.cpu_count() // args.n_workers)
+    search(args.task, space, args.n_trials, args.n_workers, n_threads, args.min_epochs, args.max_epochs, args.eta)
+
+
+if __name__ == '__main__':
+    main()
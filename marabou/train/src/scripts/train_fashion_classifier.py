@@ -1,19 +1,24 @@
+import argparse
 import time
 import os
 import numpy as np
 from src.utils.data_utils import FashionImageNet
+from src.utils.profiler import run_profiled
+from src.utils.checkpoints import start_run
 from src.utils.config_loader import FashionClassifierConfigReader
 from src.models.cnn_classifier import DataPreprocessor, CNNClothing
 
 
-def train_model(config: FashionClassifierConfigReader) -> None:
+def train_model(config: FashionClassifierConfigReader, resume: bool = False) -> None:
     """
     training function which prints classification summary as as result
     Args:
         config: Configuration object containing parsed .json file parameters
+        resume: whether the most recent checkpointed run is continued
     Return:
         None
     """
+    file_prefix = start_run("fashion_imagenet", config.seed, resume)
     X, y = [], []
     if config.dataset_name == "fashion_mnist":
         dataset = FashionImageNet(config.dataset_url)
@@ -27,25 +32,50 @@ def train_model(config: FashionClassifierConfigReader) -> None:
     preprocessor = DataPreprocessor(config)
     X = preprocessor.load_images(X)
     X_train, X_test, y_train, y_test, idx_to_labels = preprocessor.split_train_test(X, y)
-    file_prefix = "fashion_imagenet_%s" % time.strftime("%Y%m%d_%H%M%S")
     trained_model = CNNClothing(idx_to_labels, config=config)
-    history, report = trained_model.fit(X_train, y_train, X_test, y_test)
+    history, report = trained_model.fit(X_train, y_train, X_test, y_test, file_prefix, resume)
     print("===========> saving learning curve and classification report under perf/")
     trained_model.save_learning_curve(history, file_prefix)
+    trained_model.telemetry.save(file_prefix)
     trained_model.save_classification_report(report, file_prefix)
     print("===========> saving trained model and preprocessor under models/")
     trained_model.save_model(file_prefix)
+    if config.quantization_mode != "none":
+        print("===========> exporting quantized model under models/")
+        calibration_idx = np.random.randint(0, len(X_train), 200)
+        trained_model.export_quantized(file_prefix, config.quantization_mode, X_train[calibration_idx],
+                                       X_test[:1000], np.argmax(y_test[:1000], axis=1))
+
+
+def parse_arguments():
+    """
+    Parse file arguments
+    """
+    parser = argparse.ArgumentParser(description="Train the clothing classification model")
+    parser.add_argument('--profile', action="store_true",
+                        help="samples the python stacks and records the tensorflow trace of the training, "
+                             "saved under perf/")
+    parser.add_argument('--profile-seconds', type=float, default=None,
+                        help="stops sampling after the given number of seconds, the whole training by default")
+    parser.add_argument('--resume', action="store_true",
+                        help="continues the most recent checkpointed run from its last checkpoint")
+    return parser.parse_args()
 
 
 def main():
     """main function"""
+    args = parse_arguments()
     root_dir = os.environ.get("MARABOU_HOME")
     if root_dir is None:
         raise ValueError("please make sure to setup the environment variable MARABOU_ROOT to\
                          point for the root of the project")
     config_file_path = os.path.join(root_dir, "marabou/train/config/config_fashion_classifier.json")
     train_config = FashionClassifierConfigReader(config_file_path)
-    train_model(train_config)
+    if args.profile:
+        run_profiled(lambda: train_model(train_config, args.resume),
+                     "fashion_imagenet_%s" % time.strftime("%Y%m%d_%H%M%S"), args.profile_seconds)
+    else:
+        train_model(train_config, args.resume)
 
 
 if __name__ == '__main__':
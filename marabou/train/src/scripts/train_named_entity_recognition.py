@@ -1,10 +1,14 @@
+import argparse
 from typing import List, Tuple
 import time
 import os
 import numpy as np
 from src.utils.data_utils import KaggleDataset
+from src.utils.profiler import run_profiled
+from src.utils.checkpoints import start_run
+from src.utils.distributed import ProcessGroup, run_worker
 from src.utils.config_loader import NamedEntityRecognitionConfigReader
-from src.models.named_entity_recognition_rnn import DataPreprocessor, RNNModel
+from src.models.named_entity_recognition_rnn import DataPreprocessor, RNNModel, CUSTOM_OBJECTS
 
 
 def get_training_validation_data(X: List, y: List, data_processor: DataPreprocessor)\
@@ -24,14 +28,18 @@ def get_training_validation_data(X: List, y: List, data_processor: DataPreproces
     return X_train, X_test, y_train, y_test
 
 
-def train_model(config: NamedEntityRecognitionConfigReader) -> None:
+def train_model(config: NamedEntityRecognitionConfigReader, resume: bool = False,
+                process_group: ProcessGroup = None) -> None:
     """
     training function which prints classification summary as as result
     Args:
         config: Configuration object containing parsed .json file parameters
+        resume: whether the most recent checkpointed run is continued
+        process_group: coordinator of a distributed training, None trains on this process only
     Return:
         None
     """
+    file_prefix = start_run("named_entity_recognition", config.seed, resume)
     X, y = [], []
     if config.dataset_name == "kaggle_ner":
         dataset = KaggleDataset(config.dataset_url)
@@ -43,26 +51,73 @@ def train_model(config: NamedEntityRecognitionConfigReader) -> None:
         y = [y[i] for i in ind]
     X_train, X_test, y_train, y_test = get_training_validation_data(X, y, data_preprocessor)
 
-    file_prefix = "named_entity_recognition_%s" % time.strftime("%Y%m%d_%H%M%S")
     trained_model = RNNModel(config=config, data_preprocessor=data_preprocessor)
-    history, report = trained_model.fit(X_train, y_train, X_test, y_test, data_preprocessor.labels_to_idx)
+    history, report = trained_model.fit(X_train, y_train, X_test, y_test, data_preprocessor.labels_to_idx,
+                                        file_prefix, resume, process_group)
     print("===========> saving learning curve and classification report under perf/")
     trained_model.save_learning_curve(history, file_prefix)
+    trained_model.telemetry.save(file_prefix)
     trained_model.save_classification_report(report, file_prefix)
     print("===========> saving trained model and preprocessor under models/")
     trained_model.save_model(file_prefix)
     data_preprocessor.save_preprocessor(file_prefix)
+    if config.quantization_mode != "none":
+        print("===========> exporting quantized model under models/")
+        calibration_idx = np.random.randint(0, len(X_train), 200)
+        trained_model.export_quantized(file_prefix, config.quantization_mode, X_train[calibration_idx],
+                                       X_test[:1000], np.argmax(y_test[:1000], axis=2))
+
+
+def parse_arguments():
+    """
+    Parse file arguments
+    """
+    parser = argparse.ArgumentParser(description="Train the named entity recognition model")
+    parser.add_argument('--profile', action="store_true",
+                        help="samples the python stacks and records the tensorflow trace of the training, "
+                             "saved under perf/")
+    parser.add_argument('--profile-seconds', type=float, default=None,
+                        help="stops sampling after the given number of seconds, the whole training by default")
+    parser.add_argument('--resume', action="store_true",
+                        help="continues the most recent checkpointed run from its last checkpoint")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="number of data parallel training processes averaging their weights, local processes "
+                             "are spawned for the workers that are not remote")
+    parser.add_argument('--remote-workers', type=int, default=0,
+                        help="number of workers joining from other machines with --join host:port")
+    parser.add_argument('--listen', default="127.0.0.1:0",
+                        help="host:port the coordinator listens on, use the LAN address for remote workers")
+    parser.add_argument('--sync-every', type=int, default=16, help="number of batches between two weight averagings")
+    parser.add_argument('--join', default=None,
+                        help="runs a training worker for the coordinator listening on host:port")
+    return parser.parse_args()
 
 
 def main():
     """main function"""
+    args = parse_arguments()
+    if args.join is not None:
+        run_worker(args.join, CUSTOM_OBJECTS)
+        return
     root_dir = os.environ.get("MARABOU_HOME")
     if root_dir is None:
         raise ValueError("please make sure to setup the environment variable MARABOU_ROOT to point\
                          for the root of the project")
     config_file_path = os.path.join(root_dir, "marabou/train/config/config_named_entity_recognition.json")
     train_config = NamedEntityRecognitionConfigReader(config_file_path)
-    train_model(train_config)
+    process_group = None
+    if args.workers > 1:
+        process_group = ProcessGroup.create(args.workers, args.listen, args.remote_workers,
+                                            "src.scripts.train_named_entity_recognition", args.sync_every)
+    try:
+        if args.profile:
+            run_profiled(lambda: train_model(train_config, args.resume, process_group),
+                         "named_entity_recognition_%s" % time.strftime("%Y%m%d_%H%M%S"), args.profile_seconds)
+        else:
+            train_model(train_config, args.resume, process_group)
+    finally:
+        if process_group is not None:
+            process_group.close()
 
 
 if __name__ == '__main__':
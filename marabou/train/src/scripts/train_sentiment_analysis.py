@@ -1,11 +1,17 @@
+import argparse
 import time
 from typing import List, Tuple
 import os
 import numpy as np
-from src.utils.data_utils import ImdbDataset
+from src.utils.data_utils import ImdbDataset, LineDelimitedDataset
+from src.utils.profiler import run_profiled
+from src.utils.checkpoints import start_run
+from src.utils.distributed import ProcessGroup, run_worker
 from src.utils.config_loader import SentimentAnalysisConfigReader
 from src.models.sentiment_analysis_rnn import RNNModel, DataPreprocessor
-from src.models.sentiment_analysis_tfidf import DumbModel
+from src.models.sentiment_analysis_tfidf import DumbModel, StreamingTfidfModel
+from src.models.sentiment_analysis_student import (StudentModel, soften_probabilities, compare_with_teacher,
+                                                   save_distillation_report)
 
 
 def get_training_validation_data(X: List, y: List, data_processor: DataPreprocessor)\
@@ -25,23 +31,92 @@ def get_training_validation_data(X: List, y: List, data_processor: DataPreproces
     return X_train, X_test, y_train, y_test
 
 
-def train_model(config: SentimentAnalysisConfigReader) -> None:
+def distill_model(config: SentimentAnalysisConfigReader, teacher: RNNModel, data_preprocessor: DataPreprocessor,
+                  dataset: ImdbDataset, X_train: np.ndarray, X_test: np.ndarray, y_test: np.ndarray,
+                  file_prefix: str, resume: bool = False) -> StudentModel:
+    """
+    Trains the student model on the soft probabilities of the teacher over the training set
+    and the unlabeled imdb reviews, then compares both models on the validation set
+    Args:
+        config: Configuration object containing parsed .json file parameters
+        teacher: trained RNN model
+        data_preprocessor: data handler object fitted on the training data
+        dataset: imdb dataset handler providing the unlabeled reviews
+        X_train: encoded training features
+        X_test: encoded validation features
+        y_test: validation targets
+        file_prefix: a file name prefix having the following format 'sentiment_analysis_%Y%m%d_%H%M%S'
+        resume: whether the training continues from the last checkpoint of the run
+    Return:
+        the trained student model
+    """
+    print("===========> distillation of the rnn model")
+    n_unlabeled = 1000 if config.experimental_mode else config.distillation_unlabeled_samples
+    X_unlabeled = dataset.get_unlabeled_set(n_unlabeled)
+    X_distill = X_train
+    if len(X_unlabeled) > 0:
+        X_distill = np.concatenate([X_train, data_preprocessor.encode_texts(X_unlabeled)])
+    print("----> %i training and %i unlabeled reviews" % (len(X_train), len(X_distill) - len(X_train)))
+    soft_targets = soften_probabilities(teacher.predict_proba(X_distill), config.distillation_temperature)
+    student = StudentModel(config=config, data_preprocessor=data_preprocessor)
+    history = student.fit(X_distill, soft_targets, X_test, y_test, file_prefix, resume)
+    student.save_learning_curve(history, file_prefix + "_student")
+    student.telemetry.save(file_prefix + "_student")
+    student.save_model(file_prefix)
+    report = compare_with_teacher(teacher, student, X_test, y_test)
+    save_distillation_report(report, file_prefix)
+    return student
+
+
+def train_streaming_model(config: SentimentAnalysisConfigReader, file_prefix: str) -> StreamingTfidfModel:
+    """
+    Trains the tfidf model out of core, the corpus is read chunk by chunk from the line delimited file
+    set in the configuration, or from the imdb dataset whose test set is then used for validation
+    Args:
+        config: Configuration object containing parsed .json file parameters
+        file_prefix: a file name prefix having the following format 'sentiment_analysis_%Y%m%d_%H%M%S'
+    Return:
+        the trained model
+    """
+    print("===========> streaming training of the tfidf model")
+    trained_model = StreamingTfidfModel(config.hashing_n_features)
+    X_valid, y_valid = None, None
+    if config.streaming_corpus_path != "":
+        chunks = LineDelimitedDataset(config.streaming_corpus_path).iter_chunks(config.streaming_chunk_size)
+    else:
+        dataset = ImdbDataset(config.dataset_url)
+        chunks = dataset.iter_chunks("train", config.streaming_chunk_size)
+        X_valid, y_valid = next(dataset.iter_chunks("test", 5000))
+    trained_model.fit_stream(chunks, X_valid, y_valid)
+    print("===========> saving trained model under models")
+    trained_model.save_model(file_prefix)
+    return trained_model
+
+
+def train_model(config: SentimentAnalysisConfigReader, resume: bool = False,
+                process_group: ProcessGroup = None) -> None:
     """
     Training function which prints classification summary as as result
     Args:
         config: Configuration object containing parsed .json file parameters
+        resume: whether the most recent checkpointed run is continued
+        process_group: coordinator of a distributed training of the rnn model, None trains on this process only
     Return:
         None
     """
+    if config.model_name == "tfidf" and config.streaming_training:
+        train_streaming_model(config, "sentiment_analysis_%s" % time.strftime("%Y%m%d_%H%M%S"))
+        return
+    file_prefix = start_run("sentiment_analysis", config.seed, resume)
     X, y = [], []
+    dataset = None
     if config.dataset_name == "imdb":
         dataset = ImdbDataset(config.dataset_url)
         X, y = dataset.get_set("train")
         X_test, y_test = dataset.get_set("test")
         X = X + X_test
         y = y + y_test
-    file_prefix = "sentiment_analysis_%s" % time.strftime("%Y%m%d_%H%M%S")
-    if config.model_name == "rnn":
+    if config.model_name in ["rnn", "distilled"]:
         data_preprocessor = DataPreprocessor(config.max_sequence_length, config.validation_split, config.vocab_size)
         if config.experimental_mode:
             ind = np.random.randint(0, len(X), 1000)
@@ -51,27 +126,83 @@ def train_model(config: SentimentAnalysisConfigReader) -> None:
         trained_model = None
         history = []
         trained_model = RNNModel(config=config, data_preprocessor=data_preprocessor)
-        history = trained_model.fit(X_train, y_train, X_test, y_test)
+        history = trained_model.fit(X_train, y_train, X_test, y_test, file_prefix, resume, process_group)
         print("===========> saving learning curve under plots/")
         trained_model.save_learning_curve(history, file_prefix)
+        trained_model.telemetry.save(file_prefix)
         print("===========> saving trained model and preprocessor under models/")
         trained_model.save_model(file_prefix)
         data_preprocessor.save_preprocessor(file_prefix)
+        if config.quantization_mode != "none":
+            print("===========> exporting quantized model under models/")
+            calibration_idx = np.random.randint(0, len(X_train), 200)
+            trained_model.export_quantized(file_prefix, config.quantization_mode, X_train[calibration_idx],
+                                           X_test[:1000], y_test[:1000])
+        if config.model_name == "distilled" and dataset is not None:
+            student = distill_model(config, trained_model, data_preprocessor, dataset, X_train, X_test, y_test,
+                                    file_prefix, resume)
+            if config.quantization_mode != "none":
+                student.export_quantized(file_prefix, config.quantization_mode, X_train[calibration_idx],
+                                         X_test[:1000], y_test[:1000])
     else:  # model_name =="tfidf"
         trained_model = DumbModel(config.vocab_size)
         trained_model.fit(X, y)
-        print("===========> saving trained model under models")
+        print("===========> saving trained model and scorer bundle under models")
         trained_model.save_model(file_prefix)
+        trained_model.export_scorer(file_prefix)
+
+
+def parse_arguments():
+    """
+    Parse file arguments
+    """
+    parser = argparse.ArgumentParser(description="Train the sentiment analysis model")
+    parser.add_argument('--profile', action="store_true",
+                        help="samples the python stacks and records the tensorflow trace of the training, "
+                             "saved under perf/")
+    parser.add_argument('--profile-seconds', type=float, default=None,
+                        help="stops sampling after the given number of seconds, the whole training by default")
+    parser.add_argument('--resume', action="store_true",
+                        help="continues the most recent checkpointed run from its last checkpoint")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="number of data parallel training processes averaging their weights, local processes "
+                             "are spawned for the workers that are not remote")
+    parser.add_argument('--remote-workers', type=int, default=0,
+                        help="number of workers joining from other machines with --join host:port")
+    parser.add_argument('--listen', default="127.0.0.1:0",
+                        help="host:port the coordinator listens on, use the LAN address for remote workers")
+    parser.add_argument('--sync-every', type=int, default=16, help="number of batches between two weight averagings")
+    parser.add_argument('--join', default=None,
+                        help="runs a training worker for the coordinator listening on host:port")
+    return parser.parse_args()
 
 
 def main():
     """main function"""
+    args = parse_arguments()
+    if args.join is not None:
+        run_worker(args.join)
+        return
     root_dir = os.environ.get("MARABOU_HOME")
     if root_dir is None:
         raise ValueError("please make sure to setup the environment variable MARABOU_ROOT to point for the root of the project")
     config_file_path = os.path.join(root_dir, "marabou/train/config/config_sentiment_analysis.json")
     train_config = SentimentAnalysisConfigReader(config_file_path)
-    train_model(train_config)
+    process_group = None
+    if args.workers > 1:
+        if train_config.model_name == "tfidf":
+            raise ValueError("distributed training is only available for the rnn model")
+        process_group = ProcessGroup.create(args.workers, args.listen, args.remote_workers,
+                                            "src.scripts.train_sentiment_analysis", args.sync_every)
+    try:
+        if args.profile:
+            run_profiled(lambda: train_model(train_config, args.resume, process_group),
+                         "sentiment_analysis_%s" % time.strftime("%Y%m%d_%H%M%S"), args.profile_seconds)
+        else:
+            train_model(train_config, args.resume, process_group)
+    finally:
+        if process_group is not None:
+            process_group.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,187 @@
+import os
+import glob
+import pickle
+import random
+import time
+import numpy as np
+from keras.callbacks import Callback
+
+
+def checkpoint_dir():
+    """
+    Directory receiving the training checkpoints, marabou/train/checkpoints
+    """
+    folder = os.path.join(os.environ.get("MARABOU_HOME"), "marabou/train/checkpoints")
+    if not os.path.isdir(folder):
+        os.mkdir(folder)
+    return folder
+
+
+def seed_everything(seed):
+    """
+    Seeds the python, numpy and tensorflow random generators. The data split, the experimental mode sampling
+    and the shuffling of keras fit all draw from the numpy generator, so a given seed fixes the data order
+    Args:
+        seed: integer seed
+    Return:
+        None
+    """
+    os.environ["PYTHONHASHSEED"] = str(seed)
+    random.seed(seed)
+    np.random.seed(seed)
+    import tensorflow as tf
+    tf.random.set_seed(seed)
+
+
+def latest_checkpoint(task_name):
+    """
+    State of the most recent checkpoint of a task
+    Args:
+        task_name: prefix of the training runs, such as 'sentiment_analysis'
+    Return:
+        dictionary containing the run prefix, the seed and the epoch of the checkpoint, None if there is none
+    """
+    state_files = glob.glob(os.path.join(checkpoint_dir(), task_name + "_*_checkpoint.pkl"))
+    if len(state_files) == 0:
+        return None
+    with open(max(state_files, key=os.path.getmtime), "rb") as f:
+        return pickle.load(f)
+
+
+class ResumableTraining(Callback):
+    """
+    Keras callback saving a checkpoint of the model, optimizer state included, every few epochs along with
+    everything needed to resume the run: next epoch, seed, numpy and python generator states (which drive
+    the shuffling of the next epochs), early stopping state and history. It also stops the training once
+    the monitored validation loss has not improved for `patience` epochs and restores the best weights at
+    the end of the training. Files are written to a temporary path first so that a crash never leaves a
+    truncated checkpoint
+    """
+    def __init__(self, file_name_prefix, model_name, every_n_epochs=1, patience=0, seed=None, monitor="val_loss"):
+        super().__init__()
+        self.file_name_prefix = file_name_prefix
+        self.model_name = model_name
+        self.every_n_epochs = every_n_epochs
+        self.patience = patience
+        self.seed = seed
+        self.monitor = monitor
+        prefix = os.path.join(checkpoint_dir(), "%s_%s" % (file_name_prefix, model_name))
+        self.model_file = prefix + "_checkpoint.h5"
+        self.state_file = prefix + "_checkpoint.pkl"
+        self.best_weights_file = prefix + "_best_weights.h5"
+        self.history = {}
+        self.best = np.inf
+        self.best_epoch = None
+        self.wait = 0
+        self.stopped = False
+        self._last_epoch = None
+        self._warned = False
+
+    def has_checkpoint(self):
+        return os.path.isfile(self.model_file) and os.path.isfile(self.state_file)
+
+    def restore(self):
+        """
+        Restores the state saved along with the checkpoint, the model itself being loaded by the caller
+        from model_file
+        Return:
+            epoch the training resumes from
+        """
+        with open(self.state_file, "rb") as f:
+            state = pickle.load(f)
+        np.random.set_state(state["numpy_random_state"])
+        random.setstate(state["python_random_state"])
+        self.history = state["history"]
+        self.best = state["best"]
+        self.best_epoch = state["best_epoch"]
+        self.wait = state["wait"]
+        self.stopped = state["stopped"]
+        print("----> resuming %s from epoch %i of %s" % (self.model_name, state["epoch"], self.model_file))
+        return state["epoch"]
+
+    def save(self, epoch):
+        """
+        Saves the model and the training state after the given epoch
+        """
+        self.model.save(self.model_file + ".tmp")
+        os.replace(self.model_file + ".tmp", self.model_file)
+        state = {"file_name_prefix": self.file_name_prefix,
+                 "model_name": self.model_name,
+                 "epoch": epoch + 1,
+                 "seed": self.seed,
+                 "numpy_random_state": np.random.get_state(),
+                 "python_random_state": random.getstate(),
+                 "history": self.history,
+                 "best": self.best,
+                 "best_epoch": self.best_epoch,
+                 "wait": self.wait,
+                 "stopped": self.stopped}
+        with open(self.state_file + ".tmp", "wb") as f:
+            pickle.dump(state, f)
+        os.replace(self.state_file + ".tmp", self.state_file)
+
+    def early_stopping(self, epoch, logs):
+        """
+        Keeps the best weights on disk and stops the training once the monitored value stalls
+        """
+        current = logs.get(self.monitor)
+        if current is None:
+            if not self._warned:
+                print("----> early stopping disabled, %s is not available" % self.monitor)
+                self._warned = True
+            return
+        if current < self.best:
+            self.best = float(current)
+            self.best_epoch = epoch
+            self.wait = 0
+            self.model.save_weights(self.best_weights_file)
+        else:
+            self.wait += 1
+            if self.wait >= self.patience:
+                self.stopped = True
+                self.model.stop_training = True
+                print("----> early stopping after epoch %i, best %s %.4f at epoch %i" %
+                      (epoch + 1, self.monitor, self.best, self.best_epoch + 1))
+
+    def on_epoch_end(self, epoch, logs=None):
+        logs = logs or {}
+        self._last_epoch = epoch
+        for k, v in logs.items():
+            self.history.setdefault(k, []).append(float(v))
+        if self.patience > 0:
+            self.early_stopping(epoch, logs)
+        if self.stopped or (epoch + 1) % self.every_n_epochs == 0 or epoch + 1 == self.params.get("epochs"):
+            self.save(epoch)
+
+    def on_train_end(self, logs=None):
+        if self.best_epoch is not None and self.best_epoch != self._last_epoch \
+                and os.path.isfile(self.best_weights_file):
+            self.model.load_weights(self.best_weights_file)
+            print("----> best weights of epoch %i restored" % (self.best_epoch + 1))
+        # the history of a resumed run starts with the epochs trained before the interruption
+        if self.model.history is not None:
+            self.model.history.history = dict(self.history)
+
+
+def start_run(task_name, seed, resume=False):
+    """
+    Names and seeds a training run. When resuming, the run of the most recent checkpoint of the task
+    is continued with its own seed, so that the data split and order are the same as before the interruption
+    Args:
+        task_name: prefix of the training runs, such as 'sentiment_analysis'
+        seed: seed of a new run
+        resume: whether the most recent checkpointed run of the task is continued
+    Return:
+        file name prefix of the run, having the following format 'sentiment_analysis_%Y%m%d_%H%M%S'
+    """
+    state = latest_checkpoint(task_name) if resume else None
+    if resume and state is None:
+        print("----> no checkpoint found for %s, training from scratch" % task_name)
+    if state is not None:
+        file_name_prefix, seed = state["file_name_prefix"], state["seed"]
+        print("----> resuming run %s" % file_name_prefix)
+    else:
+        file_name_prefix = "%s_%s" % (task_name, time.strftime("%Y%m%d_%H%M%S"))
+    if seed is not None:
+        seed_everything(seed)
+    return file_name_prefix
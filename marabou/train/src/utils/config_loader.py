@@ -138,6 +138,104 @@ class SentimentAnalysisConfigReader():
         """
         return self.config["preprocessor_file_url"]
 
+    @property
+    def quantization_mode(self):
+        """
+        quantization applied to the exported tflite model: 'none', 'dynamic' or 'int8'
+        """
+        return self.config["quantization_mode"]
+
+    @property
+    def n_epochs(self):
+        """
+        maximum number of training epochs
+        """
+        return self.config["n_epochs"]
+
+    @property
+    def checkpoint_every_n_epochs(self):
+        """
+        number of epochs between two training checkpoints
+        """
+        return self.config["checkpoint_every_n_epochs"]
+
+    @property
+    def early_stopping_patience(self):
+        """
+        number of epochs without validation loss improvement before the training stops, 0 disables early stopping
+        """
+        return self.config["early_stopping_patience"]
+
+    @property
+    def seed(self):
+        """
+        seed of the python, numpy and tensorflow random generators
+        """
+        return self.config["seed"]
+
+    @property
+    def lstm_units(self):
+        """
+        number of units of the lstm layers
+        """
+        return self.config["lstm_units"]
+
+    @property
+    def batch_size(self):
+        """
+        number of training samples per gradient update
+        """
+        return self.config["batch_size"]
+
+    @property
+    def streaming_training(self):
+        """
+        whether the tfidf model is trained out of core with a hashing vectorizer
+        """
+        return self.config["streaming_training"]
+
+    @property
+    def streaming_chunk_size(self):
+        """
+        number of reviews held in memory at a time by the streaming training
+        """
+        return self.config["streaming_chunk_size"]
+
+    @property
+    def hashing_n_features(self):
+        """
+        number of hashed features of the streaming tfidf model
+        """
+        return self.config["hashing_n_features"]
+
+    @property
+    def streaming_corpus_path(self):
+        """
+        line delimited corpus streamed instead of imdb, empty to use imdb
+        """
+        return self.config["streaming_corpus_path"]
+
+    @property
+    def student_embedding_dimension(self):
+        """
+        embedding dimension of the distilled student model
+        """
+        return self.config["student_embedding_dimension"]
+
+    @property
+    def distillation_temperature(self):
+        """
+        temperature softening the rnn model probabilities used as student targets
+        """
+        return self.config["distillation_temperature"]
+
+    @property
+    def distillation_unlabeled_samples(self):
+        """
+        max number of unlabeled reviews added to the student training set
+        """
+        return self.config["distillation_unlabeled_samples"]
+
 
 class NamedEntityRecognitionConfigReader():
     """
@@ -262,6 +360,55 @@ class NamedEntityRecognitionConfigReader():
         """
         return self.config["preprocessor_file_url"]
 
+    @property
+    def quantization_mode(self):
+        """
+        quantization applied to the exported tflite model: 'none', 'dynamic' or 'int8'
+        """
+        return self.config["quantization_mode"]
+
+    @property
+    def n_epochs(self):
+        """
+        maximum number of training epochs
+        """
+        return self.config["n_epochs"]
+
+    @property
+    def checkpoint_every_n_epochs(self):
+        """
+        number of epochs between two training checkpoints
+        """
+        return self.config["checkpoint_every_n_epochs"]
+
+    @property
+    def early_stopping_patience(self):
+        """
+        number of epochs without validation loss improvement before the training stops, 0 disables early stopping
+        """
+        return self.config["early_stopping_patience"]
+
+    @property
+    def seed(self):
+        """
+        seed of the python, numpy and tensorflow random generators
+        """
+        return self.config["seed"]
+
+    @property
+    def lstm_units(self):
+        """
+        number of units of the lstm layers
+        """
+        return self.config["lstm_units"]
+
+    @property
+    def batch_size(self):
+        """
+        number of training samples per gradient update
+        """
+        return self.config["batch_size"]
+
 
 class FashionClassifierConfigReader():
     """
@@ -369,3 +516,38 @@ class FashionClassifierConfigReader():
         gdrive fileid for the class file
         """
         return self.config["class_file_url"]
+
+    @property
+    def quantization_mode(self):
+        """
+        quantization applied to the exported tflite model: 'none', 'dynamic' or 'int8'
+        """
+        return self.config["quantization_mode"]
+
+    @property
+    def n_epochs(self):
+        """
+        maximum number of training epochs
+        """
+        return self.config["n_epochs"]
+
+    @property
+    def checkpoint_every_n_epochs(self):
+        """
+        number of epochs between two training checkpoints
+        """
+        return self.config["checkpoint_every_n_epochs"]
+
+    @property
+    def early_stopping_patience(self):
+        """
+        number of epochs without validation loss improvement before the training stops, 0 disables early stopping
+        """
+        return self.config["early_stopping_patience"]
+
+    @property
+    def seed(self):
+        """
+        seed of the python, numpy and tensorflow random generators
+        """
+        return self.config["seed"]
@@ -1,4 +1,5 @@
 import os
+import random
 import subprocess
 from cv2 import cv2
 import pandas as pd
@@ -57,6 +58,82 @@ class ImdbDataset:
             y.append(0)
         return x, y
 
+    def get_unlabeled_set(self, limit=None):
+        """
+        Returns the unlabeled reviews shipped with the imdb dataset under train/unsup
+        Args:
+            limit: max number of rows, None returns all of them
+        Return:
+            list of reviews
+        """
+        x = []
+        root_dir = os.environ.get("MARABOU_HOME")
+        directory = os.path.join(root_dir, "marabou/train/data/aclImdb/train/unsup")
+        if not os.path.isdir(directory):
+            return x
+        for f in os.listdir(directory):
+            if limit is not None and len(x) >= limit:
+                break
+            file1 = open(os.path.join(directory, f), "r")
+            x.append(file1.readline())
+            file1.close()
+        return x
+
+    def iter_chunks(self, mode="train", chunk_size=5000, seed=0):
+        """
+        Streams shuffled reviews, only the file names are held in memory
+        Args:
+            mode: 'train' or 'test'
+            chunk_size: number of reviews per chunk
+            seed: random seed of the shuffling
+        Return:
+            iterator of (reviews, targets) tuples
+        """
+        root_dir = os.environ.get("MARABOU_HOME")
+        directory = os.path.join(root_dir, "marabou/train/data/aclImdb", "train" if mode == "train" else "test")
+        files = [(os.path.join(directory, label_name, f), label) for label_name, label in [("pos", 1), ("neg", 0)]
+                 for f in os.listdir(os.path.join(directory, label_name))]
+        random.Random(seed).shuffle(files)
+        for start in range(0, len(files), chunk_size):
+            x, y = [], []
+            for file_url, label in files[start:start + chunk_size]:
+                with open(file_url, "r") as f:
+                    x.append(f.readline())
+                y.append(label)
+            yield x, y
+
+
+class LineDelimitedDataset:
+    """
+    Dataset handler for review corpora stored one review per line as '<label><delimiter><text>',
+    the file is streamed and never fully loaded in memory
+    """
+    def __init__(self, file_path, delimiter="\t"):
+        self.file_path = file_path
+        self.delimiter = delimiter
+
+    def iter_chunks(self, chunk_size=5000):
+        """
+        Streams the corpus
+        Args:
+            chunk_size: number of reviews per chunk
+        Return:
+            iterator of (reviews, targets) tuples
+        """
+        x, y = [], []
+        with open(self.file_path, "r") as f:
+            for line in f:
+                label, _, text = line.rstrip("\n").partition(self.delimiter)
+                if text == "":
+                    continue
+                x.append(text)
+                y.append(int(label))
+                if len(x) >= chunk_size:
+                    yield x, y
+                    x, y = [], []
+        if len(x) > 0:
+            yield x, y
+
 
 class KaggleDataset:
     """
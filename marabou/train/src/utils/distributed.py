@@ -0,0 +1,233 @@
+import os
+import sys
+import math
+import ipaddress
+import secrets
+import socket
+import subprocess
+import tempfile
+from multiprocessing.connection import Listener, Client
+import numpy as np
+from keras import backend as K
+from keras.callbacks import Callback
+from keras.models import load_model
+
+AUTHKEY_VARIABLE = "MARABOU_DISTRIBUTED_KEY"
+
+
+def authkey():
+    """
+    Key authenticating the workers of a training, shared through the MARABOU_DISTRIBUTED_KEY variable
+    Return:
+        the key as bytes, None when the variable is not set
+    """
+    key = os.environ.get(AUTHKEY_VARIABLE)
+    return key.encode() if key else None
+
+
+def is_loopback(host):
+    """
+    Whether a host name or address resolves to the loopback interface
+    """
+    try:
+        return ipaddress.ip_address(socket.gethostbyname(host)).is_loopback
+    except (socket.gaierror, ValueError):
+        return False
+
+
+def parse_address(address):
+    """
+    Converts a 'host:port' string to a (host, port) tuple
+    """
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+class ProcessGroup:
+    """
+    Training processes connected to the coordinator, rank 0, which holds one connection per worker.
+    Workers only talk to the coordinator, so that the group spans local processes as well as machines of a LAN
+    """
+    def __init__(self, rank, world_size, connections, processes=None, sync_every=16):
+        self.rank = rank
+        self.world_size = world_size
+        self.connections = connections
+        self.processes = processes or []
+        self.sync_every = sync_every
+
+    @classmethod
+    def create(cls, world_size, address="127.0.0.1:0", n_remote_workers=0, module=None, sync_every=16):
+        """
+        Starts the coordinator and waits for every worker to join. Workers that do not run on a remote machine
+        are spawned on this machine with 'python -m module --join host:port'. Without MARABOU_DISTRIBUTED_KEY,
+        only a loopback address is accepted and a random key is handed to the spawned workers
+        Args:
+            world_size: total number of training processes, the coordinator included
+            address: 'host:port' the coordinator listens on, port 0 picks a free port
+            n_remote_workers: number of workers joining from other machines
+            module: entry point module of the local workers, such as 'src.scripts.train_named_entity_recognition'
+            sync_every: number of batches between two averagings of the weights
+        Return:
+            ProcessGroup of rank 0
+        """
+        key = authkey()
+        if key is None:
+            if not is_loopback(parse_address(address)[0]):
+                raise ValueError("set %s to a secret shared with the workers before listening on %s"
+                                 % (AUTHKEY_VARIABLE, address))
+            # only the spawned workers receive this key
+            key = secrets.token_bytes(32).hex().encode()
+        listener = Listener(parse_address(address), authkey=key)
+        host, port = listener.address
+        processes = []
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path), **{AUTHKEY_VARIABLE: key.decode()})
+        for _ in range(world_size - 1 - n_remote_workers):
+            processes.append(subprocess.Popen([sys.executable, "-m", module, "--join", "%s:%i" % (host, port)],
+                                              env=env))
+        if n_remote_workers > 0:
+            print("----> waiting for %i remote workers started with --join %s:%i" % (n_remote_workers, host, port))
+        connections = []
+        for rank in range(1, world_size):
+            connection = listener.accept()
+            connection.send(rank)
+            connections.append(connection)
+        listener.close()
+        print("----> %i training processes connected" % world_size)
+        return cls(0, world_size, connections, processes, sync_every)
+
+    @classmethod
+    def join(cls, address):
+        """
+        Connects a worker to the coordinator, authenticated with the MARABOU_DISTRIBUTED_KEY variable
+        Args:
+            address: 'host:port' of the coordinator
+        Return:
+            ProcessGroup of the rank assigned by the coordinator
+        """
+        key = authkey()
+        if key is None:
+            raise ValueError("set %s to the secret of the coordinator before joining %s" % (AUTHKEY_VARIABLE, address))
+        connection = Client(parse_address(address), authkey=key)
+        rank = connection.recv()
+        return cls(rank, None, [connection])
+
+    def broadcast(self, value=None):
+        """
+        Sends a value of the coordinator to every worker
+        Return:
+            the value of the coordinator
+        """
+        if self.rank == 0:
+            for connection in self.connections:
+                connection.send(value)
+            return value
+        return self.connections[0].recv()
+
+    def average(self, arrays):
+        """
+        Element-wise mean of a list of arrays over the processes, every process receiving the mean
+        Args:
+            arrays: list of numpy arrays of the same shapes on every process
+        Return:
+            list of averaged arrays
+        """
+        if self.rank != 0:
+            self.connections[0].send(arrays)
+            return self.connections[0].recv()
+        total = [np.array(a, dtype=np.float64) for a in arrays]
+        for connection in self.connections:
+            for t, a in zip(total, connection.recv()):
+                t += a
+        mean = [(t / self.world_size).astype(a.dtype) for t, a in zip(total, arrays)]
+        for connection in self.connections:
+            connection.send(mean)
+        return mean
+
+    def close(self):
+        for connection in self.connections:
+            connection.close()
+        for process in self.processes:
+            process.wait()
+
+
+class ParameterAveraging(Callback):
+    """
+    Keras callback averaging the trainable weights of the processes every sync_every batches and after
+    the last batch of every epoch, so that the validation of the coordinator runs on the averaged model.
+    The stop decision of the coordinator (early stopping) is broadcast at the end of every epoch.
+    It must be the last callback of the coordinator
+    """
+    def __init__(self, process_group, sync_every=16):
+        super().__init__()
+        self.process_group = process_group
+        self.sync_every = sync_every
+        self.n_steps = None
+
+    def on_train_begin(self, logs=None):
+        self.n_steps = self.params.get("steps")
+        if not self.n_steps:
+            self.n_steps = int(math.ceil(self.params["samples"] / self.params["batch_size"]))
+
+    def on_train_batch_end(self, batch, logs=None):
+        if (batch + 1) % self.sync_every == 0 or batch + 1 == self.n_steps:
+            weights = self.model.trainable_weights
+            averaged = self.process_group.average(K.batch_get_value(weights))
+            K.batch_set_value(list(zip(weights, averaged)))
+
+    def on_epoch_end(self, epoch, logs=None):
+        self.model.stop_training = self.process_group.broadcast(self.model.stop_training)
+
+
+def distribute_training(process_group, keras_model, X_train, y_train, batch_size, n_epochs, initial_epoch):
+    """
+    Sends the model and an equal shard of the training arrays to every worker, the shards having the same
+    length so that every process runs the same number of steps
+    Args:
+        process_group: ProcessGroup of rank 0
+        keras_model: compiled keras model, weights included
+        X_train: training features
+        y_train: training targets
+        batch_size: number of samples per gradient update of every process
+        n_epochs: number of epochs
+        initial_epoch: epoch the training starts from
+    Return:
+        tuple containing the shard of the coordinator and the parameter averaging callback
+    """
+    world_size = process_group.world_size
+    shard_size = len(X_train) // world_size
+    with tempfile.TemporaryDirectory() as folder:
+        keras_model.save(os.path.join(folder, "model.h5"))
+        with open(os.path.join(folder, "model.h5"), "rb") as f:
+            model_bytes = f.read()
+    for rank, connection in enumerate(process_group.connections, 1):
+        connection.send({"model": model_bytes,
+                         "X": np.asarray(X_train[rank::world_size][:shard_size]),
+                         "y": np.asarray(y_train[rank::world_size][:shard_size]),
+                         "batch_size": batch_size, "epochs": n_epochs, "initial_epoch": initial_epoch,
+                         "sync_every": process_group.sync_every})
+    print("----> %i training samples per process" % shard_size)
+    return (X_train[0::world_size][:shard_size], y_train[0::world_size][:shard_size],
+            ParameterAveraging(process_group, process_group.sync_every))
+
+
+def run_worker(address, custom_objects=None):
+    """
+    Worker side of a distributed training: receives the model and its shard, then trains it in step with the
+    other processes
+    Args:
+        address: 'host:port' of the coordinator
+        custom_objects: custom layers, losses and metrics needed to load the model
+    Return:
+        None
+    """
+    process_group = ProcessGroup.join(address)
+    job = process_group.connections[0].recv()
+    with tempfile.TemporaryDirectory() as folder:
+        with open(os.path.join(folder, "model.h5"), "wb") as f:
+            f.write(job["model"])
+        model = load_model(os.path.join(folder, "model.h5"), custom_objects=custom_objects)
+    print("----> worker %i training on %i samples" % (process_group.rank, len(job["X"])))
+    model.fit(job["X"], job["y"], batch_size=job["batch_size"], epochs=job["epochs"],
+              initial_epoch=job["initial_epoch"], verbose=0,
+              callbacks=[ParameterAveraging(process_group, job["sync_every"])])
+    process_group.close()
@@ -0,0 +1,192 @@
+import os
+import numpy as np
+
+OUTSIDE, BEGIN, INSIDE = 0, 1, 2
+
+
+def confusion_matrix(y_true, y_pred, n_classes, mask=None):
+    """
+    Confusion matrix of integer encoded classes, counted with a single bincount
+    Args:
+        y_true: integer array of true classes, of any shape
+        y_pred: integer array of predicted classes, of the same shape
+        n_classes: number of classes
+        mask: optional boolean array of the same shape, False entries (padding) are not counted
+    Return:
+        n_classes x n_classes array, rows being the true classes and columns the predicted classes
+    """
+    y_true = np.asarray(y_true, dtype=np.int64).ravel()
+    y_pred = np.asarray(y_pred, dtype=np.int64).ravel()
+    if mask is not None:
+        mask = np.asarray(mask, dtype=bool).ravel()
+        y_true, y_pred = y_true[mask], y_pred[mask]
+    counts = np.bincount(y_true * n_classes + y_pred, minlength=n_classes * n_classes)
+    return counts.reshape(n_classes, n_classes)
+
+
+def precision_recall_f1(n_correct, n_predicted, n_true):
+    """
+    Element-wise precision, recall and f1 score, 0 where a denominator is 0
+    """
+    n_correct, n_predicted, n_true = (np.asarray(a, dtype=np.float64) for a in (n_correct, n_predicted, n_true))
+    precision = np.divide(n_correct, n_predicted, out=np.zeros_like(n_correct), where=n_predicted > 0)
+    recall = np.divide(n_correct, n_true, out=np.zeros_like(n_correct), where=n_true > 0)
+    f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros_like(n_correct),
+                   where=precision + recall > 0)
+    return precision, recall, f1
+
+
+def _report(names, n_correct, n_predicted, n_true):
+    """
+    Report dictionary of per class counts, with the averages over the classes
+    """
+    precision, recall, f1 = precision_recall_f1(n_correct, n_predicted, n_true)
+    report = {}
+    for i, name in enumerate(names):
+        report[name] = {"precision": float(precision[i]), "recall": float(recall[i]), "f1-score": float(f1[i]),
+                        "support": int(n_true[i])}
+    support = int(n_true.sum())
+    weights = n_true / support if support > 0 else np.zeros(len(names))
+    report["macro avg"] = {"precision": float(precision.mean()), "recall": float(recall.mean()),
+                           "f1-score": float(f1.mean()), "support": support}
+    report["weighted avg"] = {"precision": float(precision @ weights), "recall": float(recall @ weights),
+                              "f1-score": float(f1 @ weights), "support": support}
+    return report
+
+
+def classification_report(y_true, y_pred, target_names, ignore=None):
+    """
+    Per class precision, recall and f1 score of integer encoded classes, in the format of the sklearn
+    classification report dictionary. Only the classes that are either true or predicted at least once are reported
+    Args:
+        y_true: integer array of true classes, of any shape
+        y_pred: integer array of predicted classes, of the same shape
+        target_names: class names ordered by class index
+        ignore: optional class index, such as the padding, whose true occurrences are not evaluated
+    Return:
+        dictionary containing the scores of every class, the accuracy and the macro and weighted averages
+    """
+    n_classes = len(target_names)
+    y_true = np.asarray(y_true)
+    mask = None if ignore is None else y_true != ignore
+    matrix = confusion_matrix(y_true, y_pred, n_classes, mask)
+    n_correct = np.diag(matrix)
+    n_true = matrix.sum(axis=1)
+    n_predicted = matrix.sum(axis=0)
+    present = (n_true + n_predicted) > 0
+    if ignore is not None:
+        present[ignore] = False
+    labels = np.flatnonzero(present)
+    report = _report([target_names[i] for i in labels], n_correct[labels], n_predicted[labels], n_true[labels])
+    total = matrix.sum()
+    report["accuracy"] = float(n_correct.sum() / total) if total > 0 else 0.
+    # same key order as sklearn
+    report["macro avg"] = report.pop("macro avg")
+    report["weighted avg"] = report.pop("weighted avg")
+    return report
+
+
+def _bio_tables(target_names):
+    """
+    Prefix (outside, begin, inside) and entity type of every tag, 'B-geo' being the beginning of a 'geo' entity.
+    An extra outside tag is appended to separate the sentences
+    """
+    entity_types = sorted({name.split("-", 1)[1] for name in target_names if name[:2] in ("B-", "I-")})
+    type_idx = {t: i for i, t in enumerate(entity_types)}
+    prefixes = np.full(len(target_names) + 1, OUTSIDE)
+    types = np.full(len(target_names) + 1, -1)
+    for i, name in enumerate(target_names):
+        if name[:2] in ("B-", "I-"):
+            prefixes[i] = BEGIN if name[0] == "B" else INSIDE
+            types[i] = type_idx[name[2:]]
+    return entity_types, prefixes, types
+
+
+def _spans(tags, mask, prefixes, types):
+    """
+    Flat start and end positions and type of the entities of a batch of tag sequences. An inside tag that does
+    not continue an entity of the same type starts a new one
+    """
+    n_sentences, length = tags.shape
+    outside = len(prefixes) - 1
+    padded = np.full((n_sentences, length + 1), outside, dtype=np.int64)
+    padded[:, :length] = np.where(mask, tags, outside)
+    padded = padded.ravel()
+    prefix, entity_type = prefixes[padded], types[padded]
+    previous_type = np.concatenate([[-1], entity_type[:-1]])
+    next_prefix = np.concatenate([prefix[1:], [OUTSIDE]])
+    next_type = np.concatenate([entity_type[1:], [-1]])
+    is_entity = entity_type >= 0
+    starts = np.flatnonzero(is_entity & ~((prefix == INSIDE) & (previous_type == entity_type)))
+    ends = np.flatnonzero(is_entity & ~((next_prefix == INSIDE) & (next_type == entity_type)))
+    return starts, ends, entity_type[starts], padded.size
+
+
+def entity_report(y_true, y_pred, target_names, ignore=None):
+    """
+    Entity level precision, recall and f1 score of BIO tag sequences: a predicted entity is correct when its
+    span and type exactly match a true entity. Computed on the flattened tags, without any python loop over
+    the sentences
+    Args:
+        y_true: integer array of true tags, of shape (n_sentences, sequence_length)
+        y_pred: integer array of predicted tags, of the same shape
+        target_names: tag names ordered by tag index, such as 'O', 'B-geo' and 'I-geo'
+        ignore: optional tag index, such as the padding, whose true positions are not evaluated
+    Return:
+        dictionary containing the scores of every entity type, and their micro, macro and weighted averages
+    """
+    y_true = np.asarray(y_true, dtype=np.int64)
+    y_pred = np.asarray(y_pred, dtype=np.int64)
+    mask = np.ones(y_true.shape, dtype=bool) if ignore is None else y_true != ignore
+    entity_types, prefixes, types = _bio_tables(target_names)
+    n_types = max(len(entity_types), 1)
+    keys = []
+    for tags in (y_true, y_pred):
+        starts, ends, span_types, size = _spans(tags, mask, prefixes, types)
+        keys.append((starts * size + ends) * n_types + span_types)
+    matched = np.intersect1d(keys[0], keys[1], assume_unique=True)
+    n_true = np.bincount(keys[0] % n_types, minlength=n_types)[:len(entity_types)]
+    n_predicted = np.bincount(keys[1] % n_types, minlength=n_types)[:len(entity_types)]
+    n_correct = np.bincount(matched % n_types, minlength=n_types)[:len(entity_types)]
+    report = _report(entity_types, n_correct, n_predicted, n_true)
+    averages = report.pop("macro avg"), report.pop("weighted avg")
+    precision, recall, f1 = precision_recall_f1(n_correct.sum(), n_predicted.sum(), n_true.sum())
+    report["micro avg"] = {"precision": float(precision), "recall": float(recall), "f1-score": float(f1),
+                           "support": int(n_true.sum())}
+    report["macro avg"], report["weighted avg"] = averages
+    return report
+
+
+def format_report(report):
+    """
+    Text table of a report dictionary, with scores rounded to 2 decimals
+    """
+    line = "{:15} |{:>10} |{:>10} |{:>10} |{:>10}|\n"
+    text = line.format("classes", "precision", "recall", "f1-score", "support")
+    for name, scores in report.items():
+        if isinstance(scores, dict):
+            text += line.format(name, round(scores["precision"], 2), round(scores["recall"], 2),
+                                round(scores["f1-score"], 2), scores["support"])
+        else:
+            support = report["macro avg"]["support"] if "macro avg" in report else ""
+            text += line.format(name, "", "", round(scores, 2), support)
+    return text
+
+
+def save_report(report, file_name_prefix, report_name="report"):
+    """
+    Saves a report dictionary to a txt file under marabou/train/perf
+    Args:
+        report: a report dictionary, such as the output of classification_report
+        file_name_prefix: a file name prefix having the following format 'sentiment_analysis_%Y%m%d_%H%M%S'
+        report_name: suffix of the file name
+    Return:
+        None
+    """
+    root_dir = os.environ.get("MARABOU_HOME")
+    if not os.path.isdir(os.path.join(root_dir, "marabou/train/perf")):
+        os.mkdir(os.path.join(root_dir, "marabou/train/perf"))
+    report_file_url = os.path.join(root_dir, "marabou/train/perf", "%s_%s.txt" % (file_name_prefix, report_name))
+    with open(report_file_url, "w") as f:
+        f.write(format_report(report))
+    print("----> %s saved to %s" % (report_name.replace("_", " "), report_file_url))
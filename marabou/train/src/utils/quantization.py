@@ -0,0 +1,139 @@
+import os
+import numpy as np
+import tensorflow as tf
+
+
+QUANTIZATION_MODES = ["dynamic", "int8"]
+
+
+def convert_to_tflite(h5_file, mode="dynamic", calibration_data=None):
+    """
+    Converts a saved keras model into a quantized TFLite flatbuffer
+    Args:
+        h5_file: url of the keras model saved by save_model
+        mode: 'dynamic' quantizes the weights to int8 and keeps float activations,
+        'int8' also quantizes the activations using the calibration data
+        calibration_data: array of preprocessed training inputs, required for the 'int8' mode
+    Return:
+        the serialized TFLite model
+    """
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError("quantization mode must be one of %s" % QUANTIZATION_MODES)
+    keras_model = tf.keras.models.load_model(h5_file, compile=False)
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if mode == "int8":
+        if calibration_data is None:
+            raise ValueError("int8 quantization requires calibration data")
+
+        def representative_dataset():
+            for sample in calibration_data:
+                yield [np.expand_dims(sample, 0).astype(np.float32)]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8, tf.lite.OpsSet.TFLITE_BUILTINS]
+    return converter.convert()
+
+
+def run_tflite(tflite_file, X):
+    """
+    Runs a TFLite model on a batch of inputs
+    Args:
+        tflite_file: url of the TFLite model
+        X: array of model inputs
+    Return:
+        numpy array containing the model outputs
+    """
+    interpreter = tf.lite.Interpreter(model_path=tflite_file)
+    input_details = interpreter.get_input_details()[0]
+    output_details = interpreter.get_output_details()[0]
+    interpreter.resize_tensor_input(input_details['index'], [1] + list(X.shape[1:]))
+    interpreter.allocate_tensors()
+    outputs = []
+    for sample in X:
+        interpreter.set_tensor(input_details['index'], np.expand_dims(sample, 0).astype(input_details['dtype']))
+        interpreter.invoke()
+        outputs.append(interpreter.get_tensor(output_details['index'])[0])
+    return np.asarray(outputs)
+
+
+def compare_outputs(float_outputs, quantized_outputs, y_true=None):
+    """
+    Accuracy check of a quantized model against its float version
+    Args:
+        float_outputs: outputs of the float keras model
+        quantized_outputs: outputs of the quantized model on the same inputs
+        y_true: optional array of true class ids
+    Return:
+        dictionary containing the output differences and the agreement/accuracy of both models
+    """
+    float_outputs = np.asarray(float_outputs, dtype=np.float32)
+    quantized_outputs = np.asarray(quantized_outputs, dtype=np.float32)
+    if float_outputs.shape[-1] == 1:
+        float_classes = (float_outputs[..., 0] > 0.5).astype(int)
+        quantized_classes = (quantized_outputs[..., 0] > 0.5).astype(int)
+    else:
+        float_classes = np.argmax(float_outputs, axis=-1)
+        quantized_classes = np.argmax(quantized_outputs, axis=-1)
+    difference = np.abs(float_outputs - quantized_outputs)
+    report = {"n_samples": len(float_outputs),
+              "max_abs_difference": float(np.max(difference)),
+              "mean_abs_difference": float(np.mean(difference)),
+              "prediction_agreement": float(np.mean(float_classes == quantized_classes))}
+    if y_true is not None:
+        y_true = np.asarray(y_true)
+        report["float_accuracy"] = float(np.mean(float_classes == y_true))
+        report["quantized_accuracy"] = float(np.mean(quantized_classes == y_true))
+    return report
+
+
+def export_quantized_model(h5_file, mode="dynamic", calibration_data=None, X_holdout=None, y_holdout=None):
+    """
+    Exports the quantized version of a saved keras model next to it and checks it against the float model
+    Args:
+        h5_file: url of the keras model saved by save_model
+        mode: quantization mode, 'dynamic' or 'int8'
+        calibration_data: array of preprocessed training inputs, required for the 'int8' mode
+        X_holdout: array of preprocessed held-out inputs used for the accuracy check
+        y_holdout: array of true class ids of the held-out inputs
+    Return:
+        url of the quantized model and accuracy check report
+    """
+    print("===========> %s quantization of %s" % (mode, h5_file))
+    tflite_model = convert_to_tflite(h5_file, mode, calibration_data)
+    tflite_file = h5_file.replace(".h5", "_quantized.tflite")
+    with open(tflite_file, 'wb') as f:
+        f.write(tflite_model)
+    report = {"mode": mode,
+              "float_size_mb": round(os.path.getsize(h5_file) / 2 ** 20, 2),
+              "quantized_size_mb": round(os.path.getsize(tflite_file) / 2 ** 20, 2)}
+    if X_holdout is not None:
+        keras_model = tf.keras.models.load_model(h5_file, compile=False)
+        float_outputs = keras_model.predict(X_holdout)
+        quantized_outputs = run_tflite(tflite_file, X_holdout)
+        report.update(compare_outputs(float_outputs, quantized_outputs, y_holdout))
+    print("----> quantized model saved to %s" % tflite_file)
+    return tflite_file, report
+
+
+def save_quantization_report(report, file_name_prefix, model_name=None):
+    """
+    Saves the accuracy check of a quantized model to a txt file
+    Args:
+        report: dictionary returned by export_quantized_model
+        file_name_prefix: a file name prefix having the following format 'sentiment_analysis_%Y%m%d_%H%M%S'
+        model_name: optional name of the model, telling apart the reports of the models of a same run
+    Return:
+        None
+    """
+    root_dir = os.environ.get("MARABOU_HOME")
+    if not os.path.isdir(os.path.join(root_dir, "marabou/train/perf")):
+        os.mkdir(os.path.join(root_dir, "marabou/train/perf"))
+    plot_folder = os.path.join(root_dir, "marabou/train/perf")
+    if model_name is not None:
+        file_name_prefix = "%s_%s" % (file_name_prefix, model_name)
+    report_file_url = os.path.join(plot_folder, file_name_prefix + "_quantization_report.txt")
+    with open(report_file_url, "w") as f:
+        for key, value in report.items():
+            f.write("{:25} |{:>12}|\n".format(key, str(round(value, 4) if isinstance(value, float) else value)))
+    print("----> quantization report saved to %s" % report_file_url)
@@ -0,0 +1,119 @@
+import os
+import json
+import resource
+import time
+import numpy as np
+from keras.callbacks import Callback
+
+
+def peak_rss_mb():
+    """
+    Peak resident memory of the training process in megabytes
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class TrainingTelemetry(Callback):
+    """
+    Keras callback timing every training step and epoch. The time spent between the end of a step and the
+    beginning of the next one is counted as input pipeline wait (batch slicing and feeding), the time spent
+    inside a step as compute, and the time between the last step and the end of an epoch as validation
+    """
+    def __init__(self, model_name):
+        super().__init__()
+        self.model_name = model_name
+        self.epochs = []
+        self.train_start = None
+        self.train_duration = None
+        self._epoch_start = None
+        self._step_start = None
+        self._last_step_end = None
+        self._step_times = []
+        self._wait_times = []
+        self._n_examples = 0
+
+    def on_train_begin(self, logs=None):
+        self.train_start = time.perf_counter()
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._epoch_start = time.perf_counter()
+        self._last_step_end = self._epoch_start
+        self._step_times = []
+        self._wait_times = []
+        self._n_examples = 0
+
+    def on_train_batch_begin(self, batch, logs=None):
+        self._step_start = time.perf_counter()
+        self._wait_times.append(self._step_start - self._last_step_end)
+
+    def on_train_batch_end(self, batch, logs=None):
+        self._last_step_end = time.perf_counter()
+        self._step_times.append(self._last_step_end - self._step_start)
+        self._n_examples += (logs or {}).get("size", 0)
+
+    def on_epoch_end(self, epoch, logs=None):
+        epoch_end = time.perf_counter()
+        epoch_time = epoch_end - self._epoch_start
+        step_times = np.asarray(self._step_times)
+        compute_time = float(step_times.sum())
+        wait_time = float(np.sum(self._wait_times))
+        self.epochs.append({"epoch": epoch,
+                            "wall_time_s": round(epoch_time, 3),
+                            "n_steps": len(step_times),
+                            "n_examples": int(self._n_examples),
+                            "examples_per_sec": round(self._n_examples / compute_time, 1) if compute_time > 0 else None,
+                            "compute_time_s": round(compute_time, 3),
+                            "input_wait_time_s": round(wait_time, 3),
+                            "validation_time_s": round(epoch_end - self._last_step_end, 3),
+                            "input_wait_share": round(wait_time / (wait_time + compute_time), 4)
+                            if wait_time + compute_time > 0 else None,
+                            "step_time_ms": {"mean": round(1000 * float(step_times.mean()), 3),
+                                             "p50": round(1000 * float(np.percentile(step_times, 50)), 3),
+                                             "p95": round(1000 * float(np.percentile(step_times, 95)), 3),
+                                             "max": round(1000 * float(step_times.max()), 3)}
+                            if len(step_times) > 0 else None,
+                            "step_times_ms": [round(1000 * float(t), 2) for t in step_times],
+                            "peak_rss_mb": round(peak_rss_mb(), 1),
+                            "metrics": {k: float(v) for k, v in (logs or {}).items()}})
+
+    def on_train_end(self, logs=None):
+        self.train_duration = time.perf_counter() - self.train_start
+
+    def summary(self):
+        """
+        Totals over all the epochs
+        Return:
+            dictionary containing the training time, throughput, input wait share and peak memory
+        """
+        compute_time = sum(e["compute_time_s"] for e in self.epochs)
+        wait_time = sum(e["input_wait_time_s"] for e in self.epochs)
+        n_examples = sum(e["n_examples"] for e in self.epochs)
+        return {"model_name": self.model_name,
+                "n_epochs": len(self.epochs),
+                "wall_time_s": round(self.train_duration, 3) if self.train_duration is not None else None,
+                "compute_time_s": round(compute_time, 3),
+                "input_wait_time_s": round(wait_time, 3),
+                "validation_time_s": round(sum(e["validation_time_s"] for e in self.epochs), 3),
+                "examples_per_sec": round(n_examples / compute_time, 1) if compute_time > 0 else None,
+                "input_bound": wait_time > compute_time,
+                "peak_rss_mb": round(peak_rss_mb(), 1)}
+
+    def save(self, file_name_prefix):
+        """
+        Saves the telemetry under marabou/train/perf next to the learning curve
+        Args:
+            file_name_prefix: a file name prefix having the following format 'sentiment_analysis_%Y%m%d_%H%M%S'
+        Return:
+            None
+        """
+        root_dir = os.environ.get("MARABOU_HOME")
+        if not os.path.isdir(os.path.join(root_dir, "marabou/train/perf")):
+            os.mkdir(os.path.join(root_dir, "marabou/train/perf"))
+        file_url = os.path.join(root_dir, "marabou/train/perf", file_name_prefix + "_telemetry.json")
+        summary = self.summary()
+        with open(file_url, "w") as f:
+            json.dump({"summary": summary, "epochs": self.epochs}, f, indent=2)
+        print("----> %.1f examples/s, %.2f s waiting for inputs, %.2f s computing, peak rss %.0f MB" %
+              (summary["examples_per_sec"] or 0, summary["input_wait_time_s"], summary["compute_time_s"],
+               summary["peak_rss_mb"]))
+        print("----> training telemetry saved to %s" % file_url)